@@ -1,8 +1,15 @@
 from fastapi import APIRouter
 from app.core.config import settings
+from app.services.admission import get_admission_controller
 
 router = APIRouter()
 
 @router.get("/health")
 def health():
-    return {"ok": True, "env": settings.ENV, "service": "koa-doc-pipeline"}
+    return {
+        "ok": True,
+        "env": settings.ENV,
+        "service": "koa-doc-pipeline",
+        # Carga de jobs deste processo (fora do modo fila)
+        "load": get_admission_controller().snapshot(),
+    }
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, status
+from fastapi.responses import StreamingResponse
 from app.api.deps import verify_internal_token
 from app.models.schemas import CreateJobRequest, CreateJobResponse, JobStatusResponse
 from app.services.job_service import JobService
@@ -25,3 +26,16 @@ async def create_job(payload: CreateJobRequest):
 async def get_job(job_id: str):
     svc = JobService()
     return await svc.get_job_status(job_id)
+
+@router.get(
+    "/jobs/{job_id}/events",
+    dependencies=[Depends(verify_internal_token)],
+)
+async def stream_job_events(job_id: str, last_event_id: str | None = Header(default=None)):
+    svc = JobService()
+    stream = await svc.open_event_stream(job_id, last_event_id)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
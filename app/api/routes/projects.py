@@ -21,8 +21,8 @@ async def get_project_output(project_id: str):
     response_model=CreateJobResponse,
     status_code=status.HTTP_202_ACCEPTED,
 )
-async def reprocess_project(project_id: str):
+async def reprocess_project(project_id: str, incremental: bool = False):
     svc = JobService()
-    job = await svc.reprocess_project(project_id)
+    job = await svc.reprocess_project(project_id, incremental=incremental)
     await svc.kickoff_job(job.job_id)
     return job
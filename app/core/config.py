@@ -20,9 +20,76 @@ class Settings(BaseSettings):
     SIGNED_URL_TTL_SECONDS: int = 3600
     MAX_DOCUMENT_BYTES: int = 25_000_000
     MAX_TABLE_ROWS: int = 5_000
+    MAX_INFLIGHT_JOBS: int = 2
+    MAX_QUEUED_JOBS: int = 8
+    ADMISSION_RETRY_AFTER_SECONDS: int = 30
+    MAX_DOCS_IN_FLIGHT: int = 4
+    # Prazo por documento (download + extração + Gemini); estourado, o documento fica
+    # 'timed_out' com o parcial e o job segue. 0 = sem prazo
+    DOC_DEADLINE_SECONDS: float = 600.0
+
+    # Pool de processos para OCR/pdfplumber/pandas (0 = roda inline na thread do job)
+    CPU_POOL_WORKERS: int = 0
+    CPU_POOL_MAX_TASKS_PER_CHILD: int = 20
+    CPU_TASK_TIMEOUT_SECONDS: float = 300.0
+
+    # OCR de PDFs escaneados: páginas rasterizadas em lotes e reconhecidas em paralelo
+    OCR_WORKERS: int = 2
+    OCR_BATCH_PAGES: int = 4
+    # Página com menos caracteres nativos que isso (ou texto ilegível) vai para o OCR
+    OCR_MIN_PAGE_CHARS: int = 30
+    # Perfil de OCR (default/fast/accurate, ver app/extractors/ocr_profiles.py) e exceções por doc_type
+    # auto = tesserocr (engine carregado por thread) se instalado, senão pytesseract
+    OCR_ENGINE: str = "auto"
+    OCR_PROFILE: str = "default"
+    OCR_PROFILE_BY_DOC_TYPE: dict[str, str] = {}
+    # RECEBIVEIS/ENDIVIDAMENTO/TABELA_VENDAS em PDF: tenta a tabela nativa antes do Gemini
+    PDF_TABLES_ENABLED: bool = True
+    # Páginas amostradas para classificar o PDF (nativo/escaneado/misto) antes da extração
+    PDF_CLASSIFY_SAMPLE_PAGES: int = 5
+    # Limites de leitura de PDFs grandes (o excedente é descartado com aviso)
+    PDF_MAX_PAGES: int = 500
+    PDF_MAX_TEXT_CHARS: int = 2_000_000
+
+    EXTRACTION_CACHE_ENABLED: bool = True
+    JOB_EVENTS_FLUSH_SIZE: int = 20
+    JOB_EVENTS_FLUSH_SECONDS: float = 2.0
+    JOB_EVENTS_STREAM_POLL_SECONDS: float = 5.0
+
+    WEBHOOK_WORKERS: int = 4
+    WEBHOOK_QUEUE_SIZE: int = 1000
+
+    # Fila durável: com JOB_QUEUE_ENABLED a API só enfileira e `python -m app.worker` processa
+    JOB_QUEUE_ENABLED: bool = False
+    WORKER_CONCURRENCY: int = 2
+    WORKER_POLL_INTERVAL_SECONDS: float = 2.0
+    WORKER_LEASE_SECONDS: int = 900
 
     GEMINI_API_KEY: str
     GEMINI_MODEL: str = "gemini-2.5-flash"
     GEMINI_TIMEOUT_SECONDS: int = 45
+    # Documentos até GEMINI_SMALL_MODEL_MAX_TOKENS (estimados) vão para o modelo menor; vazio desliga
+    GEMINI_SMALL_MODEL: str = "gemini-2.5-flash-lite"
+    GEMINI_SMALL_MODEL_MAX_TOKENS: int = 8000
+    # Cota compartilhada por todos os jobs do processo (0 = sem limite por minuto)
+    GEMINI_MAX_CONCURRENCY: int = 8
+    GEMINI_REQUESTS_PER_MINUTE: int = 300
+    # AIMD: a janela de simultâneas anda entre MIN e MAX_CONCURRENCY conforme 429/5xx e latência
+    GEMINI_ADAPTIVE_CONCURRENCY: bool = True
+    GEMINI_MIN_CONCURRENCY: int = 1
+    GEMINI_LATENCY_TARGET_SECONDS: float = 30.0
+    # Cache local (SQLite) das respostas validadas do Gemini, por prompt+schema+modelo
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_PATH: str = "/tmp/aida/llm_cache.sqlite3"
+    LLM_CACHE_MAX_MB: int = 256
+    LLM_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    # Compactação do texto do PDF antes do prompt; linha presente em >= essa fração das páginas é boilerplate
+    TEXT_COMPACTION_ENABLED: bool = True
+    TEXT_BOILERPLATE_MIN_PAGE_RATIO: float = 0.6
+    # Textos de PDF acima de LLM_CHUNK_TOKENS (estimados) vão ao Gemini em trechos paralelos
+    LLM_CHUNKING_ENABLED: bool = True
+    LLM_CHUNK_TOKENS: int = 20000
+    LLM_CHUNK_CONCURRENCY: int = 4
+    LLM_MAX_CHUNKS: int = 30
 
 settings = Settings()
@@ -0,0 +1,140 @@
+"""
+Pool de processos para as etapas CPU-bound da extração (pdfplumber, OCR, pandas).
+
+Com CPU_POOL_WORKERS=0 (padrão) as funções rodam inline na thread chamadora,
+como antes. Com N > 0 rodam em até N processos, fora do GIL dos workers web,
+cada processo é reciclado após CPU_POOL_MAX_TASKS_PER_CHILD tarefas (contém
+vazamentos de memória de pdfplumber/PIL) e cada tarefa tem um tempo limite.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, TypeVar
+
+from app.core.config import settings
+from app.core.errors import ExtractionError
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class CpuPool:
+    def __init__(self, workers: int, max_tasks_per_child: int | None = None, task_timeout: float | None = None):
+        self.workers = max(0, workers)
+        self.max_tasks_per_child = max_tasks_per_child or None
+        self.task_timeout = task_timeout or None
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # forkserver: o processo pai tem threads (uvicorn, pools), fork puro não é seguro
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method),
+                    max_tasks_per_child=self.max_tasks_per_child,
+                )
+            return self._executor
+
+    def run(self, fn: Callable[..., T], *args: Any, timeout: float | None = None) -> T:
+        if self.workers == 0:
+            return fn(*args)
+
+        timeout = timeout if timeout is not None else self.task_timeout
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # Pool quebrado por um processo que morreu antes: descarta e tenta num novo
+                self._recycle(executor)
+                continue
+            except RuntimeError:
+                # Pool trocado entre o get e o submit: tenta no novo
+                if self._executor is executor:
+                    raise
+                continue
+            remaining = max(0.0, expires_at - time.monotonic()) if expires_at is not None else None
+            try:
+                return future.result(timeout=remaining)
+            except FutureTimeoutError:
+                future.cancel()
+                self._recycle(executor)
+                raise ExtractionError(
+                    "Tempo limite excedido na etapa de extração.",
+                    details={"stage": getattr(fn, "__name__", str(fn)), "timeout_seconds": timeout},
+                )
+            except BrokenProcessPool:
+                # Um processo do pool morreu (OOM, segfault do tesseract/pdfplumber). Quem chega
+                # primeiro troca o pool e falha; as outras tarefas do pool quebrado são reenviadas
+                if self._executor is not executor:
+                    continue
+                self._recycle(executor)
+                raise ExtractionError(
+                    "Processo de extração encerrado inesperadamente.",
+                    details={"stage": getattr(fn, "__name__", str(fn))},
+                )
+            except CancelledError:
+                # A tarefa caiu porque o pool foi reciclado pelo timeout de outra; reenvia ao pool novo
+                if self._executor is executor:
+                    raise
+
+    def _recycle(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Troca o pool após um timeout ou a morte de um processo. Não há como matar só o
+        processo da tarefa presa, então novas tarefas vão para um pool novo e o antigo
+        recebe um período de graça para terminar as que já rodam antes de ter os processos
+        encerrados. As que ainda estavam na fila são canceladas e `run` as reenvia ao pool novo.
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        grace = self.task_timeout or 30.0
+
+        def _terminate() -> None:
+            for proc in processes:
+                proc.join(timeout=max(0.0, grace))
+                if proc.is_alive():
+                    logger.warning("Terminating stuck CPU pool process pid=%s", proc.pid)
+                    proc.terminate()
+
+        threading.Thread(target=_terminate, name="aida-cpu-pool-reaper", daemon=True).start()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool: CpuPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_cpu_pool() -> CpuPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CpuPool(
+                workers=settings.CPU_POOL_WORKERS,
+                max_tasks_per_child=settings.CPU_POOL_MAX_TASKS_PER_CHILD,
+                task_timeout=settings.CPU_TASK_TIMEOUT_SECONDS,
+            )
+        return _pool
+
+
+def run_cpu_bound(fn: Callable[..., T], *args: Any, timeout: float | None = None) -> T:
+    return get_cpu_pool().run(fn, *args, timeout=timeout)
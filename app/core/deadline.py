@@ -0,0 +1,45 @@
+"""
+Prazo de processamento de um documento, verificado de forma cooperativa entre as etapas.
+
+Usa o relógio de parede (time.time) para poder ser enviado aos processos do pool de CPU.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from app.core.errors import DocumentTimeout
+
+
+@dataclass(frozen=True)
+class Deadline:
+    expires_at: float | None = None
+    budget_seconds: float | None = None
+
+    @classmethod
+    def after(cls, seconds: float | None) -> Deadline:
+        """Prazo de `seconds` a partir de agora; None/0 = sem prazo."""
+        if not seconds or seconds <= 0:
+            return cls()
+        return cls(expires_at=time.time() + seconds, budget_seconds=seconds)
+
+    def remaining(self) -> float | None:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.time())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def cap(self, seconds: float | None) -> float | None:
+        """Menor entre um timeout próprio da etapa e o que resta do prazo."""
+        remaining = self.remaining()
+        if remaining is None:
+            return seconds
+        return remaining if seconds is None else min(seconds, remaining)
+
+    def check(self, stage: str, partial: dict[str, Any] | None = None) -> None:
+        if self.expired:
+            raise DocumentTimeout(stage, self.budget_seconds, partial)
@@ -7,6 +7,7 @@ class AppError(Exception):
     message: str
     status_code: int = 400
     details: Any | None = None
+    headers: dict[str, str] | None = None
 
     def to_dict(self) -> dict[str, Any]:
         return {"code": self.code, "message": self.message, "status_code": self.status_code, "details": self.details}
@@ -34,3 +35,25 @@ class UpstreamError(AppError):
 class ExtractionError(AppError):
     def __init__(self, message: str = "Falha na extração.", details: Any | None = None):
         super().__init__(code="EXTRACTION_ERROR", message=message, status_code=422, details=details)
+
+class TooManyRequests(AppError):
+    def __init__(self, message: str = "Too many requests.", retry_after: int = 30, details: Any | None = None):
+        super().__init__(
+            code="TOO_MANY_REQUESTS",
+            message=message,
+            status_code=429,
+            details=details,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+class DocumentTimeout(AppError):
+    def __init__(self, stage: str, budget_seconds: float | None = None, partial: dict[str, Any] | None = None):
+        super().__init__(
+            code="DOCUMENT_TIMEOUT",
+            message=f"Prazo do documento esgotado na etapa {stage}.",
+            status_code=504,
+            details={"stage": stage, "budget_seconds": budget_seconds},
+        )
+        self.stage = stage
+        # O que já tinha sido extraído quando o prazo acabou (texto/linhas)
+        self.partial = partial
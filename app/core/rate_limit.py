@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+
+@dataclass
+class Slot:
+    """Uma chamada em andamento; o chamador informa o resultado com `overloaded`/`failed`."""
+    epoch: int
+    started: float
+    overloaded: bool = False
+    failed: bool = False
+
+
+class AsyncRateLimiter:
+    """
+    Janela de chamadas simultâneas + token bucket (chamadas por minuto) para uma cota externa.
+    Deve ser usado sempre a partir do mesmo event loop.
+
+    Com `adaptive`, a janela segue AIMD: cresce ~1 a cada janela de chamadas saudáveis
+    (sem erro e abaixo de `latency_target`) e cai pela metade quando a cota reclama
+    (429/5xx/timeout), no máximo uma vez por rodada de chamadas iniciadas antes do corte.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: float = 0,
+        *,
+        adaptive: bool = False,
+        min_concurrency: int = 1,
+        latency_target: float = 0.0,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.adaptive = adaptive
+        self.latency_target = latency_target
+        # Adaptativo começa no meio do caminho e acha o teto sozinho
+        self.window = float(max(self.min_concurrency, self.max_concurrency // 2) if adaptive else self.max_concurrency)
+        # 0 = sem limite por minuto, só o de simultâneas
+        self.rate = requests_per_minute / 60.0 if requests_per_minute > 0 else 0.0
+        self.capacity = float(self.max_concurrency)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cond: asyncio.Condition | None = None
+        self._bucket_lock: asyncio.Lock | None = None
+        self._epoch = 0
+        self.in_flight = 0
+        self.successes = 0
+        self.overloads = 0
+
+    def _primitives(self) -> tuple[asyncio.Condition, asyncio.Lock]:
+        # Criados no primeiro uso, já dentro do loop dono do limitador
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+            self._bucket_lock = asyncio.Lock()
+        return self._cond, self._bucket_lock  # type: ignore[return-value]
+
+    async def _take_token(self, lock: asyncio.Lock) -> None:
+        if not self.rate:
+            return
+        async with lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def _record(self, slot: Slot) -> None:
+        if slot.overloaded:
+            self.overloads += 1
+            if self.adaptive and slot.epoch == self._epoch:
+                self.window = max(float(self.min_concurrency), self.window / 2)
+                self._epoch += 1
+            return
+        if slot.failed:
+            return
+        self.successes += 1
+        healthy = not self.latency_target or time.monotonic() - slot.started <= self.latency_target
+        if self.adaptive and healthy:
+            self.window = min(float(self.max_concurrency), self.window + 1 / self.window)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[Slot]:
+        cond, lock = self._primitives()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < int(self.window))
+            self.in_flight += 1
+        slot = Slot(epoch=self._epoch, started=time.monotonic())
+        try:
+            await self._take_token(lock)
+            slot.started = time.monotonic()
+            yield slot
+        except BaseException:
+            slot.failed = True
+            raise
+        finally:
+            self._record(slot)
+            self.in_flight -= 1
+            async with cond:
+                cond.notify_all()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "window": int(self.window),
+            "in_flight": self.in_flight,
+            "min_concurrency": self.min_concurrency,
+            "max_concurrency": self.max_concurrency,
+            "adaptive": self.adaptive,
+            "successes": self.successes,
+            "overloads": self.overloads,
+        }
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Iterator
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    seconds: float = 0.0
+    doc_id: str | None = None
+    bytes: int | None = None
+    rows: int | None = None
+    # Só nas etapas de LLM: modelo usado e tokens de entrada/saída
+    model: str | None = None
+    prompt_tokens: int | None = None
+    output_tokens: int | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {k: v for k, v in asdict(self).items() if v is not None}
+
+
+class StageTimer:
+    """
+    Coleta duração (time.monotonic), bytes e linhas por etapa do pipeline e por documento.
+
+    Thread-safe: as threads de extração de um mesmo job registram no mesmo timer.
+    """
+
+    def __init__(self):
+        self._records: list[StageRecord] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, doc_id: str | None = None) -> Iterator[StageRecord]:
+        record = StageRecord(stage=name, doc_id=doc_id)
+        start = time.monotonic()
+        try:
+            yield record
+        finally:
+            record.seconds = round(time.monotonic() - start, 4)
+            with self._lock:
+                self._records.append(record)
+
+    def add(
+        self,
+        name: str,
+        seconds: float,
+        *,
+        doc_id: str | None = None,
+        bytes: int | None = None,  # noqa: A002 - mesmo nome do campo serializado
+        rows: int | None = None,
+    ) -> None:
+        record = StageRecord(stage=name, seconds=round(seconds, 4), doc_id=doc_id, bytes=bytes, rows=rows)
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [r.to_dict() for r in self._records]
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        out: dict[str, dict[str, Any]] = {}
+        for r in self.records():
+            s = out.setdefault(r["stage"], {"count": 0, "seconds": 0.0, "bytes": 0, "rows": 0})
+            s["count"] += 1
+            s["seconds"] = round(s["seconds"] + r["seconds"], 4)
+            s["bytes"] += r.get("bytes") or 0
+            s["rows"] += r.get("rows") or 0
+        return out
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"stages": self.records(), "summary": self.summary()}
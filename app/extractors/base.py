@@ -1,8 +1,16 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
 @dataclass
 class ExtractResult:
     payload: dict[str, Any]
     warnings: list[str]
+    # Tempos das sub-etapas (StageTimer.records()), agregados no job
+    stages: list[dict[str, Any]] = field(default_factory=list)
+    # Resultado incompleto por falha passageira ou limite (OCR que falhou, texto truncado):
+    # serve para este job, mas não vai para o cache de extração
+    degraded: bool = False
+    # Planilha cujas colunas não bateram com o template: colunas, amostra e linhas para o
+    # mapping via LLM, que roda no processo pai (ver `tabular.complete_llm_mapping`)
+    llm_mapping: dict[str, Any] | None = None
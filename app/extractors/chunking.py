@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+# Aproximação de tokens do Gemini para texto pt-BR (sem chamar a API de contagem)
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_pages(text: str, page_starts: list[int] | None = None) -> list[str]:
+    """Quebra o texto do PDF nas páginas; sem offsets (payload antigo) cada linha vira uma unidade."""
+    if page_starts:
+        bounds = [s for s in page_starts if 0 < s < len(text)]
+        edges = [0, *bounds, len(text)]
+        return [text[a:b] for a, b in zip(edges, edges[1:]) if text[a:b].strip()]
+    return [line + "\n" for line in text.split("\n")]
+
+
+def _split_oversized(page: str, max_chars: int) -> list[str]:
+    # Página maior que o trecho: corta em fim de linha e, em último caso, no meio da linha
+    pieces: list[str] = []
+    current = ""
+    for line in page.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int, page_starts: list[int] | None = None) -> list[str]:
+    """
+    Agrupa páginas inteiras em trechos de até `max_tokens` (estimados). Um texto que cabe
+    num trecho volta inteiro, sem cópia.
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks: list[str] = []
+    current = ""
+    for page in split_pages(text, page_starts):
+        for piece in _split_oversized(page, max_chars) if len(page) > max_chars else [page]:
+            if current and len(current) + len(piece) > max_chars:
+                chunks.append(current)
+                current = ""
+            current += piece
+    if current.strip():
+        chunks.append(current)
+    return [c.strip() for c in chunks if c.strip()]
+
+
+def chunk_header(index: int, total: int) -> str:
+    return (
+        f"[Trecho {index} de {total} do documento. Extraia somente o que aparece neste trecho; "
+        "os demais trechos são processados à parte.]\n"
+    )
+
+
+def _row_key(row: dict[str, Any]) -> str:
+    return json.dumps(row, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _boundary_overlap(rows: list[dict[str, Any]], new_rows: list[dict[str, Any]]) -> int:
+    # Maior k em que as k primeiras linhas do trecho novo repetem as k últimas já juntadas
+    keys = [_row_key(r) for r in rows[-len(new_rows):]] if new_rows else []
+    new_keys = [_row_key(r) for r in new_rows]
+    for k in range(min(len(keys), len(new_keys)), 0, -1):
+        if keys[-k:] == new_keys[:k]:
+            return k
+    return 0
+
+
+def merge_structured_responses(responses: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Junta as respostas ({"kv", "tables", "notes"}) dos trechos, na ordem do documento:
+    no `kv` vale o primeiro valor não vazio de cada campo; as linhas de cada tabela são
+    concatenadas. Só a emenda entre trechos é deduplicada: linhas do início de um trecho
+    idênticas às do fim do anterior (linha repetida na fronteira) entram uma vez. Linhas
+    iguais dentro de um mesmo trecho são mantidas (podem ser lançamentos legítimos).
+    """
+    kv: dict[str, dict[str, Any]] = {}
+    tables: dict[str, list[dict[str, Any]]] = {}
+    notes: list[str] = []
+
+    for resp in responses:
+        for sheet, fields in (resp.get("kv") or {}).items():
+            target = kv.setdefault(sheet, {})
+            for field, value in (fields or {}).items():
+                if value in (None, "") or target.get(field) not in (None, ""):
+                    continue
+                target[field] = value
+
+        for t in resp.get("tables") or []:
+            name = t.get("table")
+            if not name:
+                continue
+            rows = tables.setdefault(name, [])
+            new_rows = list(t.get("rows") or [])
+            rows.extend(new_rows[_boundary_overlap(rows, new_rows):])
+
+        if resp.get("notes"):
+            notes.append(resp["notes"])
+
+    return {
+        "kv": kv,
+        "tables": [{"table": name, "rows": rows} for name, rows in tables.items()],
+        "notes": "\n".join(notes) or None,
+    }
@@ -1,53 +1,239 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import threading
+from dataclasses import dataclass, field
 from typing import Any, Type
 
 from google import genai
+from google.genai import errors as genai_errors
 from google.genai import types
 from pydantic import BaseModel
 
 from app.core.config import settings
 from app.core.errors import UpstreamError
+from app.core.rate_limit import AsyncRateLimiter
+from app.extractors.chunking import estimate_tokens
+from app.extractors.llm_cache import LlmResponseCache, llm_cache_key
+
+@dataclass
+class LlmUsage:
+    """Tokens gastos por um documento, somados entre as chamadas (trechos) que ele fez."""
+    estimated_prompt_tokens: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    calls: int = 0
+    cached_calls: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, estimated: int, prompt: int = 0, output: int = 0, *, cached: bool = False) -> None:
+        with self._lock:
+            self.estimated_prompt_tokens += estimated
+            self.prompt_tokens += prompt
+            self.output_tokens += output
+            self.calls += 1
+            self.cached_calls += int(cached)
+
+    def as_dict(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "estimated_prompt_tokens": self.estimated_prompt_tokens,
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "calls": self.calls,
+                "cached_calls": self.cached_calls,
+            }
+
+
+def select_gemini_model(prompt_tokens: int) -> str:
+    """Documentos pequenos vão para o modelo mais barato/rápido; o resto para GEMINI_MODEL."""
+    if settings.GEMINI_SMALL_MODEL and prompt_tokens <= settings.GEMINI_SMALL_MODEL_MAX_TOKENS:
+        return settings.GEMINI_SMALL_MODEL
+    return settings.GEMINI_MODEL
+
 
 class GeminiClient:
-    def __init__(self):
+    """
+    Cliente do Gemini compartilhado pelo processo (ver `get_gemini_client`): uma única conexão,
+    um único limitador de cota e, com LLM_CACHE_ENABLED, o cache local de respostas. As chamadas
+    rodam na API assíncrona do SDK, num event loop próprio em thread de fundo;
+    `generate_structured` é a porta síncrona para as threads de extração.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int | None = None,
+        requests_per_minute: float | None = None,
+        adaptive: bool | None = None,
+        cache: LlmResponseCache | None = None,
+    ):
         self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        self.cache = cache if cache is not None else _default_cache()
+        self.limiter = AsyncRateLimiter(
+            max_concurrency if max_concurrency is not None else settings.GEMINI_MAX_CONCURRENCY,
+            requests_per_minute if requests_per_minute is not None else settings.GEMINI_REQUESTS_PER_MINUTE,
+            adaptive=adaptive if adaptive is not None else settings.GEMINI_ADAPTIVE_CONCURRENCY,
+            min_concurrency=settings.GEMINI_MIN_CONCURRENCY,
+            latency_target=settings.GEMINI_LATENCY_TARGET_SECONDS,
+        )
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_lock = threading.Lock()
 
-    def generate_structured(self, prompt: str, schema_model: Type[BaseModel]) -> dict[str, Any]:
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="aida-gemini", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def generate_structured(
+        self,
+        prompt: str,
+        schema_model: Type[BaseModel],
+        timeout: float | None = None,
+        *,
+        model: str | None = None,
+        usage: LlmUsage | None = None,
+    ) -> dict[str, Any]:
+        future = asyncio.run_coroutine_threadsafe(
+            self._generate(prompt, schema_model, timeout, model, usage), self._background_loop()
+        )
+        return future.result()
+
+    async def agenerate_structured(
+        self,
+        prompt: str,
+        schema_model: Type[BaseModel],
+        timeout: float | None = None,
+        *,
+        model: str | None = None,
+        usage: LlmUsage | None = None,
+    ) -> dict[str, Any]:
+        # O limitador pertence ao loop de fundo; quem está em outro loop só aguarda o resultado
+        future = asyncio.run_coroutine_threadsafe(
+            self._generate(prompt, schema_model, timeout, model, usage), self._background_loop()
+        )
+        return await asyncio.wrap_future(future)
+
+    async def _generate(
+        self,
+        prompt: str,
+        schema_model: Type[BaseModel],
+        timeout: float | None,
+        model: str | None,
+        usage: LlmUsage | None,
+    ) -> dict[str, Any]:
+        model = model or settings.GEMINI_MODEL
+        estimated = estimate_tokens(prompt)
         schema = schema_model.model_json_schema()
+        cache_key = llm_cache_key(prompt, schema, model) if self.cache else None
+        if cache_key:
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                if usage is not None:
+                    usage.add(estimated, cached=True)
+                return cached
+
+        timeout = timeout if timeout is not None else settings.GEMINI_TIMEOUT_SECONDS
+        # Prazo encurtado pelo deadline do documento não diz nada sobre a saúde da cota
+        full_timeout = timeout >= settings.GEMINI_TIMEOUT_SECONDS
         cfg = types.GenerateContentConfig(
             response_mime_type="application/json",
             response_json_schema=schema,
+            http_options=types.HttpOptions(timeout=max(1, int(timeout * 1000))),
         )
         try:
-            resp = self.client.models.generate_content(
-                model=settings.GEMINI_MODEL,
-                contents=prompt,
-                config=cfg,
-            )
+            # A espera pela cota conta no mesmo prazo da chamada
+            async with asyncio.timeout(timeout):
+                async with self.limiter.slot() as slot:
+                    try:
+                        resp = await self.client.aio.models.generate_content(
+                            model=model,
+                            contents=prompt,
+                            config=cfg,
+                        )
+                    except asyncio.CancelledError:
+                        # Cortada pelo timeout cheio com a cota já liberada: sinal de saturação
+                        slot.overloaded = full_timeout
+                        raise
+                    except Exception as e:
+                        slot.overloaded = _is_overload(e)
+                        raise
+        except TimeoutError:
+            raise UpstreamError("Timeout ao chamar Gemini.", details={"timeout_seconds": timeout})
         except Exception as e:
             raise UpstreamError("Falha ao chamar Gemini.", details=str(e))
 
-        raw = getattr(resp, "text", None) or ""
-        raw = raw.strip()
-        if not raw:
-            try:
-                raw = resp.candidates[0].content.parts[0].text.strip()  # type: ignore
-            except Exception:
-                raw = ""
+        result = _parse_response(resp, schema_model, model)
+        if usage is not None:
+            meta = getattr(resp, "usage_metadata", None)
+            usage.add(
+                estimated,
+                getattr(meta, "prompt_token_count", None) or 0,
+                getattr(meta, "candidates_token_count", None) or 0,
+            )
+        if cache_key:
+            await asyncio.to_thread(self.cache.put, cache_key, result)
+        return result
 
-        if not raw:
-            raise UpstreamError("Gemini retornou vazio.", details={"model": settings.GEMINI_MODEL})
 
-        try:
-            data = json.loads(raw)
-        except Exception as e:
-            raise UpstreamError("Gemini retornou JSON inválido.", details={"err": str(e), "raw": raw[:1200]})
+def _default_cache() -> LlmResponseCache | None:
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    return LlmResponseCache(
+        settings.LLM_CACHE_PATH,
+        max_bytes=settings.LLM_CACHE_MAX_MB * 1024 * 1024,
+        ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    )
+
+
+def _is_overload(exc: Exception) -> bool:
+    # 429 (cota) e 5xx (sobrecarga do serviço) reduzem a janela; 4xx de request ruim não
+    return isinstance(exc, genai_errors.APIError) and (exc.code == 429 or exc.code >= 500)
 
+
+def _parse_response(resp: Any, schema_model: Type[BaseModel], model: str) -> dict[str, Any]:
+    raw = getattr(resp, "text", None) or ""
+    raw = raw.strip()
+    if not raw:
         try:
-            obj = schema_model.model_validate(data)
-        except Exception as e:
-            raise UpstreamError("Gemini retornou payload fora do schema.", details=str(e))
+            raw = resp.candidates[0].content.parts[0].text.strip()  # type: ignore
+        except Exception:
+            raw = ""
+
+    if not raw:
+        raise UpstreamError("Gemini retornou vazio.", details={"model": model})
+
+    try:
+        data = json.loads(raw)
+    except Exception as e:
+        raise UpstreamError("Gemini retornou JSON inválido.", details={"err": str(e), "raw": raw[:1200]})
+
+    try:
+        obj = schema_model.model_validate(data)
+    except Exception as e:
+        raise UpstreamError("Gemini retornou payload fora do schema.", details=str(e))
+
+    return obj.model_dump()
+
+
+_client: GeminiClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client() -> GeminiClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient()
+        return _client
+
 
-        return obj.model_dump()
+def gemini_limiter_snapshot() -> dict[str, Any] | None:
+    """Estado do limitador deste processo, sem criar o cliente: None se o Gemini ainda não foi usado."""
+    with _client_lock:
+        client = _client
+    return client.limiter.snapshot() if client is not None else None
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at);
+"""
+
+
+def llm_cache_key(prompt: str, schema: dict[str, Any], model: str) -> str:
+    h = hashlib.sha256()
+    for part in (model, json.dumps(schema, sort_keys=True, ensure_ascii=False), prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LlmResponseCache:
+    """
+    Respostas já validadas do Gemini num SQLite local, com TTL e descarte LRU por tamanho.
+    Compartilhável entre threads e entre os processos do pool (WAL). Falhas do cache só
+    geram log: a chamada segue para a API.
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int, ttl_seconds: float):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+        except Exception:
+            logger.warning("Falha ao ler o cache de respostas do LLM.", exc_info=True)
+            return None
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        raw = json.dumps(value, ensure_ascii=False, default=str)
+        size = len(raw.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, raw, size, now, now),
+                )
+                self._evict(conn, now)
+        except Exception:
+            logger.warning("Falha ao gravar no cache de respostas do LLM.", exc_info=True)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Remove os menos usados recentemente até caber no limite
+        excess = total - self.max_bytes
+        freed = 0
+        victims: list[str] = []
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at ASC").fetchall():
+            victims.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM llm_cache WHERE key = ?", [(k,) for k in victims])
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            entries, total = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+        return {"entries": entries, "bytes": total, "max_bytes": self.max_bytes}
@@ -8,7 +8,7 @@ from pydantic import BaseModel, Field
 
 from app.core.br_formats import normalize_header, parse_brl_money, parse_date_br, parse_int, parse_float
 from app.core.utils import normalize_whitespace
-from app.extractors.gemini import GeminiClient
+from app.extractors.gemini import get_gemini_client
 from app.template.specs import TableSpec
 
 class TransformKind(str):
@@ -75,36 +75,54 @@ def _infer_transform(target_name: str) -> str:
         return TransformKind.PARSE_FLOAT
     return TransformKind.NONE
 
-def map_dataframe_to_template_rows(spec: TableSpec, df: pd.DataFrame) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+def request_llm_mapping(
+    spec: TableSpec, columns: list[str], sample_rows: list[dict[str, Any]], timeout: float | None = None
+) -> dict[str, Any]:
+    """Pede ao Gemini o mapeamento coluna de origem -> letra do template (com transformação)."""
+    client = get_gemini_client()
+    prompt = _build_mapping_prompt(spec, columns, sample_rows)
+    return client.generate_structured(prompt, ColumnMappingResponse, timeout=timeout)
+
+def apply_llm_mapping(
+    resp: dict[str, Any], records: list[dict[str, Any]]
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    llm_map: dict[str, str | None] = {}
+    llm_transform: dict[str, str] = {}
+    for item in resp["mapping"]:
+        llm_map[item["source"]] = item.get("target_col")
+        llm_transform[item["source"]] = item.get("transform") or TransformKind.NONE
+
+    rows = []
+    for row in records:
+        out: dict[str, Any] = {}
+        for src_col, target_letter in llm_map.items():
+            if not target_letter:
+                continue
+            v = row.get(src_col)
+            out[target_letter] = _apply_transform(v, llm_transform.get(src_col, TransformKind.NONE))
+        if any(v is not None and v != "" for v in out.values()):
+            rows.append(out)
+    return rows, {"mapping": resp, "warnings": ["Mapping via LLM (colunas não bateram 1:1)."]}
+
+def map_dataframe_to_template_rows(
+    spec: TableSpec, df: pd.DataFrame, allow_llm: bool = True
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
     columns = list(df.columns)
     mapping = _heuristic_match(columns, spec)
     warnings: list[str] = []
 
     hit_rate = sum(1 for v in mapping.values() if v) / max(1, len(columns))
+    if hit_rate < 0.50 and not allow_llm:
+        # Quem chamou tem outro caminho (ex.: PDF -> Gemini, ou o LLM no processo pai); não gasta chamada aqui
+        return [], {
+            "mapping": mapping,
+            "warnings": ["Colunas não bateram com o template."],
+            "hit_rate": hit_rate,
+            "needs_llm": True,
+        }
     if hit_rate < 0.50:
-        client = GeminiClient()
-        sample_rows = df.head(5).fillna("").to_dict(orient="records")
-        prompt = _build_mapping_prompt(spec, columns, sample_rows)
-        resp = client.generate_structured(prompt, ColumnMappingResponse)
-        llm_map: dict[str, str | None] = {}
-        llm_transform: dict[str, str] = {}
-        for item in resp["mapping"]:
-            llm_map[item["source"]] = item.get("target_col")
-            llm_transform[item["source"]] = item.get("transform") or TransformKind.NONE
-        mapping = llm_map
-        warnings.append("Mapping via LLM (colunas não bateram 1:1).")
-
-        rows = []
-        for _, row in df.iterrows():
-            out: dict[str, Any] = {}
-            for src_col, target_letter in mapping.items():
-                if not target_letter:
-                    continue
-                v = row.get(src_col)
-                out[target_letter] = _apply_transform(v, llm_transform.get(src_col, TransformKind.NONE))
-            if any(v is not None and v != "" for v in out.values()):
-                rows.append(out)
-        return rows, {"mapping": resp, "warnings": warnings}
+        resp = request_llm_mapping(spec, columns, df.head(5).fillna("").to_dict(orient="records"))
+        return apply_llm_mapping(resp, df.to_dict(orient="records"))
 
     name_by_letter = {letter: name for letter, name in spec.columns}
     rows = []
@@ -118,7 +136,7 @@ def map_dataframe_to_template_rows(spec: TableSpec, df: pd.DataFrame) -> tuple[l
         if any(v is not None and v != "" for v in out.values()):
             rows.append(out)
 
-    return rows, {"mapping": mapping, "warnings": warnings}
+    return rows, {"mapping": mapping, "warnings": warnings, "hit_rate": hit_rate}
 
 def _build_mapping_prompt(spec: TableSpec, columns: list[str], sample_rows: list[dict[str, Any]]) -> str:
     template_cols = [{"col": c, "name": n} for c, n in spec.columns]
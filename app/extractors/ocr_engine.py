@@ -0,0 +1,76 @@
+"""
+Backend de OCR de uma página (PIL Image -> texto).
+
+- tesserocr (opcional): engine tesseract carregado uma vez por thread de OCR e reutilizado
+  entre páginas e documentos, sem subprocesso nem arquivo temporário por página.
+- pytesseract: um processo `tesseract` por página (comportamento original, sempre disponível).
+
+OCR_ENGINE=auto usa tesserocr quando o pacote está instalado e cai no pytesseract caso contrário.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+
+# O paralelismo vem das threads de OCR (OCR_WORKERS); sem isso o OpenMP do tesseract abre
+# uma thread por core em cada página e os workers competem entre si. Vale para os dois
+# engines: o processo `tesseract` do pytesseract herda a variável e a libtesseract do
+# tesserocr a lê quando é carregada, por isso precisa vir antes do import abaixo.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import pytesseract
+
+from app.core.config import settings
+from app.extractors.ocr_profiles import OcrProfile
+
+try:  # dependência opcional: precisa de libtesseract-dev/libleptonica-dev para compilar
+    import tesserocr
+except ImportError:  # pragma: no cover - depende do ambiente
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def ocr_engine_name() -> str:
+    engine = settings.OCR_ENGINE
+    if engine == "tesserocr" and tesserocr is None:
+        logger.warning("OCR_ENGINE=tesserocr mas o pacote não está instalado; usando pytesseract")
+        return "pytesseract"
+    if engine == "auto":
+        return "tesserocr" if tesserocr is not None else "pytesseract"
+    return "tesserocr" if engine == "tesserocr" else "pytesseract"
+
+
+def _tesserocr_api(profile: OcrProfile):
+    # Uma instância por thread e por (idioma, psm, oem): a API do tesseract não é thread-safe
+    apis = getattr(_local, "apis", None)
+    if apis is None:
+        apis = _local.apis = {}
+    key = (profile.lang, profile.psm, profile.oem, profile.extra_config)
+    api = apis.get(key)
+    if api is None:
+        kwargs: dict = {"lang": profile.lang}
+        if profile.psm is not None:
+            kwargs["psm"] = profile.psm
+        if profile.oem is not None:
+            kwargs["oem"] = profile.oem
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        # Só as opções "-c nome=valor" têm equivalente na API
+        for opt in profile.extra_config:
+            if opt.startswith("-c ") and "=" in opt:
+                name, value = opt[3:].split("=", 1)
+                api.SetVariable(name.strip(), value.strip())
+        apis[key] = api
+    return api
+
+
+def ocr_image(img, profile: OcrProfile) -> str:
+    if ocr_engine_name() == "tesserocr":
+        api = _tesserocr_api(profile)
+        api.SetImage(img)
+        return api.GetUTF8Text()
+    # lang='por' usa o pacote tesseract-ocr-por instalado no Dockerfile
+    return pytesseract.image_to_string(img, lang=profile.lang, config=profile.tesseract_config())
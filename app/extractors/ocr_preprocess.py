@@ -0,0 +1,107 @@
+"""
+Pré-processamento de páginas escaneadas antes do OCR (Pillow + NumPy).
+
+Cinza -> redução ao DPI alvo -> corte de bordas -> binarização (Otsu) -> deskew.
+Imagem menor e limpa reduz o tempo do tesseract por página e melhora o rendimento.
+"""
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from app.extractors.ocr_profiles import OcrProfile
+
+# Deskew: ângulos testados (graus) e largura da imagem usada para estimar a inclinação
+_DESKEW_MAX_ANGLE = 5.0
+_DESKEW_STEP = 0.5
+_DESKEW_SAMPLE_WIDTH = 800
+# Linha/coluna de borda com mais que isso de pixels escuros é sombra do scanner
+_BORDER_DARK_RATIO = 0.6
+_CROP_MARGIN = 10
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = gray.size
+    cum_count = np.cumsum(hist)
+    cum_mean = np.cumsum(hist * np.arange(256))
+    global_mean = cum_mean[-1] / total
+    w0 = cum_count / total
+    w1 = 1.0 - w0
+    valid = (w0 > 0) & (w1 > 0)
+    between = np.zeros(256)
+    mu0 = np.divide(cum_mean, cum_count, out=np.zeros(256), where=cum_count > 0)
+    between[valid] = w0[valid] * w1[valid] * ((mu0[valid] - global_mean) / w1[valid]) ** 2
+    # Níveis sem pixels entre as classes dão o mesmo valor: usa o meio do platô
+    best = np.flatnonzero(np.isclose(between, between.max()))
+    return int((best[0] + best[-1] + 1) // 2)
+
+
+def _crop_borders(gray: np.ndarray, threshold: int) -> np.ndarray:
+    dark = gray < threshold
+    rows = dark.mean(axis=1)
+    cols = dark.mean(axis=0)
+
+    top, bottom = 0, len(rows)
+    while top < bottom and rows[top] > _BORDER_DARK_RATIO:
+        top += 1
+    while bottom > top and rows[bottom - 1] > _BORDER_DARK_RATIO:
+        bottom -= 1
+    left, right = 0, len(cols)
+    while left < right and cols[left] > _BORDER_DARK_RATIO:
+        left += 1
+    while right > left and cols[right - 1] > _BORDER_DARK_RATIO:
+        right -= 1
+
+    inner = dark[top:bottom, left:right]
+    ys, xs = np.nonzero(inner)
+    if not len(ys):
+        return gray
+    y0 = max(top + ys.min() - _CROP_MARGIN, 0)
+    y1 = min(top + ys.max() + _CROP_MARGIN + 1, gray.shape[0])
+    x0 = max(left + xs.min() - _CROP_MARGIN, 0)
+    x1 = min(left + xs.max() + _CROP_MARGIN + 1, gray.shape[1])
+    return gray[y0:y1, x0:x1]
+
+
+def estimate_skew(binary: Image.Image) -> float:
+    """Ângulo (graus) que deixa as linhas de texto horizontais: maximiza a variância das somas por linha."""
+    sample = binary
+    if binary.width > _DESKEW_SAMPLE_WIDTH:
+        ratio = _DESKEW_SAMPLE_WIDTH / binary.width
+        sample = binary.resize((_DESKEW_SAMPLE_WIDTH, max(1, round(binary.height * ratio))))
+    inverted = ImageOps.invert(sample)  # texto = branco, para o fill de rotação (preto) não contar
+
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-_DESKEW_MAX_ANGLE, _DESKEW_MAX_ANGLE + _DESKEW_STEP / 2, _DESKEW_STEP):
+        rotated = np.asarray(inverted.rotate(float(angle), resample=Image.NEAREST, fillcolor=0))
+        score = float(np.var(rotated.sum(axis=1, dtype=np.float64)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess_page(img: Image.Image, profile: OcrProfile) -> Image.Image:
+    """Retorna uma nova imagem pronta para o OCR; a original não é fechada aqui."""
+    page = ImageOps.grayscale(img) if img.mode != "L" else img
+
+    if profile.target_dpi and profile.target_dpi < profile.dpi:
+        ratio = profile.target_dpi / profile.dpi
+        page = page.resize((max(1, round(page.width * ratio)), max(1, round(page.height * ratio))), Image.LANCZOS)
+
+    gray = np.asarray(page)
+    threshold = otsu_threshold(gray)
+    if profile.crop_borders:
+        gray = _crop_borders(gray, threshold)
+
+    if profile.binarize:
+        page = Image.fromarray(np.where(gray < threshold, 0, 255).astype(np.uint8))
+    else:
+        page = Image.fromarray(gray)
+
+    if profile.deskew:
+        binary = page if profile.binarize else Image.fromarray(np.where(gray < threshold, 0, 255).astype(np.uint8))
+        angle = estimate_skew(binary)
+        if angle:
+            page = page.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    return page
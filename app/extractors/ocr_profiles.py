@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from app.core.config import settings
+from app.models.enums import DocType
+
+
+@dataclass(frozen=True)
+class OcrProfile:
+    """Parâmetros de rasterização (pdf2image) e reconhecimento (tesseract) de um OCR."""
+
+    name: str
+    dpi: int = 200
+    fmt: str = "jpeg"
+    grayscale: bool = False
+    # Threads do pdftoppm por lote (o paralelismo principal já é OCR_WORKERS)
+    raster_threads: int = 1
+    # Páginas rasterizadas mais largas que isso (px) são reduzidas antes do OCR; None mantém o tamanho do DPI
+    max_width: int | None = None
+    psm: int | None = None
+    oem: int | None = None
+    lang: str = "por"
+    extra_config: tuple[str, ...] = field(default_factory=tuple)
+    # Pré-processamento da página antes do OCR (app/extractors/ocr_preprocess.py)
+    preprocess: bool = False
+    binarize: bool = True
+    deskew: bool = False
+    crop_borders: bool = True
+    # DPI efetivo entregue ao tesseract (reduz páginas rasterizadas acima disso)
+    target_dpi: int | None = None
+
+    def tesseract_config(self) -> str:
+        opts: list[str] = []
+        if self.psm is not None:
+            opts.append(f"--psm {self.psm}")
+        if self.oem is not None:
+            opts.append(f"--oem {self.oem}")
+        opts.extend(self.extra_config)
+        return " ".join(opts)
+
+    def convert_kwargs(self) -> dict:
+        return {
+            "dpi": self.dpi,
+            "fmt": self.fmt,
+            "grayscale": self.grayscale,
+            "thread_count": self.raster_threads,
+        }
+
+
+OCR_PROFILES: dict[str, OcrProfile] = {
+    # Equivalente ao comportamento original (jpeg colorido, DPI padrão do pdf2image)
+    "default": OcrProfile(name="default"),
+    # Vazão: DPI menor, cinza, página como bloco único de texto
+    "fast": OcrProfile(name="fast", dpi=150, grayscale=True, max_width=1700, psm=6, oem=1),
+    # Precisão: DPI alto em png (sem artefatos de jpeg), segmentação automática
+    "accurate": OcrProfile(name="accurate", dpi=300, fmt="png", grayscale=True, psm=3, oem=1),
+    # Scans ruins (coloridos, tortos, com sombra): limpa a página antes do tesseract
+    "scan": OcrProfile(
+        name="scan", dpi=300, fmt="png", grayscale=True, psm=3, oem=1,
+        preprocess=True, deskew=True, target_dpi=250,
+    ),
+}
+
+
+def get_ocr_profile(doc_type: DocType | str | None = None) -> OcrProfile:
+    """Perfil de OCR do doc_type (OCR_PROFILE_BY_DOC_TYPE) ou o padrão OCR_PROFILE."""
+    key = doc_type.value if isinstance(doc_type, DocType) else doc_type
+    name = settings.OCR_PROFILE_BY_DOC_TYPE.get(key or "", settings.OCR_PROFILE)
+    return OCR_PROFILES.get(name) or OCR_PROFILES["default"]
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Literal
+
+from app.core.config import settings
+
+PdfKind = Literal["native", "scanned", "hybrid"]
+
+# Página cuja(s) imagem(ns) cobrem pelo menos isso da área é uma página escaneada
+_SCAN_IMAGE_COVERAGE = 0.5
+
+
+@dataclass
+class PageSignal:
+    page_number: int
+    chars: int
+    fonts: int
+    image_coverage: float
+
+    @property
+    def has_text(self) -> bool:
+        return self.chars >= settings.OCR_MIN_PAGE_CHARS and self.fonts > 0
+
+    @property
+    def is_scan(self) -> bool:
+        return not self.has_text and self.image_coverage >= _SCAN_IMAGE_COVERAGE
+
+
+@dataclass
+class PdfClassification:
+    kind: PdfKind
+    total_pages: int
+    samples: list[PageSignal] = field(default_factory=list)
+
+
+def _sample_indexes(total: int, n: int) -> list[int]:
+    """Primeira, última e páginas espalhadas pelo meio (0-based, sem repetir)."""
+    if total <= n:
+        return list(range(total))
+    if n == 1:
+        return [0]
+    step = (total - 1) / (n - 1)
+    return sorted({round(i * step) for i in range(n)})
+
+
+def _page_signal(page) -> PageSignal:
+    try:
+        chars = page.chars
+        area = float(page.width * page.height) or 1.0
+        covered = 0.0
+        for img in page.images:
+            w = max(0.0, min(img["x1"], page.width) - max(img["x0"], 0))
+            h = max(0.0, min(img["bottom"], page.height) - max(img["top"], 0))
+            covered += w * h
+        return PageSignal(
+            page_number=page.page_number,
+            chars=sum(1 for c in chars if not c.get("text", "").isspace()),
+            fonts=len({c.get("fontname") for c in chars}),
+            image_coverage=min(1.0, covered / area),
+        )
+    except Exception:
+        # Página que o pdfplumber não consegue ler é tratada como imagem
+        return PageSignal(page_number=page.page_number, chars=0, fonts=0, image_coverage=1.0)
+    finally:
+        page.close()
+
+
+def classify_pdf(pdf, sample_pages: int | None = None) -> PdfClassification:
+    """
+    Classifica o PDF olhando só algumas páginas (camada de texto, fontes, cobertura de imagem):
+
+    - native: todas as amostras têm texto nativo;
+    - scanned: todas as amostras são imagem sem texto -> OCR direto, sem passar o pdfplumber no resto;
+    - hybrid: mistura (ou inconclusivo) -> decisão página a página.
+    """
+    pages = pdf.pages
+    n = max(1, sample_pages or settings.PDF_CLASSIFY_SAMPLE_PAGES)
+    samples = [_page_signal(pages[i]) for i in _sample_indexes(len(pages), n)]
+
+    if samples and all(s.is_scan for s in samples):
+        kind: PdfKind = "scanned"
+    elif samples and all(s.has_text for s in samples):
+        kind = "native"
+    else:
+        kind = "hybrid"
+    return PdfClassification(kind=kind, total_pages=len(pages), samples=samples)
@@ -1,32 +1,127 @@
 from __future__ import annotations
-import pytesseract
-from pdf2image import convert_from_bytes
-from app.core.errors import ExtractionError
 
-def ocr_pdf_or_images(content: bytes) -> str:
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.extractors.ocr_engine import ocr_image
+from app.extractors.ocr_preprocess import preprocess_page
+from app.extractors.ocr_profiles import OcrProfile, get_ocr_profile
+
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool() -> ThreadPoolExecutor:
+    # Threads de OCR vivem com o processo: o engine carregado em cada uma (tesserocr)
+    # é reaproveitado entre documentos
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, settings.OCR_WORKERS), thread_name_prefix="ocr")
+        return _pool
+
+
+def _ocr_page(img, profile: OcrProfile) -> str:
+    try:
+        if profile.max_width and img.width > profile.max_width:
+            # Só reduz páginas maiores que o limite; as menores seguem no DPI do perfil
+            page = img.resize((profile.max_width, max(1, round(img.height * profile.max_width / img.width))))
+            img.close()
+            img = page
+        if profile.preprocess:
+            page = preprocess_page(img, profile)
+            img.close()
+            img = page
+        return ocr_image(img, profile)
+    finally:
+        img.close()
+
+
+def _page_batches(pages: list[int], batch_pages: int) -> list[tuple[int, int]]:
+    """Agrupa páginas em faixas contíguas (first_page, last_page) de até batch_pages."""
+    batches: list[tuple[int, int]] = []
+    for n in sorted(set(pages)):
+        if batches and n == batches[-1][1] + 1 and n - batches[-1][0] < batch_pages:
+            batches[-1] = (batches[-1][0], n)
+        else:
+            batches.append((n, n))
+    return batches
+
+
+def ocr_pages(
+    content: bytes,
+    pages: list[int] | None = None,
+    *,
+    workers: int | None = None,
+    batch_pages: int | None = None,
+    max_pages: int | None = None,
+    profile: OcrProfile | None = None,
+    deadline: Deadline | None = None,
+) -> dict[int, str]:
     """
-    Converte PDF (bytes) em imagens e executa OCR (Tesseract) em cada página.
-    Retorna o texto consolidado.
+    OCR das páginas indicadas (1-based; None = todas). Retorna {página: texto}.
+    Se o `deadline` acabar, para de rasterizar e devolve só as páginas já reconhecidas.
+
+    As páginas são rasterizadas em lotes (first_page/last_page) e o OCR roda no pool de
+    OCR_WORKERS threads do processo; só uma janela limitada de imagens fica em memória.
     """
+    profile = profile or get_ocr_profile()
+    own_workers = workers
+    workers = max(1, workers or settings.OCR_WORKERS)
+    batch_pages = max(1, batch_pages or settings.OCR_BATCH_PAGES)
+    # Imagens vivas no máximo: as em OCR/esperando + um lote sendo rasterizado
+    window = max(workers * 2, batch_pages)
+
+    if pages is None:
+        total_pages = int(pdfinfo_from_bytes(content)["Pages"])
+        pages = list(range(1, min(total_pages, max_pages or total_pages) + 1))
+
+    results: dict[int, str] = {}
+    pending: deque[tuple[int, Future]] = deque()
+
+    def collect_oldest() -> bool:
+        page_no, fut = pending[0]
+        try:
+            text = fut.result(timeout=deadline.remaining() if deadline else None)
+        except FutureTimeoutError:
+            return False
+        pending.popleft()
+        results[page_no] = text
+        return True
+
+    # Pool dedicado só quando o chamador pede um número de workers (ex.: benchmark)
+    own_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr") if own_workers else None
+    pool = own_pool or _shared_pool()
     try:
-        # Converte PDF em lista de imagens (PIL Images)
-        # fmt="jpeg" geralmente é mais rápido que ppm padrão
-        images = convert_from_bytes(content, fmt="jpeg")
-        
-        extracted_text = []
-        
-        for i, img in enumerate(images):
-            # lang='por' usa o pacote tesseract-ocr-por instalado no Dockerfile
-            text = pytesseract.image_to_string(img, lang='por')
-            if text.strip():
-                extracted_text.append(f"--- PÁGINA {i+1} (OCR) ---\n{text}")
-        
-        full_text = "\n".join(extracted_text)
-        return full_text.strip()
-
-    except Exception as e:
-        # Se falhar (ex: arquivo corrompido, falta de memória), lançamos erro específico
-        raise ExtractionError(
-            "Falha ao realizar OCR no documento.",
-            details={"error": str(e)}
-        )
\ No newline at end of file
+        for first, last in _page_batches(pages, batch_pages):
+            while pending and len(pending) + (last - first + 1) > window:
+                if not collect_oldest():
+                    return results
+            if deadline and deadline.expired:
+                break
+            images = convert_from_bytes(
+                content, first_page=first, last_page=last, **profile.convert_kwargs()
+            )
+            for offset, img in enumerate(images):
+                pending.append((first + offset, pool.submit(_ocr_page, img, profile)))
+        while pending:
+            if not collect_oldest():
+                break
+    finally:
+        for _, fut in pending:
+            fut.cancel()
+        if own_pool is not None:
+            own_pool.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def format_ocr_page(page_no: int, text: str) -> str:
+    return f"--- PÁGINA {page_no} (OCR) ---\n{text}"
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import io
+import re
+from typing import Any
+
+import pandas as pd
+import pdfplumber
+
+from app.core.config import settings
+from app.core.timing import StageTimer
+from app.core.utils import normalize_whitespace
+from app.extractors.base import ExtractResult
+from app.extractors.mapping import map_dataframe_to_template_rows
+from app.extractors.tabular import SPEC_BY_DOC_TYPE
+from app.models.enums import DocType
+
+# Relatórios de ERP exportados em PDF: a tabela costuma vir limpa o bastante para o pdfplumber
+PDF_TABLE_DOC_TYPES = frozenset({DocType.RECEBIVEIS, DocType.ENDIVIDAMENTO, DocType.TABELA_VENDAS})
+
+# Célula que é só um valor: número, dinheiro, percentual ou data ("101", "R$ 1.000,00", "10/01/2024")
+_VALUE_CELL = re.compile(r"^-?\s*(?:r\$\s*)?[\d.,/%-]*\d[\d.,/%-]*$", re.IGNORECASE)
+
+
+def _clean_row(row: list[Any]) -> list[str]:
+    return [normalize_whitespace(str(c)) if c is not None else "" for c in row]
+
+
+def _read_tables(content: bytes) -> list[list[list[str]]]:
+    tables: list[list[list[str]]] = []
+    with pdfplumber.open(io.BytesIO(content)) as pdf:
+        for page in pdf.pages[: settings.PDF_MAX_PAGES]:
+            try:
+                for table in page.extract_tables():
+                    rows = [_clean_row(r) for r in table]
+                    rows = [r for r in rows if any(r)]
+                    # Tabela de uma linha só vale como continuação (ver `_candidates`)
+                    if rows:
+                        tables.append(rows)
+            finally:
+                page.close()
+    return tables
+
+
+def _has_values(row: list[str]) -> bool:
+    return any(_VALUE_CELL.match(c) for c in row)
+
+
+def _continues(header: list[str], first: list[str]) -> bool:
+    if len(first) != len(header):
+        return False
+    if first == header:
+        return True
+    # Sem cabeçalho repetido, só é continuação se a primeira linha for claramente dado:
+    # tem valores onde o cabeçalho do grupo só tem rótulos
+    return _has_values(first) and not _has_values(header)
+
+
+def _candidates(tables: list[list[list[str]]]) -> list[pd.DataFrame]:
+    """
+    Junta as tabelas que continuam de uma página para outra (mesma largura e cabeçalho
+    repetido, ou primeira linha que já é dado) e devolve um DataFrame por tabela lógica,
+    na ordem do documento. Tabela de uma linha só entra como continuação da anterior.
+    """
+    groups: list[tuple[list[str], list[list[str]]]] = []
+    for rows in tables:
+        if groups and _continues(groups[-1][0], rows[0]):
+            header, body = groups[-1]
+            body.extend(rows[1:] if rows[0] == header else rows)
+        elif len(rows) >= 2:
+            groups.append((rows[0], rows[1:]))
+
+    frames: list[pd.DataFrame] = []
+    for header, body in groups:
+        columns: list[str] = []
+        for i, name in enumerate(header):
+            name = name or f"coluna_{i + 1}"
+            columns.append(name if name not in columns else f"{name}_{i + 1}")
+        if body:
+            frames.append(pd.DataFrame(body, columns=columns, dtype=str))
+    return frames
+
+
+def extract_pdf_tables(doc_type: DocType, content: bytes) -> ExtractResult | None:
+    """
+    Caminho tabela-primeiro para PDFs de relatório: tabelas do pdfplumber mapeadas direto
+    para o TableSpec do template, sem LLM. As linhas de todas as tabelas que batem com o
+    template são juntadas na ordem do documento. Retorna None quando nenhuma bate — aí o
+    chamador segue para texto + Gemini.
+    """
+    spec = SPEC_BY_DOC_TYPE.get(doc_type)
+    if doc_type not in PDF_TABLE_DOC_TYPES or spec is None:
+        return None
+
+    timer = StageTimer()
+    with timer.stage("pdf_tables") as st:
+        try:
+            tables = _read_tables(content)
+        except Exception:
+            return None
+        st.rows = sum(len(t) for t in tables)
+
+    rows: list[dict[str, Any]] = []
+    mappings: list[Any] = []
+    warnings: list[str] = []
+    for df in _candidates(tables):
+        with timer.stage("mapping") as st:
+            table_rows, map_meta = map_dataframe_to_template_rows(spec, df, allow_llm=False)
+            st.rows = len(table_rows)
+        if table_rows:
+            rows.extend(table_rows)
+            mappings.append(map_meta.get("mapping"))
+            warnings.extend(w for w in map_meta.get("warnings", []) if w not in warnings)
+    if not rows:
+        return None
+    if len(mappings) > 1:
+        warnings.insert(0, f"{len(mappings)} tabelas do PDF bateram com o template; linhas juntadas.")
+    return ExtractResult(
+        payload={"table": spec.sheet, "rows": rows, "mapping": mappings[0]},
+        warnings=["Tabela extraída direto do PDF (sem LLM).", *warnings],
+        stages=timer.records(),
+    )
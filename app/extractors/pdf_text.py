@@ -1,48 +1,194 @@
 from __future__ import annotations
 
 import io
+import re
+from typing import Iterator
+
 import pdfplumber
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.core.timing import StageTimer
 from app.extractors.base import ExtractResult
-# Importamos a função de OCR que acabamos de criar
-from app.extractors.pdf_ocr_stub import ocr_pdf_or_images
+from app.extractors.ocr_profiles import OcrProfile
+from app.extractors.pdf_classify import PdfClassification, classify_pdf
+from app.extractors.pdf_ocr_stub import format_ocr_page, ocr_pages
+
+# Glifos sem mapeamento Unicode que o pdfplumber devolve como "(cid:123)"
+_CID_RE = re.compile(r"\(cid:\d+\)")
+# Abaixo disso a camada de texto da página é considerada lixo (fontes quebradas)
+_MIN_READABLE_RATIO = 0.6
+
+
+def _page_needs_ocr(text: str, has_images: bool) -> bool:
+    raw = text.strip()
+    cleaned = _CID_RE.sub("", raw).replace("\ufffd", "").strip()
+    if len(cleaned) < len(raw) * 0.8:
+        # Maioria dos glifos sem Unicode: a página renderizada ainda é legível pelo OCR
+        return True
+    if len(cleaned) < settings.OCR_MIN_PAGE_CHARS:
+        # Sem imagem na página não há o que o OCR encontrar além do texto nativo
+        return has_images
+    readable = sum(1 for c in cleaned if c.isalnum() or c.isspace() or c in ".,;:-/()%$")
+    return readable / len(cleaned) < _MIN_READABLE_RATIO
+
+
+def iter_pdf_pages(pdf, with_images: bool = True) -> Iterator[tuple[int, str, bool]]:
+    """
+    Percorre as páginas uma a uma, devolvendo (número, texto nativo, tem_imagem). Com
+    `with_images=False` as imagens da página não são lidas e `tem_imagem` vem sempre False.
+
+    O cache de layout de cada página (chars/objetos do pdfminer) é liberado logo após a
+    extração, então a memória não cresce com o número de páginas.
+    """
+    for page in pdf.pages:
+        try:
+            text = page.extract_text() or ""
+            has_images = with_images and bool(page.images)
+        except Exception:
+            text, has_images = "", True
+        finally:
+            page.close()
+        yield page.page_number, text, has_images
 
-def extract_pdf_text(content: bytes) -> ExtractResult:
+
+def extract_pdf_text(
+    content: bytes, ocr_profile: OcrProfile | None = None, deadline: Deadline | None = None
+) -> ExtractResult:
+    """
+    Texto do PDF: nativo por página e OCR onde faltar. Com `deadline`, as etapas param
+    quando o prazo acaba e o payload traz `timed_out_stage` junto com o texto parcial.
+    """
     warnings: list[str] = []
-    text_parts: list[str] = []
+    # Texto por página (None = página que precisa de OCR)
+    page_texts: list[str | None] = []
+    timer = StageTimer()
+    native_ok = True
+    degraded = False
+    max_pages = settings.PDF_MAX_PAGES
+    max_chars = settings.PDF_MAX_TEXT_CHARS
+    native_chars = 0
+    truncated = False
+    timed_out_stage: str | None = None
 
-    # 1. Tenta extração nativa (rápida, para PDFs de texto digital)
     try:
         with pdfplumber.open(io.BytesIO(content)) as pdf:
-            for page in pdf.pages:
+            total_pages = len(pdf.pages)
+
+            # 1. Amostra algumas páginas para decidir entre nativo, escaneado ou misto
+            with timer.stage("pdf_classify") as st:
                 try:
-                    t = page.extract_text() or ""
+                    classification = classify_pdf(pdf)
                 except Exception:
-                    t = ""
-                if t.strip():
-                    text_parts.append(t)
+                    # Classificador com problema não derruba a extração: decide página a página
+                    classification = PdfClassification(kind="hybrid", total_pages=total_pages)
+                    degraded = True
+                    warnings.append("Falha ao classificar o PDF; seguindo com a análise página a página.")
+                st.rows = len(classification.samples)
+            trust_text_layer = classification.kind == "native"
+
+            if classification.kind == "scanned":
+                # Scan puro: vai direto para o OCR sem passar o pdfplumber no documento todo
+                page_texts = [None] * min(total_pages, max_pages)
+                truncated = total_pages > max_pages
+            else:
+                # 2. Extração nativa página a página (rápida, para PDFs de texto digital).
+                # No PDF nativo a camada de texto vale sem checar imagens/legibilidade de cada
+                # página; só página sem texto nenhum vai para o OCR. No misto, cada página é avaliada.
+                with timer.stage("pdf_native_text") as st:
+                    for n, t, has_images in iter_pdf_pages(pdf, with_images=not trust_text_layer):
+                        if n > max_pages or native_chars >= max_chars:
+                            truncated = True
+                            break
+                        if deadline is not None and deadline.expired:
+                            timed_out_stage = "pdf_native_text"
+                            break
+                        needs_ocr = not t.strip() if trust_text_layer else _page_needs_ocr(t, has_images)
+                        if needs_ocr:
+                            page_texts.append(None)
+                        else:
+                            page_texts.append(t)
+                            native_chars += len(t)
+                    st.bytes = native_chars
+                    st.rows = len(page_texts)
     except Exception:
-        # Se pdfplumber falhar miseravelmente, apenas ignoramos e tentamos OCR abaixo
-        pass
+        # Se pdfplumber falhar miseravelmente, tentamos OCR do documento inteiro abaixo
+        native_ok = False
 
-    full_text = "\n".join(text_parts).strip()
+    if truncated:
+        warnings.append(
+            f"Documento truncado: {len(page_texts)} de {total_pages} páginas lidas "
+            f"(limites PDF_MAX_PAGES={max_pages}, PDF_MAX_TEXT_CHARS={max_chars})."
+        )
 
-    # 2. Heurística: Se tiver muito pouco texto (< 50 chars), assumimos que é Scan/Imagem
-    if len(full_text) < 50:
+    # 3. OCR só das páginas vazias ou com texto ilegível (todas, no scan puro)
+    ocr_targets = [i + 1 for i, t in enumerate(page_texts) if t is None] if native_ok else None
+    ocr_texts: dict[int, str] = {}
+    if timed_out_stage is None and (ocr_targets is None or ocr_targets):
         try:
-            # Tenta OCR
-            ocr_text = ocr_pdf_or_images(content)
-            
-            # Se o OCR trouxe mais conteúdo que a extração nativa, usamos ele
-            if len(ocr_text) > len(full_text):
-                full_text = ocr_text
-                warnings.append("Texto extraído via OCR (PDF era imagem/scan).")
-            else:
-                warnings.append("OCR rodou mas não encontrou texto legível.")
-                
+            with timer.stage("ocr") as st:
+                ocr_texts = ocr_pages(
+                    content, ocr_targets, max_pages=max_pages, profile=ocr_profile, deadline=deadline
+                )
+                st.bytes = sum(len(t) for t in ocr_texts.values())
+                st.rows = len(ocr_texts)
         except Exception as e:
             warnings.append(f"Falha ao tentar OCR de fallback: {str(e)}")
+            degraded = True
+        if deadline is not None and deadline.expired and (ocr_targets is None or len(ocr_texts) < len(ocr_targets)):
+            timed_out_stage = "ocr"
+
+    parts: list[str] = []
+    ocr_used: list[int] = []
+    total_chars = 0
+    for n in sorted(set(range(1, len(page_texts) + 1)) | set(ocr_texts)):
+        if n > max_pages or total_chars >= max_chars:
+            if not truncated:
+                truncated = True
+                warnings.append(
+                    f"Documento truncado na página {n} "
+                    f"(limites PDF_MAX_PAGES={max_pages}, PDF_MAX_TEXT_CHARS={max_chars})."
+                )
+            break
+        native = page_texts[n - 1] if n <= len(page_texts) else None
+        if native is not None:
+            part = native if native.strip() else ""
+        elif ocr_texts.get(n, "").strip():
+            part = format_ocr_page(n, ocr_texts[n])
+            ocr_used.append(n)
+        else:
+            part = ""
+        if part:
+            parts.append(part[: max_chars - total_chars])
+            total_chars += len(parts[-1]) + 1
+
+    if ocr_used:
+        warnings.append(
+            f"Texto de {len(ocr_used)} página(s) extraído via OCR (páginas sem texto nativo legível: "
+            f"{', '.join(map(str, ocr_used))})."
+        )
+    elif ocr_texts:
+        warnings.append("OCR rodou mas não encontrou texto legível.")
 
-    if not full_text:
+    joined = "\n".join(parts)
+    full_text = joined.strip()
+    payload: dict = {"text": full_text}
+    if len(parts) > 1:
+        # Início de cada página no texto final; o Gemini em trechos corta nessas fronteiras
+        lead = len(joined) - len(joined.lstrip())
+        starts, offset = [], 0
+        for part in parts:
+            starts.append(max(0, offset - lead))
+            offset += len(part) + 1
+        payload["page_starts"] = starts
+    if timed_out_stage:
+        payload["timed_out_stage"] = timed_out_stage
+        warnings.append(f"Prazo do documento esgotado em {timed_out_stage}; texto parcial.")
+    elif not full_text:
         warnings.append("Documento vazio ou ilegível mesmo após OCR.")
 
-    return ExtractResult(payload={"text": full_text}, warnings=warnings)
\ No newline at end of file
+    return ExtractResult(
+        payload=payload,
+        warnings=warnings,
+        stages=timer.records(),
+        degraded=degraded or truncated or bool(timed_out_stage),
+    )
@@ -1,5 +1,8 @@
 from app.models.enums import DocType
 
+# Corte do texto dentro do prompt; textos maiores passam pelo modo em trechos (app/extractors/chunking.py)
+PROMPT_MAX_CHARS = 190000
+
 def get_prompt_for_doc_type(doc_type: DocType, text: str) -> str:
     """
     Gera o prompt especializado para o Gemini com base no tipo de documento.
@@ -64,7 +67,7 @@ SAÍDA ESPERADA (JSON):
 
 TEXTO DO DOCUMENTO:
 <<<
-{text[:190000]}
+{text[:PROMPT_MAX_CHARS]}
 >>>
 """
 
@@ -109,7 +112,7 @@ SAÍDA ESPERADA (JSON):
 
 TEXTO DO DOCUMENTO:
 <<<
-{text[:190000]}
+{text[:PROMPT_MAX_CHARS]}
 >>>
 """
 
@@ -150,7 +153,7 @@ SAÍDA ESPERADA (JSON):
 
 TEXTO DO DOCUMENTO:
 <<<
-{text[:190000]}
+{text[:PROMPT_MAX_CHARS]}
 >>>
 """
 
@@ -195,7 +198,7 @@ SAÍDA ESPERADA (JSON):
 
 TEXTO DO DOCUMENTO:
 <<<
-{text[:190000]}
+{text[:PROMPT_MAX_CHARS]}
 >>>
 """
 
@@ -235,7 +238,7 @@ SAÍDA ESPERADA (JSON):
 
 TEXTO DO DOCUMENTO:
 <<<
-{text[:190000]}
+{text[:PROMPT_MAX_CHARS]}
 >>>
 """
 
@@ -269,7 +272,7 @@ SAÍDA ESPERADA (JSON):
 
 TEXTO DO DOCUMENTO:
 <<<
-{text[:190000]}
+{text[:PROMPT_MAX_CHARS]}
 >>>
 """
 
@@ -287,6 +290,6 @@ Se encontrar dados Gerais (Datas, Nomes), coloque em 'kv'.
 
 TEXTO DO DOCUMENTO:
 <<<
-{text[:190000]}
+{text[:PROMPT_MAX_CHARS]}
 >>>
 """
\ No newline at end of file
@@ -3,12 +3,22 @@ from __future__ import annotations
 import io
 import pandas as pd
 
+from app.core.timing import StageTimer
 from app.core.utils import normalize_whitespace
 from app.extractors.base import ExtractResult
-from app.extractors.mapping import map_dataframe_to_template_rows
+from app.extractors.mapping import apply_llm_mapping, map_dataframe_to_template_rows, request_llm_mapping
 from app.models.enums import DocType
 from app.template.specs import RECEBIVEIS, TIPOLOGIA, LANDBANK, ENDIVIDAMENTO, VIABILIDADE, TableSpec
 
+SPEC_BY_DOC_TYPE: dict[DocType, TableSpec] = {
+    DocType.RECEBIVEIS: RECEBIVEIS,
+    DocType.TIPOLOGIA: TIPOLOGIA,
+    DocType.LANDBANK: LANDBANK,
+    DocType.ENDIVIDAMENTO: ENDIVIDAMENTO,
+    DocType.TABELA_VENDAS: RECEBIVEIS,
+    DocType.FATURAMENTO: VIABILIDADE,
+}
+
 def _read_csv(content: bytes) -> pd.DataFrame:
     return pd.read_csv(io.BytesIO(content), dtype=str, encoding_errors="ignore")
 
@@ -21,31 +31,62 @@ def _normalize_df(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 def extract_tabular(doc_type: DocType, content: bytes, ext: str) -> ExtractResult:
+    """
+    Lê a planilha e mapeia as colunas para o template pela heurística. Roda no pool de CPU,
+    então não chama o Gemini: quando as colunas não batem, devolve `llm_mapping` e o processo
+    pai completa com `complete_llm_mapping` (cliente e limitador de cota compartilhados).
+    """
     warnings: list[str] = []
-    if ext == ".csv":
-        df = _read_csv(content)
-    else:
-        df = _read_xlsx(content)
-
-    df = _normalize_df(df)
-
-    spec_map: dict[DocType, TableSpec] = {
-        DocType.RECEBIVEIS: RECEBIVEIS,
-        DocType.TIPOLOGIA: TIPOLOGIA,
-        DocType.LANDBANK: LANDBANK,
-        DocType.ENDIVIDAMENTO: ENDIVIDAMENTO,
-        DocType.TABELA_VENDAS: RECEBIVEIS,
-        DocType.FATURAMENTO: VIABILIDADE,
-    }
-
-    if doc_type in spec_map:
-        spec = spec_map[doc_type]
-        rows, map_meta = map_dataframe_to_template_rows(spec, df)
+    timer = StageTimer()
+    with timer.stage("tabular_read") as st:
+        if ext == ".csv":
+            df = _read_csv(content)
+        else:
+            df = _read_xlsx(content)
+
+        df = _normalize_df(df)
+        st.bytes = len(content)
+        st.rows = len(df)
+
+    if doc_type in SPEC_BY_DOC_TYPE:
+        spec = SPEC_BY_DOC_TYPE[doc_type]
+        with timer.stage("mapping") as st:
+            rows, map_meta = map_dataframe_to_template_rows(spec, df, allow_llm=False)
+            st.rows = len(rows)
+        if map_meta.get("needs_llm"):
+            return ExtractResult(
+                payload={"table": spec.sheet, "rows": []},
+                warnings=warnings,
+                stages=timer.records(),
+                llm_mapping={
+                    "columns": list(df.columns),
+                    "sample_rows": df.head(5).fillna("").to_dict(orient="records"),
+                    "records": df.to_dict(orient="records"),
+                },
+            )
         warnings.extend(map_meta.get("warnings", []))
         return ExtractResult(
             payload={"table": spec.sheet, "rows": rows, "mapping": map_meta.get("mapping")},
             warnings=warnings,
+            stages=timer.records(),
         )
 
     sample = df.head(50).to_dict(orient="records")
-    return ExtractResult(payload={"raw_rows": sample, "columns": list(df.columns)}, warnings=["DocType sem tabela alvo; retornando raw sample."])
+    return ExtractResult(
+        payload={"raw_rows": sample, "columns": list(df.columns)},
+        warnings=["DocType sem tabela alvo; retornando raw sample."],
+        stages=timer.records(),
+    )
+
+def complete_llm_mapping(doc_type: DocType, res: ExtractResult, timeout: float | None = None) -> ExtractResult:
+    """Mapping via LLM de um `extract_tabular` que devolveu `llm_mapping`."""
+    spec = SPEC_BY_DOC_TYPE[doc_type]
+    req = res.llm_mapping or {}
+    resp = request_llm_mapping(spec, req["columns"], req["sample_rows"], timeout=timeout)
+    rows, map_meta = apply_llm_mapping(resp, req["records"])
+    return ExtractResult(
+        payload={"table": spec.sheet, "rows": rows, "mapping": map_meta.get("mapping")},
+        warnings=[*res.warnings, *map_meta.get("warnings", [])],
+        stages=res.stages,
+        degraded=res.degraded,
+    )
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+from app.extractors.chunking import split_pages
+
+# "3", "Página 3", "Pág. 3 de 10", "3/10", "Page 3 of 10" no topo/rodapé da página
+_PAGE_NUMBER = re.compile(r"^(?:p[áa]g(?:ina)?\.?|page)?\s*\d{1,4}(?:\s*(?:de|/|of)\s*\d{1,4})?$", re.IGNORECASE)
+_COLUMN_GAP = re.compile(r"[ \t]{2,}")
+_SPACES = re.compile(r"[ \t]+")
+
+
+@dataclass(frozen=True)
+class CompactedText:
+    text: str
+    page_starts: list[int] | None
+    original_chars: int
+    removed_lines: int
+    # Linhas repetidas que ficaram só na primeira ocorrência (título, títulos de coluna...),
+    # na ordem do documento: quem parte o texto em trechos as repõe no topo de cada um
+    repeated_lines: list[str] = field(default_factory=list)
+
+
+def _compact_line(line: str) -> str:
+    line = line.strip()
+    # Texto alinhado em colunas (3+ células separadas por 2+ espaços) vira "a | b | c"
+    cells = _COLUMN_GAP.split(line)
+    if len(cells) >= 3:
+        return " | ".join(_SPACES.sub(" ", c) for c in cells)
+    return _SPACES.sub(" ", line)
+
+
+def _is_page_number(line: str, page_no: int) -> bool:
+    if not _PAGE_NUMBER.match(line):
+        return False
+    # Número solto só conta se bater com a posição da página (senão pode ser dado)
+    return not line.isdigit() or int(line) == page_no
+
+
+def compact_text(text: str, page_starts: list[int] | None = None, *, min_page_ratio: float = 0.6) -> CompactedText:
+    """
+    Enxuga o texto do PDF antes do prompt: linhas idênticas que se repetem na maioria das
+    páginas (cabeçalho, rodapé, títulos de coluna) ficam só na primeira ocorrência, números
+    de página saem, espaços/linhas em branco repetidos colapsam e texto alinhado em colunas
+    vira linhas delimitadas por " | ". Os offsets de página são recalculados para o texto novo
+    e as linhas repetidas mantidas vão em `repeated_lines`.
+    """
+    pages = split_pages(text, page_starts) if page_starts else [text]
+    page_lines = [[_compact_line(line) for line in page.splitlines()] for page in pages]
+
+    repeated: set[str] = set()
+    if len(pages) >= 3:
+        counts = Counter(line for lines in page_lines for line in set(lines) if line)
+        needed = max(2, math.ceil(min_page_ratio * len(pages)))
+        repeated = {line for line, n in counts.items() if n >= needed}
+
+    seen: set[str] = set()
+    kept_repeated: list[str] = []
+    removed = 0
+    out_pages: list[str] = []
+    for page_no, lines in enumerate(page_lines, start=1):
+        filled = [i for i, line in enumerate(lines) if line]
+        # Número de página só na primeira/última linha com texto, e só em texto com várias páginas
+        edges = {filled[0], filled[-1]} if filled and len(pages) > 1 else set()
+        kept: list[str] = []
+        for i, line in enumerate(lines):
+            if not line:
+                if kept and kept[-1]:
+                    kept.append("")
+                continue
+            if (i in edges and _is_page_number(line, page_no)) or (line in repeated and line in seen):
+                removed += 1
+                continue
+            if line in repeated:
+                kept_repeated.append(line)
+            seen.add(line)
+            kept.append(line)
+        while kept and not kept[-1]:
+            kept.pop()
+        if kept:
+            out_pages.append("\n".join(kept))
+
+    starts: list[int] | None = None
+    if len(out_pages) > 1:
+        starts, offset = [], 0
+        for page in out_pages:
+            starts.append(offset)
+            offset += len(page) + 1
+    return CompactedText(
+        text="\n".join(out_pages),
+        page_starts=starts,
+        original_chars=len(text),
+        removed_lines=removed,
+        repeated_lines=kept_repeated,
+    )
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,8 +10,10 @@ from app.api.routes.jobs import router as jobs_router
 from app.api.routes.metrics import router as metrics_router
 from app.api.routes.projects import router as projects_router
 from app.core.config import settings
+from app.core.cpu_pool import get_cpu_pool
 from app.core.errors import AppError
 from app.core.logging import get_logger, set_request_id
+from app.services.webhook import get_webhook_dispatcher
 from app.template.bootstrap import ensure_template_ready
 
 log = get_logger("app")
@@ -25,8 +29,20 @@ class RequestIdMiddleware(BaseHTTPMiddleware):
         return response
 
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Webhooks saem por um dispatcher único por processo (cliente HTTP keep-alive + filas)
+    dispatcher = get_webhook_dispatcher()
+    await dispatcher.start()
+    try:
+        yield
+    finally:
+        await dispatcher.stop()
+        get_cpu_pool().shutdown()
+
+
 def create_app() -> FastAPI:
-    app = FastAPI(title="koa-doc-pipeline", version="0.1.0")
+    app = FastAPI(title="koa-doc-pipeline", version="0.1.0", lifespan=lifespan)
 
     ensure_template_ready()
 
@@ -49,6 +65,7 @@ def create_app() -> FastAPI:
         return JSONResponse(
             status_code=exc.status_code,
             content={"error": exc.code, "message": exc.message, "details": exc.details},
+            headers=exc.headers,
         )
 
     @app.exception_handler(Exception)
@@ -101,8 +101,33 @@ class StatusCounts(BaseModel):
     failed: int
 
 
+class StageTimingStats(BaseModel):
+    count: int
+    avg_seconds: float
+    p95_seconds: float
+    max_seconds: float
+    total_bytes: int = 0
+    total_rows: int = 0
+    total_prompt_tokens: int = 0
+    total_output_tokens: int = 0
+
+
+class LlmConcurrencyStats(BaseModel):
+    window: int
+    in_flight: int
+    min_concurrency: int
+    max_concurrency: int
+    adaptive: bool
+    successes: int = 0
+    overloads: int = 0
+
+
 class MetricsResponse(BaseModel):
     projects: StatusCounts
     jobs: StatusCounts
     documents: int
     recent_logs: list[dict[str, Any]] = Field(default_factory=list)
+    stage_timings: dict[str, StageTimingStats] = Field(default_factory=dict)
+    # Limitador do Gemini deste processo (janela AIMD atual); None se este processo ainda não
+    # chamou o Gemini ou se as extrações rodam nos workers da fila (JOB_QUEUE_ENABLED)
+    llm_concurrency: LlmConcurrencyStats | None = None
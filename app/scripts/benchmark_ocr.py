@@ -0,0 +1,83 @@
+"""
+Benchmark dos perfis de OCR sobre uma pasta de amostras (PDFs escaneados e imagens).
+
+    python -m app.scripts.benchmark_ocr amostras/ --profiles fast default accurate --max-pages 10
+
+Para cada perfil imprime segundos por página e caracteres reconhecidos por página,
+para escolher OCR_PROFILE / OCR_PROFILE_BY_DOC_TYPE com números em vez de palpite.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+from PIL import Image, ImageOps
+from pdf2image import pdfinfo_from_bytes
+
+from app.extractors.ocr_engine import ocr_engine_name, ocr_image
+from app.extractors.ocr_preprocess import preprocess_page
+from app.extractors.ocr_profiles import OCR_PROFILES, OcrProfile
+from app.extractors.pdf_ocr_stub import ocr_pages
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff")
+
+
+def _ocr_image(path: Path, profile: OcrProfile) -> str:
+    with Image.open(path) as img:
+        img = ImageOps.grayscale(img) if profile.grayscale else img.convert("RGB")
+        if profile.max_width and img.width > profile.max_width:
+            img = img.resize((profile.max_width, round(img.height * profile.max_width / img.width)))
+        if profile.preprocess:
+            img = preprocess_page(img, profile)
+        return ocr_image(img, profile)
+
+
+def benchmark_file(path: Path, profile: OcrProfile, max_pages: int, workers: int | None) -> tuple[int, int, float]:
+    """Retorna (páginas, caracteres, segundos) do OCR de um arquivo com o perfil."""
+    start = time.perf_counter()
+    if path.suffix.lower() in IMAGE_EXTENSIONS:
+        text = _ocr_image(path, profile)
+        return 1, len(text.strip()), time.perf_counter() - start
+
+    content = path.read_bytes()
+    total = int(pdfinfo_from_bytes(content)["Pages"])
+    pages = list(range(1, min(total, max_pages) + 1))
+    texts = ocr_pages(content, pages, workers=workers, profile=profile)
+    return len(pages), sum(len(t.strip()) for t in texts.values()), time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark dos perfis de OCR.")
+    parser.add_argument("folder", type=Path, help="Pasta com PDFs/imagens de amostra")
+    parser.add_argument("--profiles", nargs="+", default=list(OCR_PROFILES), choices=list(OCR_PROFILES))
+    parser.add_argument("--max-pages", type=int, default=10, help="Páginas por PDF (padrão: 10)")
+    parser.add_argument("--workers", type=int, default=None, help="Threads de OCR (padrão: OCR_WORKERS)")
+    args = parser.parse_args(argv)
+
+    files = sorted(
+        p for p in args.folder.iterdir() if p.suffix.lower() in (".pdf", *IMAGE_EXTENSIONS)
+    )
+    if not files:
+        raise SystemExit(f"Nenhum PDF/imagem em {args.folder}")
+
+    print(f"engine: {ocr_engine_name()}")
+    print(f"{'perfil':<10} {'arquivos':>8} {'páginas':>8} {'s/página':>9} {'chars/página':>13}")
+    for name in args.profiles:
+        profile = OCR_PROFILES[name]
+        pages = chars = 0
+        seconds = 0.0
+        for path in files:
+            try:
+                p, c, s = benchmark_file(path, profile, args.max_pages, args.workers)
+            except Exception as e:  # noqa: BLE001
+                print(f"  [{name}] {path.name}: falhou ({e})")
+                continue
+            pages, chars, seconds = pages + p, chars + c, seconds + s
+        per_page = seconds / pages if pages else 0.0
+        yield_ = chars / pages if pages else 0.0
+        print(f"{name:<10} {len(files):>8} {pages:>8} {per_page:>9.2f} {yield_:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Controle de admissão dos jobs processados no próprio processo web.
+
+No máximo MAX_INFLIGHT_JOBS jobs rodam ao mesmo tempo; até MAX_QUEUED_JOBS esperam
+vaga numa fila em memória. Acima disso novos jobs são recusados com 429 e Retry-After,
+antes de qualquer escrita no banco. Com JOB_QUEUE_ENABLED a fila é aida_job_queue e a
+concorrência é a dos workers (WORKER_CONCURRENCY).
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from typing import Any
+
+from app.core.config import settings
+from app.core.errors import TooManyRequests
+
+
+class AdmissionTicket:
+    """Vaga reservada para um job: `async with ticket` espera a vez de rodar e libera no fim."""
+
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+        self._state = "reserved"
+
+    async def __aenter__(self) -> AdmissionTicket:
+        await self.controller._acquire()
+        self._state = "running"
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._state = "done"
+        self.controller._release()
+
+    def cancel(self) -> None:
+        """Devolve uma reserva que não chegou a rodar."""
+        if self._state == "reserved":
+            self._state = "done"
+            self.controller._cancel()
+
+
+class AdmissionController:
+    def __init__(self, max_inflight: int, max_queued: int, retry_after_seconds: int = 30):
+        self.max_inflight = max(1, max_inflight)
+        self.max_queued = max(0, max_queued)
+        self.retry_after_seconds = max(1, retry_after_seconds)
+        self._running = 0
+        # Reservados que ainda não rodam (aceitos pela API ou esperando vaga)
+        self._queued = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        """Levanta TooManyRequests se não há vaga nem lugar na fila."""
+        with self._lock:
+            self._check_locked()
+
+    def reserve(self, *, force: bool = False) -> AdmissionTicket:
+        with self._lock:
+            if not force:
+                self._check_locked()
+            self._queued += 1
+        return AdmissionTicket(self)
+
+    def _check_locked(self) -> None:
+        if self._running + self._queued >= self.max_inflight + self.max_queued:
+            raise TooManyRequests(
+                "Capacidade de processamento esgotada, tente novamente mais tarde.",
+                retry_after=self.retry_after_seconds,
+                details={"running": self._running, "queued": self._queued},
+            )
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._running,
+                "queued": self._queued,
+                "max_inflight": self.max_inflight,
+                "max_queued": self.max_queued,
+                "saturated": self._running + self._queued >= self.max_inflight + self.max_queued,
+            }
+
+    async def _acquire(self) -> None:
+        with self._lock:
+            if self._running < self.max_inflight and not self._waiters:
+                self._running += 1
+                self._queued -= 1
+                return
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                handed = fut not in self._waiters
+                if not handed:
+                    self._waiters.remove(fut)
+                    self._queued -= 1
+            if handed and fut.done() and not fut.cancelled():
+                # A vaga chegou junto com o cancelamento: repassa
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                fut = self._waiters.popleft()
+                if fut.cancelled():
+                    continue
+                # Vaga passa direto para o próximo da fila (_running não muda)
+                self._queued -= 1
+                fut.get_loop().call_soon_threadsafe(self._wake, fut)
+                return
+            self._running -= 1
+
+    def _wake(self, fut: asyncio.Future) -> None:
+        if fut.cancelled():
+            self._release()
+        else:
+            fut.set_result(None)
+
+    def _cancel(self) -> None:
+        with self._lock:
+            self._queued -= 1
+
+
+_controller: AdmissionController | None = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(
+                settings.MAX_INFLIGHT_JOBS,
+                settings.MAX_QUEUED_JOBS,
+                settings.ADMISSION_RETRY_AFTER_SECONDS,
+            )
+        return _controller
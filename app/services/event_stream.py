@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any
+
+EventBatch = list[tuple[int, dict[str, Any]]]
+
+
+class JobEventSubscription:
+    def __init__(self, job_id: str, loop: asyncio.AbstractEventLoop, maxsize: int = 1000):
+        self.job_id = job_id
+        self.loop = loop
+        self.queue: asyncio.Queue[EventBatch] = asyncio.Queue(maxsize=maxsize)
+        # Fila estourou: o consumidor precisa reler o banco para não pular eventos
+        self.lagged = False
+
+    def _put(self, batch: EventBatch) -> None:
+        try:
+            self.queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+    async def get(self, timeout: float) -> EventBatch | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class JobEventBroker:
+    """
+    Pub/sub em memória dos eventos de job já persistidos em aida_job_events.
+
+    O pipeline publica de threads de trabalho; os assinantes (streams SSE) consomem
+    no event loop. Só alcança jobs processados no mesmo processo — para jobs de
+    workers separados o stream cai no polling de aida_job_events.
+    """
+
+    def __init__(self):
+        self._subs: dict[str, set[JobEventSubscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, job_id: str) -> JobEventSubscription:
+        sub = JobEventSubscription(job_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subs.setdefault(job_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: JobEventSubscription) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.job_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.job_id]
+
+    def has_subscribers(self, job_id: str) -> bool:
+        with self._lock:
+            return bool(self._subs.get(job_id))
+
+    def publish(self, job_id: str, batch: EventBatch) -> None:
+        if not batch:
+            return
+        with self._lock:
+            subs = list(self._subs.get(job_id) or ())
+        for sub in subs:
+            if sub.loop.is_closed():
+                continue
+            sub.loop.call_soon_threadsafe(sub._put, batch)
+
+
+job_event_broker = JobEventBroker()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import asdict
+from functools import lru_cache
+from typing import Any
+
+from app.core.config import settings
+from app.extractors.mapping import ColumnMappingResponse
+from app.extractors.ocr_engine import ocr_engine_name
+from app.extractors.ocr_profiles import get_ocr_profile
+from app.extractors.prompts import get_prompt_for_doc_type
+from app.models.enums import DocType
+from app.models.schemas import PdfExtractionResponse
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando a lógica dos extratores mudar de forma que invalide resultados antigos
+EXTRACTOR_VERSION = "1"
+
+
+def content_sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _fingerprint(value: Any) -> str:
+    raw = value if isinstance(value, str) else json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def _pipeline_fingerprint(doc_type: DocType, kind: str) -> str:
+    # O prompt vazio captura qualquer edição no template do prompt do doc_type
+    if kind == "pdf":
+        return "|".join(
+            (
+                _fingerprint(get_prompt_for_doc_type(doc_type, "")),
+                _fingerprint(PdfExtractionResponse.model_json_schema()),
+            )
+        )
+    return _fingerprint(ColumnMappingResponse.model_json_schema())
+
+
+def extraction_cache_key(content: bytes, doc_type: DocType, ext: str) -> str:
+    kind = "pdf" if ext == ".pdf" else "tabular"
+    parts = (
+        content_sha256(content),
+        doc_type.value,
+        ext,
+        EXTRACTOR_VERSION,
+        _pipeline_fingerprint(doc_type, kind),
+        settings.GEMINI_MODEL,
+    )
+    if kind == "pdf":
+        # O texto enviado ao Gemini depende do perfil e do engine de OCR do doc_type, de quais
+        # páginas vão para o OCR e dos limites de leitura; a tabela nativa pode pular o Gemini
+        parts += (
+            _fingerprint(asdict(get_ocr_profile(doc_type))),
+            f"ocr:{ocr_engine_name()}:{settings.OCR_MIN_PAGE_CHARS}:{settings.PDF_CLASSIFY_SAMPLE_PAGES}",
+            f"limits:{settings.PDF_MAX_PAGES}:{settings.PDF_MAX_TEXT_CHARS}",
+            f"tables:{settings.PDF_TABLES_ENABLED}",
+        )
+        # ... do roteamento de modelo, da compactação e de como ele é dividido em trechos
+        if settings.GEMINI_SMALL_MODEL:
+            parts += (f"small:{settings.GEMINI_SMALL_MODEL}:{settings.GEMINI_SMALL_MODEL_MAX_TOKENS}",)
+        if settings.TEXT_COMPACTION_ENABLED:
+            parts += (f"compact:{settings.TEXT_BOILERPLATE_MIN_PAGE_RATIO}",)
+        if settings.LLM_CHUNKING_ENABLED:
+            parts += (f"chunks:{settings.LLM_CHUNK_TOKENS}:{settings.LLM_MAX_CHUNKS}",)
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Cache endereçado por conteúdo do resultado de extração (tabela aida_extraction_cache).
+
+    Best-effort: falhas de leitura/escrita só geram warning e o pipeline segue extraindo.
+    """
+
+    def __init__(self, db, enabled: bool | None = None):
+        self.db = db
+        self.enabled = settings.EXTRACTION_CACHE_ENABLED if enabled is None else enabled
+
+    def key_for(self, content: bytes, doc_type: DocType, ext: str) -> str:
+        return extraction_cache_key(content, doc_type, ext)
+
+    def get(self, key: str) -> tuple[dict[str, Any], list[str]] | None:
+        if not self.enabled:
+            return None
+        try:
+            row = self.db.get_extraction_cache(key)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("Extraction cache lookup failed: %s", e)
+            return None
+        if not row or row.get("aida_payload") is None:
+            return None
+        return row["aida_payload"], list(row.get("aida_warnings") or [])
+
+    def put(self, key: str, doc_type: DocType, payload: dict[str, Any], warnings: list[str]) -> None:
+        if not self.enabled:
+            return
+        try:
+            self.db.put_extraction_cache(key, doc_type.value, payload, warnings)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("Extraction cache write failed: %s", e)
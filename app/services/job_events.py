@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any
+
+from app.core.config import settings
+from app.services.event_stream import job_event_broker
+from app.supabase.events import row_to_event
+
+logger = logging.getLogger(__name__)
+
+# Eventos que encerram um job (também encerram o stream SSE)
+TERMINAL_EVENTS = frozenset({"job_ready", "job_failed", "job_aborted"})
+
+
+class JobEventLog:
+    """
+    Buffer de eventos de um job gravado em lote na tabela append-only aida_job_events.
+
+    Thread-safe: os documentos de um job são extraídos em paralelo e emitem eventos
+    ao mesmo tempo. O buffer é descarregado ao atingir `flush_size` eventos, quando o
+    evento mais antigo passa de `flush_seconds` (por timer, mesmo sem novos eventos
+    durante um OCR/Gemini longo), em eventos de erro e no `flush()` final.
+    """
+
+    def __init__(
+        self,
+        db,
+        job_id: str,
+        project_id: str | None = None,
+        *,
+        flush_size: int | None = None,
+        flush_seconds: float | None = None,
+    ):
+        self.db = db
+        self.job_id = job_id
+        self.project_id = project_id
+        self.flush_size = max(1, flush_size or settings.JOB_EVENTS_FLUSH_SIZE)
+        self.flush_seconds = settings.JOB_EVENTS_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self._buffer: list[dict[str, Any]] = []
+        self._oldest: float | None = None
+        self._timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def emit(self, event: dict[str, Any]) -> None:
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+                self._schedule_flush()
+            self._buffer.append(event)
+            due = (
+                len(self._buffer) >= self.flush_size
+                or event.get("level") == "error"
+                or event.get("event") in TERMINAL_EVENTS
+                # Alguém acompanhando o stream SSE do job: sem esperar o lote
+                or job_event_broker.has_subscribers(self.job_id)
+                or (time.monotonic() - (self._oldest or 0.0)) >= self.flush_seconds
+            )
+        if due:
+            self.flush()
+
+    def _schedule_flush(self) -> None:
+        # Chamado com _lock: garante que o lote recém-aberto sai em até flush_seconds
+        if self.flush_seconds <= 0 or self._timer is not None:
+            return
+        self._timer = threading.Timer(self.flush_seconds, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self) -> None:
+        # _flush_lock mantém a ordem de gravação entre threads que disputam o flush
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                self._oldest = None
+                timer, self._timer = self._timer, None
+            if timer is not None and timer is not threading.current_thread():
+                timer.cancel()
+            if not batch:
+                return
+            try:
+                rows = self.db.append_job_events(self.job_id, batch, project_id=self.project_id)
+            except Exception as e:  # noqa: BLE001
+                logger.warning("Job event flush failed (%s events): %s", len(batch), e)
+                return
+            job_event_broker.publish(
+                self.job_id,
+                [(row["aida_id"], row_to_event(row)) for row in rows or [] if row.get("aida_id") is not None],
+            )
@@ -1,17 +1,29 @@
 from __future__ import annotations
 
 import asyncio
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+import json
 from pathlib import Path
+from typing import AsyncIterator
 
 from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
-from app.core.errors import BadRequest, Conflict, NotFound, ExtractionError
+from app.core.cpu_pool import run_cpu_bound
+from app.core.deadline import Deadline
+from app.core.timing import StageTimer
+from app.core.errors import BadRequest, Conflict, DocumentTimeout, NotFound, ExtractionError, UpstreamError
 from app.core.utils import safe_filename
+from app.extractors.chunking import chunk_header, chunk_text, estimate_tokens, merge_structured_responses
+from app.extractors.ocr_profiles import get_ocr_profile
+from app.extractors.pdf_tables import PDF_TABLE_DOC_TYPES, extract_pdf_tables
 from app.extractors.pdf_text import extract_pdf_text
-from app.extractors.tabular import extract_tabular
-from app.extractors.gemini import GeminiClient
+from app.extractors.tabular import complete_llm_mapping, extract_tabular
+from app.extractors.text_compaction import compact_text
+from app.extractors.gemini import LlmUsage, get_gemini_client, select_gemini_model
 from app.extractors.prompts import get_prompt_for_doc_type
 from app.models.enums import DocType
 from app.models.payload import ConsolidatedPayload
@@ -24,22 +36,73 @@ from app.models.schemas import (
     OutputUrlResponse,
     PdfExtractionResponse,
 )
+from app.services.admission import AdmissionTicket, get_admission_controller
 from app.services.consolidation import consolidate
-from app.services.webhook import send_webhook_background
+from app.services.extraction_cache import ExtractionCache, content_sha256
+from app.services.event_stream import job_event_broker
+from app.services.job_events import TERMINAL_EVENTS, JobEventLog
+from app.services.webhook import dispatch_webhook
 from app.supabase.db import DB
+from app.supabase.events import row_to_event
 from app.supabase.storage import Storage
 from app.template.writer import write_filled_xlsx
 
+TABULAR_EXTENSIONS = (".xlsx", ".xlsm", ".csv")
+# Folga para a etapa devolver o parcial depois do prazo antes de o pool de CPU cortá-la
+DEADLINE_GRACE_SECONDS = 15.0
+
+@dataclass
+class JobRun:
+    """Estado de uma execução do pipeline, compartilhado pelas threads de extração."""
+    job: dict
+    project: dict
+    events: JobEventLog
+    incremental: bool = False
+    # Estado em memória dos documentos do job (evita reler o banco a cada webhook)
+    documents: dict[str, dict] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    timer: StageTimer = field(default_factory=StageTimer)
+
+    @property
+    def job_id(self) -> str:
+        return self.job["aida_id"]
+
+    @property
+    def project_id(self) -> str:
+        return self.project["aida_id"]
+
 class JobService:
-    def __init__(self):
-        self.db = DB()
-        self.storage = Storage()
+    def __init__(self, db: DB | None = None, storage: Storage | None = None):
+        self.db = db or DB()
+        self.storage = storage or Storage()
+        self.cache = ExtractionCache(self.db)
         try:
             self.loop = asyncio.get_running_loop()
         except RuntimeError:
             self.loop = None
+        # Vagas de admissão reservadas em create_job/reprocess_project, entregues ao kickoff_job
+        self._tickets: dict[str, AdmissionTicket] = {}
+
+    @staticmethod
+    def _reserve_admission() -> AdmissionTicket | None:
+        """Reserva a vaga antes de criar o job (429 se saturado); com a fila durável não há vaga local."""
+        if settings.JOB_QUEUE_ENABLED:
+            return None
+        return get_admission_controller().reserve()
 
     async def create_job(self, req: CreateJobRequest) -> CreateJobResponse:
+        ticket = self._reserve_admission()
+        try:
+            resp = await self._create_job(req)
+        except BaseException:
+            if ticket is not None:
+                ticket.cancel()
+            raise
+        if ticket is not None:
+            self._tickets[resp.job_id] = ticket
+        return resp
+
+    async def _create_job(self, req: CreateJobRequest) -> CreateJobResponse:
         webhook_url = str(req.webhook_url) if req.webhook_url else None
 
         if req.project_id:
@@ -71,7 +134,9 @@ class JobService:
         job = self.db.create_job(project_id, run_number=run_number)
         job_id = job["aida_id"]
 
-        self.db.append_job_log(job_id, _evt("info", "job_created", {"project_id": project_id, "run_number": run_number}))
+        self.db.append_job_log(
+            job_id, _evt("info", "job_created", {"project_id": project_id, "run_number": run_number}), project_id=project_id
+        )
 
         for d in req.documents:
             self.db.create_document(project_id, d.doc_type.value, d.storage_path, d.original_filename)
@@ -81,7 +146,23 @@ class JobService:
 
         return CreateJobResponse(job_id=job_id, project_id=project_id, status="processing", run_number=run_number)
 
-    async def reprocess_project(self, project_id: str) -> CreateJobResponse:
+    async def reprocess_project(self, project_id: str, incremental: bool = False) -> CreateJobResponse:
+        """
+        Cria um novo run para o projeto. No modo incremental os payloads extraídos são
+        mantidos e só documentos novos ou alterados no storage são extraídos de novo.
+        """
+        ticket = self._reserve_admission()
+        try:
+            resp = await self._reprocess_project(project_id, incremental)
+        except BaseException:
+            if ticket is not None:
+                ticket.cancel()
+            raise
+        if ticket is not None:
+            self._tickets[resp.job_id] = ticket
+        return resp
+
+    async def _reprocess_project(self, project_id: str, incremental: bool) -> CreateJobResponse:
         project = self.db.get_project(project_id)
         if not project:
             raise NotFound("Projeto não existe.")
@@ -103,25 +184,33 @@ class JobService:
         )
 
         for doc in documents:
-            self.db.update_document(
-                doc["aida_id"],
-                {"aida_status": "queued", "aida_error": None, "aida_extracted_payload": None},
-            )
+            patch = {"aida_status": "queued", "aida_error": None}
+            if not incremental:
+                patch["aida_extracted_payload"] = None
+            self.db.update_document(doc["aida_id"], patch)
 
-        job = self.db.create_job(project_id, run_number=run_number)
+        job = self.db.create_job(project_id, run_number=run_number, incremental=incremental)
         job_id = job["aida_id"]
 
         self.db.append_job_log(
             job_id,
-            _evt("info", "job_reprocess_requested", {"project_id": project_id, "run_number": run_number}),
+            _evt(
+                "info",
+                "job_reprocess_requested",
+                {"project_id": project_id, "run_number": run_number, "incremental": incremental},
+            ),
+            project_id=project_id,
         )
         self.db.update_job(job_id, {"aida_status": "processing"})
 
         return CreateJobResponse(job_id=job_id, project_id=project_id, status="processing", run_number=run_number)
 
-    async def kickoff_job(self, job_id: str) -> None:
+    async def kickoff_job(self, job_id: str, ticket: AdmissionTicket | None = None) -> None:
+        ticket = ticket or self._tickets.pop(job_id, None)
         job = self.db.get_job(job_id)
         if not job:
+            if ticket is not None:
+                ticket.cancel()
             return
 
         project_id = job.get("aida_project_id")
@@ -129,13 +218,32 @@ class JobService:
 
         if not project:
             self._abort_job(job_id, "Projeto removido antes do início.", project_id)
+            if ticket is not None:
+                ticket.cancel()
             return
 
         if project.get("aida_status") == "failed":
             self._abort_job(job_id, "Projeto está com status failed.", project_id)
+            if ticket is not None:
+                ticket.cancel()
             return
 
-        asyncio.create_task(run_in_threadpool(self._process_job_sync, job_id))
+        if settings.JOB_QUEUE_ENABLED:
+            # Processamento fica com os workers (python -m app.worker)
+            if ticket is not None:
+                ticket.cancel()
+            self.db.enqueue_job(job_id)
+            self.db.append_job_log(job_id, _evt("info", "job_enqueued"), project_id=project_id)
+            return
+
+        # Job criado fora de create_job/reprocess_project (sem reserva): já existe, então entra
+        ticket = ticket or get_admission_controller().reserve(force=True)
+        asyncio.create_task(self._run_admitted(ticket, job_id))
+
+    async def _run_admitted(self, ticket: AdmissionTicket, job_id: str) -> None:
+        # Espera vaga (MAX_INFLIGHT_JOBS) fora do threadpool: jobs na fila não ocupam threads
+        async with ticket:
+            await run_in_threadpool(self._process_job_sync, job_id)
 
     async def get_job_status(self, job_id: str) -> JobStatusResponse:
         job = self.db.get_job(job_id)
@@ -150,7 +258,8 @@ class JobService:
             project_id=project_id,
             status=job["aida_status"],
             run_number=job.get("aida_run_number"),
-            logs=job.get("aida_logs") or [],
+            # Jobs anteriores ao aida_job_events ainda têm o log na coluna aida_logs
+            logs=self.db.list_job_events(job_id) or job.get("aida_logs") or [],
             documents=[
                 JobDocProgress(
                     document_id=d["aida_id"],
@@ -163,6 +272,52 @@ class JobService:
             ],
         )
 
+    async def open_event_stream(self, job_id: str, last_event_id: str | None = None) -> AsyncIterator[str]:
+        """
+        Stream SSE dos eventos do job (doc_processing, doc_warnings, job_ready, job_failed...).
+
+        O id de cada evento é o aida_id de aida_job_events, então um cliente que reconecta
+        com Last-Event-ID recebe só o que perdeu. Eventos do mesmo processo chegam pelo
+        broker em memória; jobs rodando em workers separados são lidos por polling.
+        """
+        job = self.db.get_job(job_id)
+        if not job:
+            raise NotFound("Job não existe.")
+        after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+        # Assina antes de ler o histórico para não perder eventos gravados no meio
+        sub = job_event_broker.subscribe(job_id)
+        finished = job.get("aida_status") not in ("processing", "queued")
+        return self._event_stream(sub, job_id, after, finished)
+
+    async def _event_stream(self, sub, job_id: str, after: int, finished: bool) -> AsyncIterator[str]:
+        poll = max(0.1, settings.JOB_EVENTS_STREAM_POLL_SECONDS)
+
+        async def read_rows() -> list[tuple[int, dict]]:
+            rows = await run_in_threadpool(self.db.list_job_event_rows, job_id, after)
+            return [(r["aida_id"], row_to_event(r)) for r in rows]
+
+        try:
+            batch = await read_rows()
+            while True:
+                for event_id, event in batch:
+                    if event_id <= after:
+                        continue
+                    after = event_id
+                    yield _sse_message(event_id, event)
+                    if event.get("event") in TERMINAL_EVENTS:
+                        return
+                if finished:
+                    # Job encerrado antes de aida_job_events (log só em aida_logs)
+                    return
+                batch = await sub.get(timeout=poll)
+                if sub.lagged or batch is None:
+                    sub.lagged = False
+                    batch = await read_rows()
+                    if not batch:
+                        yield ": keep-alive\n\n"
+        finally:
+            job_event_broker.unsubscribe(sub)
+
     async def get_project(self, project_id: str) -> ProjectResponse:
         p = self.db.get_project(project_id)
         if not p:
@@ -216,90 +371,71 @@ class JobService:
             self._abort_job(job_id, "Projeto está com status failed.", project_id)
             return
 
+        run = JobRun(
+            job=job,
+            project=project,
+            events=JobEventLog(self.db, job_id, project_id),
+            incremental=bool(job.get("aida_incremental")),
+        )
         try:
-            self.db.append_job_log(job_id, _evt("info", "job_processing_started"))
-            self._send_webhook(project, job, "job_processing_started")
-            docs = self.db.list_documents_by_project(project_id)
-
-            extracted_docs: list[dict] = []
+            with run.timer.stage("job_total"):
+                self._run_pipeline(run)
+        except Exception as e:
+            # Em caso de falha, atualiza tudo para failed
+            self.db.update_project(project_id, {"aida_status": "failed"})
+            project["aida_status"] = "failed"
+            self.db.update_job(job_id, {"aida_status": "failed"})
+            job["aida_status"] = "failed"
+            run.events.emit(_evt("error", "job_failed", {"error": str(e)}))
 
+            # Atualiza documentos pendentes para failed
+            docs = list(run.documents.values()) or self.db.list_documents_by_project(project_id)
             for d in docs:
-                doc_id = d["aida_id"]
-                doc_type_str = d["aida_doc_type"]
-                doc_type = DocType(doc_type_str)
-                
-                storage_bucket = settings.SUPABASE_UPLOADS_BUCKET
-                storage_path = d["aida_storage_path"]
-
-                self.db.update_document(doc_id, {"aida_status": "processing", "aida_error": None})
-                self.db.append_job_log(job_id, _evt("info", "doc_processing", {"doc_id": doc_id, "doc_type": doc_type_str}))
-                self._send_webhook(project, job, "doc_processing", {"doc_id": doc_id, "doc_type": doc_type_str})
-
-                content = self.storage.download(storage_bucket, storage_path)
-                ext = Path(d["aida_original_filename"]).suffix.lower()
-
-                # --- Extração: Planilhas ---
-                if ext in (".xlsx", ".xlsm", ".csv"):
-                    res = extract_tabular(doc_type, content, ext)
-                    extracted_docs.append(res.payload)
-                    self.db.update_document(doc_id, {"aida_status": "ready", "aida_extracted_payload": res.payload})
-                    if res.warnings:
-                        self.db.append_job_log(job_id, _evt("warn", "doc_warnings", {"doc_id": doc_id, "warnings": res.warnings}))
-                        self._send_webhook(project, job, "doc_warnings", {"doc_id": doc_id, "warnings": res.warnings})
-                    continue
-
-                # --- Extração: PDFs ---
-                if ext == ".pdf":
-                    text_res = extract_pdf_text(content)
-                    text = (text_res.payload.get("text") or "").strip()
-                    
-                    if not text:
-                        raise ExtractionError(
-                            "PDF sem texto extraível (nem OCR funcionou).",
-                            details={"doc_id": doc_id, "path": storage_path},
-                        )
-
-                    client = GeminiClient()
-                    
-                    # Usa o novo sistema de prompts "cérebro"
-                    prompt = get_prompt_for_doc_type(doc_type, text)
-                    
-                    patch = client.generate_structured(prompt, PdfExtractionResponse)
-
-                    # Consolida partes do JSON do Gemini
-                    kv = patch.get("kv") or {}
-                    if kv:
-                        extracted_docs.append({"kv": kv})
-
-                    for t in patch.get("tables") or []:
-                        table_name = t.get("table")
-                        rows = t.get("rows") or []
-                        if table_name and rows:
-                            extracted_docs.append({"table": table_name, "rows": rows})
-
-                    self.db.update_document(doc_id, {"aida_status": "ready", "aida_extracted_payload": patch})
-                    if text_res.warnings:
-                        self.db.append_job_log(job_id, _evt("warn", "doc_warnings", {"doc_id": doc_id, "warnings": text_res.warnings}))
-                        self._send_webhook(project, job, "doc_warnings", {"doc_id": doc_id, "warnings": text_res.warnings})
-                    continue
-
-                raise BadRequest(f"Extensão não suportada: {ext}", details={"doc_id": doc_id})
-
-            # Consolidação Final
+                if d["aida_status"] in ("processing", "created"):
+                    self._update_document(run, d["aida_id"], {"aida_status": "failed", "aida_error": str(e)})
+            self._send_webhook(run, "job_failed", {"error": str(e)})
+        finally:
+            self._save_timings(run)
+            run.events.flush()
+
+    def _save_timings(self, run: JobRun) -> None:
+        try:
+            self.db.update_job(run.job_id, {"aida_timings": run.timer.to_dict()})
+        except Exception as e:  # noqa: BLE001
+            run.events.emit(_evt("warn", "job_timings_not_saved", {"error": str(e)}))
+
+    def _run_pipeline(self, run: JobRun) -> None:
+        job, project = run.job, run.project
+        job_id, project_id = run.job_id, run.project_id
+
+        docs = _ordered_documents(self.db.list_documents_by_project(project_id))
+        run.documents = {d["aida_id"]: dict(d) for d in docs}
+        run.events.emit(_evt("info", "job_processing_started"))
+        self._send_webhook(run, "job_processing_started")
+
+        extracted_docs = self._extract_documents(run, docs)
+
+        # Consolidação Final
+        with run.timer.stage("consolidate") as st:
             consolidated: ConsolidatedPayload = consolidate(extracted_docs)
             consolidated_public = consolidated.to_public_dict()
-            
-            self.db.update_project(project_id, {"aida_consolidated_payload": consolidated_public})
+            st.rows = len(extracted_docs)
 
-            project_name = project["aida_name"]
-            safe_name = safe_filename(project_name)
-            out_filename = f"Planilha KOA PE - {safe_name}.xlsx"
-            out_local = f"/tmp/{project_id}_run-{job.get('aida_run_number') or 1}_{out_filename}"
-            
-            write_filled_xlsx(consolidated, project_name=project_name, out_path=out_local)
+        self.db.update_project(project_id, {"aida_consolidated_payload": consolidated_public})
+
+        project_name = project["aida_name"]
+        safe_name = safe_filename(project_name)
+        out_filename = f"Planilha KOA PE - {safe_name}.xlsx"
+        out_local = f"/tmp/{project_id}_run-{job.get('aida_run_number') or 1}_{out_filename}"
 
-            out_storage_path = self._build_output_storage_path(project_id, job.get("aida_run_number"), out_filename)
+        with run.timer.stage("write_xlsx") as st:
+            write_filled_xlsx(consolidated, project_name=project_name, out_path=out_local)
             content_out = Path(out_local).read_bytes()
+            st.bytes = len(content_out)
+
+        out_storage_path = self._build_output_storage_path(project_id, job.get("aida_run_number"), out_filename)
+        with run.timer.stage("upload") as st:
+            st.bytes = len(content_out)
             self.storage.upload(
                 settings.SUPABASE_OUTPUTS_BUCKET,
                 out_storage_path,
@@ -307,61 +443,394 @@ class JobService:
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
 
-            self.db.update_project(project_id, {"aida_status": "ready", "aida_output_xlsx_path": out_storage_path})
-            project["aida_status"] = "ready"
-            self.db.update_job(job_id, {"aida_status": "ready"})
-            job["aida_status"] = "ready"
-            self.db.append_job_log(job_id, _evt("info", "job_ready", {"output_path": out_storage_path}))
-            self._send_webhook(project, job, "job_ready", {"output_path": out_storage_path})
+        self.db.update_project(project_id, {"aida_status": "ready", "aida_output_xlsx_path": out_storage_path})
+        project["aida_status"] = "ready"
+        self.db.update_job(job_id, {"aida_status": "ready"})
+        job["aida_status"] = "ready"
+        ready = {"output_path": out_storage_path}
+        timed_out = [doc_id for doc_id, d in run.documents.items() if d.get("aida_status") == "timed_out"]
+        if timed_out:
+            ready["timed_out_documents"] = timed_out
+        run.events.emit(_evt("info", "job_ready", ready))
+        self._send_webhook(run, "job_ready", ready)
+
+    def _extract_documents(self, run: JobRun, docs: list[dict]) -> list[dict]:
+        """
+        Extrai os documentos em paralelo (até MAX_DOCS_IN_FLIGHT por job) e devolve
+        as partes na ordem dos documentos, para que a consolidação seja determinística.
+        """
+        if not docs:
+            return []
+
+        max_workers = max(1, min(settings.MAX_DOCS_IN_FLIGHT, len(docs)))
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aida-doc")
+        try:
+            futures = [executor.submit(self._extract_document, run, d) for d in docs]
+            wait(futures, return_when=FIRST_EXCEPTION)
+        finally:
+            # Falha em um documento cancela os que ainda não começaram
+            executor.shutdown(wait=True, cancel_futures=True)
 
-        except Exception as e:
-            # Em caso de falha, atualiza tudo para failed
-            self.db.update_project(project_id, {"aida_status": "failed"})
-            project["aida_status"] = "failed"
-            self.db.update_job(job_id, {"aida_status": "failed"})
-            job["aida_status"] = "failed"
-            self.db.append_job_log(job_id, _evt("error", "job_failed", {"error": str(e)}))
-            self._send_webhook(project, job, "job_failed", {"error": str(e)})
+        for fut in futures:
+            if not fut.cancelled() and fut.exception() is not None:
+                raise fut.exception()
 
-            # Atualiza documentos pendentes para failed
-            for d in self.db.list_documents_by_project(project_id):
-                if d["aida_status"] in ("processing", "created"):
-                    self.db.update_document(d["aida_id"], {"aida_status": "failed", "aida_error": str(e)})
+        return [part for fut in futures for part in fut.result()]
 
-    def _send_webhook(
+    def _extract_document(self, run: JobRun, d: dict) -> list[dict]:
+        doc_id = d["aida_id"]
+        doc_type_str = d["aida_doc_type"]
+        doc_type = DocType(doc_type_str)
+
+        storage_bucket = settings.SUPABASE_UPLOADS_BUCKET
+        storage_path = d["aida_storage_path"]
+
+        previous = d.get("aida_extracted_payload") if run.incremental else None
+        fingerprint = self._source_fingerprint(storage_bucket, storage_path)
+        if previous is not None and fingerprint and fingerprint == d.get("aida_source_fingerprint"):
+            return self._reuse_document(run, d, "storage_metadata")
+
+        self._update_document(run, doc_id, {"aida_status": "processing", "aida_error": None})
+        run.events.emit(_evt("info", "doc_processing", {"doc_id": doc_id, "doc_type": doc_type_str}))
+        self._send_webhook(run, "doc_processing", {"doc_id": doc_id, "doc_type": doc_type_str})
+
+        deadline = Deadline.after(settings.DOC_DEADLINE_SECONDS)
+        try:
+            return self._extract_document_content(run, d, doc_type, fingerprint, previous, deadline)
+        except DocumentTimeout as e:
+            return self._timeout_document(run, doc_id, e)
+
+    def _extract_document_content(
+        self, run: JobRun, d: dict, doc_type: DocType, fingerprint: dict | None, previous: dict | None, deadline: Deadline
+    ) -> list[dict]:
+        doc_id = d["aida_id"]
+        storage_bucket = settings.SUPABASE_UPLOADS_BUCKET
+        storage_path = d["aida_storage_path"]
+
+        with run.timer.stage("download", doc_id) as st:
+            content = self.storage.download(storage_bucket, storage_path)
+            st.bytes = len(content)
+        sha256 = content_sha256(content)
+        if previous is not None and sha256 == d.get("aida_content_sha256"):
+            return self._reuse_document(run, d, "sha256", {"aida_source_fingerprint": fingerprint})
+
+        ext = Path(d["aida_original_filename"]).suffix.lower()
+        if ext not in TABULAR_EXTENSIONS and ext != ".pdf":
+            raise BadRequest(f"Extensão não suportada: {ext}", details={"doc_id": doc_id})
+        deadline.check("download")
+
+        cache_key = self.cache.key_for(content, doc_type, ext)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            payload, warnings = cached
+            run.events.emit(_evt("info", "doc_cache_hit", {"doc_id": doc_id}))
+        else:
+            payload, warnings, degraded = self._run_extraction(
+                run, doc_type, content, ext, doc_id, storage_path, deadline
+            )
+            # Resultado parcial por falha passageira/limite não fica no cache: a próxima execução tenta de novo
+            if not degraded:
+                self.cache.put(cache_key, doc_type, payload, warnings)
+
+        self._update_document(
+            run,
+            doc_id,
+            {
+                "aida_status": "ready",
+                "aida_extracted_payload": payload,
+                "aida_content_sha256": sha256,
+                "aida_source_fingerprint": fingerprint,
+            },
+        )
+        if warnings:
+            run.events.emit(_evt("warn", "doc_warnings", {"doc_id": doc_id, "warnings": warnings}))
+            self._send_webhook(run, "doc_warnings", {"doc_id": doc_id, "warnings": warnings})
+        return _payload_to_parts(payload)
+
+    def _timeout_document(self, run: JobRun, doc_id: str, e: DocumentTimeout) -> list[dict]:
+        """Documento estourou o prazo: guarda o parcial e deixa o resto do job seguir."""
+        self._update_document(
+            run,
+            doc_id,
+            {
+                "aida_status": "timed_out",
+                "aida_error": e.message,
+                "aida_extracted_payload": {"partial": True, "stage": e.stage, **(e.partial or {})},
+                # Sem fingerprint/sha256 o próximo reprocess incremental extrai de novo
+                "aida_content_sha256": None,
+                "aida_source_fingerprint": None,
+            },
+        )
+        details = {"doc_id": doc_id, "stage": e.stage, "budget_seconds": settings.DOC_DEADLINE_SECONDS}
+        run.events.emit(_evt("warn", "doc_timed_out", details))
+        self._send_webhook(run, "doc_timed_out", details)
+        # Linhas obtidas antes do prazo ainda entram na consolidação
+        partial = e.partial or {}
+        if "kv" in partial or "tables" in partial:
+            return _patch_to_parts(partial)
+        rows = partial.get("rows")
+        table = partial.get("table")
+        return [{"table": table, "rows": rows}] if table and rows else []
+
+    def _reuse_document(self, run: JobRun, d: dict, reason: str, patch: dict | None = None) -> list[dict]:
+        doc_id = d["aida_id"]
+        self._update_document(run, doc_id, {"aida_status": "ready", "aida_error": None, **(patch or {})})
+        run.events.emit(_evt("info", "doc_reused", {"doc_id": doc_id, "reason": reason}))
+        self._send_webhook(run, "doc_reused", {"doc_id": doc_id, "reason": reason})
+        return _payload_to_parts(d["aida_extracted_payload"])
+
+    def _source_fingerprint(self, bucket: str, path: str) -> dict | None:
+        # Metadados baratos do storage (etag/tamanho/data) para detectar arquivos alterados sem baixar
+        try:
+            fingerprint = self.storage.stat(bucket, path)
+        except Exception:  # noqa: BLE001
+            return None
+        # Sem etag nem (tamanho + data) a comparação não distingue versões: vale o sha256 do conteúdo
+        if not fingerprint or not (
+            fingerprint.get("etag") or (fingerprint.get("size") is not None and fingerprint.get("updated_at"))
+        ):
+            return None
+        return fingerprint
+
+    def _run_extraction(
         self,
-        project: dict,
-        job: dict,
-        event: str,
-        details: dict | None = None,
-    ) -> None:
-        url = project.get("aida_webhook_url")
+        run: JobRun,
+        doc_type: DocType,
+        content: bytes,
+        ext: str,
+        doc_id: str,
+        storage_path: str,
+        deadline: Deadline | None = None,
+    ) -> tuple[dict, list[str], bool]:
+        """Extrai um documento e devolve (payload, avisos, degradado); ver `ExtractResult.degraded`."""
+        deadline = deadline or Deadline()
+        # --- Extração: Planilhas ---
+        if ext in TABULAR_EXTENSIONS:
+            with run.timer.stage("tabular_extract", doc_id) as st:
+                res = self._run_cpu_stage("tabular_extract", deadline, extract_tabular, doc_type, content, ext)
+                st.rows = len(res.payload.get("rows") or [])
+            if res.llm_mapping is not None:
+                # No processo pai: usa o cliente e o limitador de cota do processo, não um por filho do pool
+                with run.timer.stage("mapping_llm", doc_id) as st:
+                    res = complete_llm_mapping(
+                        doc_type, res, timeout=deadline.cap(settings.GEMINI_TIMEOUT_SECONDS)
+                    )
+                    st.rows = len(res.payload.get("rows") or [])
+            _record_stages(run.timer, res.stages, doc_id)
+            return res.payload, res.warnings, res.degraded
+
+        # --- Extração: PDFs de relatório com tabela nativa (sem LLM) ---
+        if settings.PDF_TABLES_ENABLED and doc_type in PDF_TABLE_DOC_TYPES:
+            with run.timer.stage("pdf_tables_extract", doc_id) as st:
+                table_res = self._run_cpu_stage("pdf_tables_extract", deadline, extract_pdf_tables, doc_type, content)
+                st.rows = len(table_res.payload.get("rows") or []) if table_res else 0
+            if table_res is not None:
+                _record_stages(run.timer, table_res.stages, doc_id)
+                return table_res.payload, table_res.warnings, table_res.degraded
+
+        # --- Extração: PDFs ---
+        with run.timer.stage("pdf_extract", doc_id) as st:
+            text_res = self._run_cpu_stage(
+                "pdf_extract", deadline, extract_pdf_text, content, get_ocr_profile(doc_type), deadline
+            )
+            st.bytes = len(text_res.payload.get("text") or "")
+        _record_stages(run.timer, text_res.stages, doc_id)
+        text = (text_res.payload.get("text") or "").strip()
+        if text_res.payload.get("timed_out_stage"):
+            raise DocumentTimeout(text_res.payload["timed_out_stage"], deadline.budget_seconds, {"text": text})
+        deadline.check("pdf_extract", {"text": text})
+
+        if not text:
+            raise ExtractionError(
+                "PDF sem texto extraível (nem OCR funcionou).",
+                details={"doc_id": doc_id, "path": storage_path},
+            )
+
+        warnings = list(text_res.warnings)
+        page_starts = text_res.payload.get("page_starts")
+        # Cabeçalho do relatório (título/títulos de coluna) que a compactação deixou só no início
+        context = ""
+        if settings.TEXT_COMPACTION_ENABLED:
+            # Cabeçalhos/rodapés repetidos e espaços de alinhamento só gastam tokens
+            with run.timer.stage("text_compact", doc_id) as st:
+                compacted = compact_text(
+                    text, page_starts, min_page_ratio=settings.TEXT_BOILERPLATE_MIN_PAGE_RATIO
+                )
+                st.bytes = len(compacted.text)
+                st.rows = compacted.removed_lines
+            if compacted.text:
+                text, page_starts = compacted.text, compacted.page_starts
+                context = "\n".join(compacted.repeated_lines)
+
+        chunks = (
+            chunk_text(text, max(1, settings.LLM_CHUNK_TOKENS - estimate_tokens(context)), page_starts)
+            if settings.LLM_CHUNKING_ENABLED
+            else [text]
+        )
+        if context and len(chunks) > 1:
+            # Sem isso os trechos 2..N chegam ao Gemini como linhas soltas, sem títulos de coluna
+            chunks = [chunks[0], *(f"{context}\n{c}" for c in chunks[1:])]
+        if len(chunks) > settings.LLM_MAX_CHUNKS:
+            warnings.append(
+                f"Texto dividido em {len(chunks)} trechos; só os primeiros {settings.LLM_MAX_CHUNKS} "
+                f"foram enviados ao Gemini (LLM_MAX_CHUNKS)."
+            )
+            chunks = chunks[: settings.LLM_MAX_CHUNKS]
+
+        # Modelo escolhido pelo tamanho do documento inteiro, igual para todos os trechos
+        model = select_gemini_model(sum(estimate_tokens(c) for c in chunks))
+        usage = LlmUsage()
+        with run.timer.stage("gemini", doc_id) as st:
+            st.model = model
+            try:
+                patch = self._generate_pdf_patch(doc_type, chunks, deadline, model, usage)
+            except DocumentTimeout as e:
+                e.partial = {"text": text, **(e.partial or {})}
+                raise
+            except UpstreamError:
+                deadline.check("gemini", {"text": text})
+                raise
+            finally:
+                st.prompt_tokens = usage.prompt_tokens
+                st.output_tokens = usage.output_tokens
+            st.bytes = sum(len(c) for c in chunks)
+            st.rows = sum(len(t.get("rows") or []) for t in patch.get("tables") or [])
+        if len(chunks) > 1:
+            run.events.emit(_evt("info", "doc_chunked", {"doc_id": doc_id, "chunks": len(chunks)}))
+        run.events.emit(_evt("info", "doc_llm_usage", {"doc_id": doc_id, "model": model, **usage.as_dict()}))
+        return patch, warnings, text_res.degraded
+
+    def _generate_pdf_patch(
+        self, doc_type: DocType, chunks: list[str], deadline: Deadline, model: str, usage: LlmUsage
+    ) -> dict:
+        """
+        Um trecho: uma chamada, como sempre. Vários: chamadas em paralelo (até
+        LLM_CHUNK_CONCURRENCY) com as respostas juntadas na ordem do documento. Se o prazo
+        acabar no meio, as respostas dos trechos já concluídos vão no parcial do DocumentTimeout.
+        """
+        client = get_gemini_client()
+
+        def call(prompt_text: str) -> dict:
+            # Usa o novo sistema de prompts "cérebro"
+            prompt = get_prompt_for_doc_type(doc_type, prompt_text)
+            return client.generate_structured(
+                prompt,
+                PdfExtractionResponse,
+                timeout=deadline.cap(settings.GEMINI_TIMEOUT_SECONDS),
+                model=model,
+                usage=usage,
+            )
+
+        if len(chunks) == 1:
+            return call(chunks[0])
+
+        texts = [chunk_header(i, len(chunks)) + c for i, c in enumerate(chunks, start=1)]
+        max_workers = max(1, min(settings.LLM_CHUNK_CONCURRENCY, len(texts)))
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aida-llm")
+        try:
+            futures = [executor.submit(call, t) for t in texts]
+            wait(futures, return_when=FIRST_EXCEPTION)
+        finally:
+            # Um trecho com erro invalida o documento; não gasta chamadas com os que faltam
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        done = [fut for fut in futures if not fut.cancelled() and fut.exception() is None]
+        if len(done) < len(futures):
+            deadline.check("gemini", merge_structured_responses([fut.result() for fut in done]))
+            for fut in futures:
+                if not fut.cancelled() and fut.exception() is not None:
+                    raise fut.exception()
+        return merge_structured_responses([fut.result() for fut in futures])
+
+    def _run_cpu_stage(self, stage: str, deadline: Deadline, fn, *args):
+        # As etapas param sozinhas no prazo; o timeout do pool (com folga) só corta quem não parou
+        remaining = deadline.remaining()
+        timeout = settings.CPU_TASK_TIMEOUT_SECONDS or None
+        if remaining is not None:
+            timeout = min(timeout or float("inf"), remaining + DEADLINE_GRACE_SECONDS)
+        try:
+            return run_cpu_bound(fn, *args, timeout=timeout)
+        except ExtractionError:
+            deadline.check(stage)
+            raise
+
+    def _abort_job(self, job_id: str, reason: str, project_id: str | None = None) -> None:
+        self.db.update_job(job_id, {"aida_status": "failed"})
+        self.db.append_job_log(
+            job_id, _evt("error", "job_aborted", {"reason": reason, "project_id": project_id}), project_id=project_id
+        )
+
+    @staticmethod
+    def _build_output_storage_path(project_id: str, run_number: int | None, filename: str) -> str:
+        return f"{project_id}/run-{run_number or 1}/{filename}"
+
+    def _update_document(self, run: JobRun, doc_id: str, patch: dict) -> None:
+        self.db.update_document(doc_id, patch)
+        with run.lock:
+            run.documents.setdefault(doc_id, {"aida_id": doc_id}).update(patch)
+
+    def _send_webhook(self, run: JobRun, event: str, details: dict | None = None) -> None:
+        url = run.project.get("aida_webhook_url")
         if not url:
             return
 
-        docs = self.db.list_documents_by_project(project["aida_id"])
-        payload = {
-            "event": event,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "project_id": project["aida_id"],
-            "job_id": job["aida_id"],
-            "project_status": project.get("aida_status"),
-            "job_status": job.get("aida_status"),
-            "documents": [
+        with run.lock:
+            documents = [
                 {
                     "document_id": d["aida_id"],
-                    "doc_type": d["aida_doc_type"],
-                    "status": d["aida_status"],
+                    "doc_type": d.get("aida_doc_type"),
+                    "status": d.get("aida_status"),
                     "error": d.get("aida_error"),
                 }
-                for d in docs
-            ],
+                for d in run.documents.values()
+            ]
+        payload = {
+            "event": event,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "project_id": run.project_id,
+            "job_id": run.job_id,
+            "project_status": run.project.get("aida_status"),
+            "job_status": run.job.get("aida_status"),
+            "documents": documents,
         }
 
         if details:
             payload["details"] = details
 
-        send_webhook_background(url, payload, loop=self.loop)
+        dispatch_webhook(url, payload, loop=self.loop)
+
+def _record_stages(timer: StageTimer, stages: list[dict], doc_id: str) -> None:
+    # Sub-etapas medidas dentro do extrator (possivelmente em outro processo)
+    for r in stages:
+        timer.add(r["stage"], r.get("seconds") or 0.0, doc_id=doc_id, bytes=r.get("bytes"), rows=r.get("rows"))
+
+def _ordered_documents(docs: list[dict]) -> list[dict]:
+    # A API do banco não garante ordem; fixamos a ordem de criação para consolidar sempre igual
+    return sorted(docs, key=lambda d: (d.get("aida_created_at") or "", d["aida_id"]))
+
+def _payload_to_parts(payload: dict) -> list[dict]:
+    """Converte o aida_extracted_payload de um documento nas partes aceitas por `consolidate`."""
+    if "kv" in payload or "tables" in payload:
+        return _patch_to_parts(payload)
+    return [payload]
+
+def _patch_to_parts(patch: dict) -> list[dict]:
+    """Quebra a resposta do Gemini ({"kv", "tables"}) nas partes aceitas por `consolidate`."""
+    parts: list[dict] = []
+    kv = patch.get("kv") or {}
+    if kv:
+        parts.append({"kv": kv})
+
+    for t in patch.get("tables") or []:
+        table_name = t.get("table")
+        rows = t.get("rows") or []
+        if table_name and rows:
+            parts.append({"table": table_name, "rows": rows})
+    return parts
+
+def _sse_message(event_id: int, event: dict) -> str:
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    return f"id: {event_id}\nevent: {event.get('event') or 'message'}\ndata: {data}\n\n"
 
 def _evt(level: str, event: str, extra: dict | None = None) -> dict:
     d = {
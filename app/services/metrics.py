@@ -4,8 +4,11 @@ from typing import Any
 
 from supabase import Client
 
-from app.models.schemas import MetricsResponse, StatusCounts
+from app.core.config import settings
+from app.extractors.gemini import gemini_limiter_snapshot
+from app.models.schemas import LlmConcurrencyStats, MetricsResponse, StageTimingStats, StatusCounts
 from app.supabase.client import supabase_client
+from app.supabase.events import row_to_event
 
 
 class MetricsService:
@@ -34,33 +37,63 @@ class MetricsService:
         )
 
     def _recent_logs(self, limit: int = 20) -> list[dict[str, Any]]:
+        # aida_job_events é append-only e indexada por aida_ts: uma única leitura ordenada
+        res = (
+            self.sb.table("aida_job_events")
+            .select("aida_job_id,aida_project_id,aida_ts,aida_level,aida_event,aida_data")
+            .order("aida_ts", desc=True)
+            .limit(limit)
+            .execute()
+        )
+
+        return [
+            {**row_to_event(row), "job_id": row.get("aida_job_id"), "project_id": row.get("aida_project_id")}
+            for row in res.data or []
+        ]
+
+    def _stage_timings(self, limit: int = 50) -> dict[str, StageTimingStats]:
+        # Agrega os tempos por etapa (aida_jobs.aida_timings) dos jobs mais recentes
         res = (
             self.sb.table("aida_jobs")
-            .select("aida_id,aida_project_id,aida_logs,aida_updated_at")
+            .select("aida_timings,aida_updated_at")
             .order("aida_updated_at", desc=True)
             .limit(limit)
             .execute()
         )
 
-        logs: list[dict[str, Any]] = []
+        samples: dict[str, list[dict[str, Any]]] = {}
         for job in res.data or []:
-            job_id = job.get("aida_id")
-            project_id = job.get("aida_project_id")
-            for entry in job.get("aida_logs") or []:
-                enriched = {**entry, "job_id": job_id, "project_id": project_id}
-                logs.append(enriched)
+            for record in (job.get("aida_timings") or {}).get("stages") or []:
+                samples.setdefault(record["stage"], []).append(record)
 
-        logs.sort(key=lambda item: item.get("ts", ""), reverse=True)
-        return logs[:limit]
+        out: dict[str, StageTimingStats] = {}
+        for stage, records in samples.items():
+            seconds = sorted(r.get("seconds") or 0.0 for r in records)
+            p95_idx = min(len(seconds) - 1, int(round(0.95 * (len(seconds) - 1))))
+            out[stage] = StageTimingStats(
+                count=len(seconds),
+                avg_seconds=round(sum(seconds) / len(seconds), 4),
+                p95_seconds=seconds[p95_idx],
+                max_seconds=seconds[-1],
+                total_bytes=sum(r.get("bytes") or 0 for r in records),
+                total_rows=sum(r.get("rows") or 0 for r in records),
+                total_prompt_tokens=sum(r.get("prompt_tokens") or 0 for r in records),
+                total_output_tokens=sum(r.get("output_tokens") or 0 for r in records),
+            )
+        return out
 
     def fetch_metrics(self) -> MetricsResponse:
         projects = self._status_counts("aida_projects")
         jobs = self._status_counts("aida_jobs")
         documents_total = self._count("aida_documents")
+        # Com a fila durável as chamadas ao Gemini rodam nos workers, não no processo da API
+        limiter = None if settings.JOB_QUEUE_ENABLED else gemini_limiter_snapshot()
 
         return MetricsResponse(
             projects=projects,
             jobs=jobs,
             documents=documents_total,
             recent_logs=self._recent_logs(),
+            stage_timings=self._stage_timings(),
+            llm_concurrency=LlmConcurrencyStats(**limiter) if limiter else None,
         )
@@ -7,6 +7,8 @@ from typing import Any
 
 import httpx
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -79,3 +81,135 @@ def send_webhook_background(
 
     asyncio.run(coro)
     return None
+
+
+class WebhookDispatcher:
+    """
+    Dispatcher de webhooks com escopo de aplicação.
+
+    Um único `httpx.AsyncClient` com keep-alive é compartilhado por todas as entregas e
+    os eventos passam por filas limitadas consumidas por tasks dedicadas, então o
+    pipeline só enfileira e segue. Cada URL cai sempre na mesma fila (hash da URL),
+    preservando a ordem dos eventos por destino. Com a fila cheia o evento é descartado.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = 4,
+        queue_size: int = 1000,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_base_seconds: float = DEFAULT_BACKOFF_BASE_SECONDS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        client: httpx.AsyncClient | None = None,
+    ):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.timeout_seconds = timeout_seconds
+        self._client = client
+        self._own_client = client is None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        self.delivered = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and not self._loop.is_closed() and bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_seconds,
+                limits=httpx.Limits(max_connections=self.workers * 2, max_keepalive_connections=self.workers),
+            )
+        per_queue = max(1, self.queue_size // self.workers)
+        self._queues = [asyncio.Queue(maxsize=per_queue) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(q)) for q in self._queues]
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Webhook dispatcher stopped with %s pending events", self.pending)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._own_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._loop = None
+
+    @property
+    def pending(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def submit(self, url: str, payload: dict[str, Any]) -> None:
+        """Enfileira uma entrega. Seguro para chamar de qualquer thread."""
+        if not url or self._loop is None:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._enqueue(url, payload)
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, url, payload)
+
+    def _enqueue(self, url: str, payload: dict[str, Any]) -> None:
+        queue = self._queues[hash(url) % len(self._queues)]
+        try:
+            queue.put_nowait((url, payload))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Webhook queue full; dropping event %s for %s", payload.get("event"), url)
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            url, payload = await queue.get()
+            try:
+                await deliver_webhook(
+                    url,
+                    payload,
+                    max_attempts=self.max_attempts,
+                    backoff_base_seconds=self.backoff_base_seconds,
+                    timeout_seconds=self.timeout_seconds,
+                    client=self._client,
+                )
+                self.delivered += 1
+            except Exception:  # noqa: BLE001
+                logger.exception("Webhook worker error")
+            finally:
+                queue.task_done()
+
+
+_dispatcher: WebhookDispatcher | None = None
+
+
+def get_webhook_dispatcher() -> WebhookDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = WebhookDispatcher(
+            workers=settings.WEBHOOK_WORKERS,
+            queue_size=settings.WEBHOOK_QUEUE_SIZE,
+        )
+    return _dispatcher
+
+
+def dispatch_webhook(url: str, payload: dict[str, Any], *, loop: asyncio.AbstractEventLoop | None = None) -> None:
+    """Entrega pelo dispatcher compartilhado; sem dispatcher ativo (scripts/testes) cai no envio avulso."""
+    dispatcher = get_webhook_dispatcher()
+    if dispatcher.running:
+        dispatcher.submit(url, payload)
+        return
+    send_webhook_background(url, payload, loop=loop)
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+from datetime import datetime, timezone
 from typing import Any
 from uuid import uuid4
 
 from app.core.errors import NotFound
 from app.supabase.client import supabase_client
+from app.supabase.events import event_to_row, row_to_event
 
 class DB:
     def __init__(self):
@@ -33,13 +35,17 @@ class DB:
         # Patch deve conter chaves com prefixo aida_ (ex: aida_status)
         self.sb.table("aida_projects").update(patch).eq("aida_id", project_id).execute()
 
-    def create_job(self, project_id: str, run_number: int | None = None) -> dict[str, Any]:
+    def create_job(
+        self, project_id: str, run_number: int | None = None, incremental: bool = False
+    ) -> dict[str, Any]:
         # Tabela: aida_jobs
         payload = {
             "aida_project_id": project_id,
             "aida_status": "created",
             "aida_run_number": run_number or 1,
         }
+        if incremental:
+            payload["aida_incremental"] = True
         res = self.sb.table("aida_jobs").insert(payload).execute()
         return res.data[0]
 
@@ -79,16 +85,67 @@ class DB:
         )
         return res.data[0] if res.data else None
 
-    def append_job_log(self, job_id: str, event: dict[str, Any]) -> None:
-        job = self.get_job(job_id)
-        if not job:
+    def append_job_log(self, job_id: str, event: dict[str, Any], project_id: str | None = None) -> None:
+        self.append_job_events(job_id, [event], project_id=project_id)
+
+    def append_job_events(
+        self, job_id: str, events: list[dict[str, Any]], project_id: str | None = None
+    ) -> list[dict[str, Any]]:
+        # Tabela append-only: um insert em lote, sem ler/reescrever aida_logs
+        if not events:
+            return []
+        rows = [event_to_row(job_id, e, project_id) for e in events]
+        res = self.sb.table("aida_job_events").insert(rows).execute()
+        return res.data or []
+
+    def list_job_events(self, job_id: str) -> list[dict[str, Any]]:
+        return [row_to_event(r) for r in self.list_job_event_rows(job_id)]
+
+    def list_job_event_rows(self, job_id: str, after_id: int = 0) -> list[dict[str, Any]]:
+        query = self.sb.table("aida_job_events").select("*").eq("aida_job_id", job_id)
+        if after_id:
+            query = query.gt("aida_id", after_id)
+        res = query.order("aida_id").execute()
+        return res.data or []
+
+    def enqueue_job(self, job_id: str) -> None:
+        # Tabela: aida_job_queue (consumida por app.worker)
+        self.sb.table("aida_job_queue").insert({"aida_job_id": job_id}).execute()
+
+    def claim_queued_jobs(self, worker_id: str, limit: int, lease_seconds: int) -> list[dict[str, Any]]:
+        # RPC com FOR UPDATE SKIP LOCKED: dois workers nunca pegam o mesmo job
+        res = self.sb.rpc(
+            "aida_claim_jobs",
+            {"p_worker_id": worker_id, "p_limit": limit, "p_lease_seconds": lease_seconds},
+        ).execute()
+        return res.data or []
+
+    def heartbeat_queued_jobs(self, worker_id: str, job_ids: list[str]) -> None:
+        if not job_ids:
             return
-        # Coluna: aida_logs
-        logs = job.get("aida_logs") or []
-        if not isinstance(logs, list):
-            logs = []
-        logs.append(event)
-        self.update_job(job_id, {"aida_logs": logs})
+        (
+            self.sb.table("aida_job_queue")
+            .update({"aida_locked_at": datetime.now(timezone.utc).isoformat()})
+            .eq("aida_locked_by", worker_id)
+            .in_("aida_job_id", job_ids)
+            .execute()
+        )
+
+    def finish_queued_job(self, job_id: str, status: str, error: str | None = None) -> None:
+        patch: dict[str, Any] = {"aida_status": status, "aida_locked_by": None, "aida_locked_at": None}
+        if error:
+            patch["aida_last_error"] = error
+        self.sb.table("aida_job_queue").update(patch).eq("aida_job_id", job_id).execute()
+
+    def get_extraction_cache(self, key: str) -> dict[str, Any] | None:
+        res = self.sb.table("aida_extraction_cache").select("*").eq("aida_key", key).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    def put_extraction_cache(
+        self, key: str, doc_type: str, payload: dict[str, Any], warnings: list[str]
+    ) -> None:
+        row = {"aida_key": key, "aida_doc_type": doc_type, "aida_payload": payload, "aida_warnings": warnings}
+        self.sb.table("aida_extraction_cache").upsert(row).execute()
 
     def create_document(
         self,
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Any
+
+# Conversão entre eventos de job e linhas da tabela aida_job_events
+
+
+def event_to_row(job_id: str, event: dict[str, Any], project_id: str | None = None) -> dict[str, Any]:
+    data = {k: v for k, v in event.items() if k not in ("ts", "level", "event")}
+    row = {
+        "aida_job_id": job_id,
+        "aida_level": event.get("level") or "info",
+        "aida_event": event.get("event") or "unknown",
+        "aida_data": data,
+    }
+    if event.get("ts"):
+        row["aida_ts"] = event["ts"]
+    if project_id:
+        row["aida_project_id"] = project_id
+    return row
+
+
+def row_to_event(row: dict[str, Any]) -> dict[str, Any]:
+    return {
+        **(row.get("aida_data") or {}),
+        "ts": row.get("aida_ts"),
+        "level": row.get("aida_level"),
+        "event": row.get("aida_event"),
+    }
@@ -26,6 +26,20 @@ class Storage:
             )
         return b
 
+    def stat(self, bucket: str, path: str) -> dict:
+        """Metadados do objeto usados para detectar mudanças: etag, tamanho e última modificação."""
+        def _do():
+            return self.sb.storage.from_(bucket).info(path)
+        try:
+            info = retry(_do, attempts=2)
+        except Exception as e:
+            raise UpstreamError("Falha ao consultar metadados no Supabase Storage.", details=str(e))
+        return {
+            "etag": info.get("etag") or info.get("eTag"),
+            "size": info.get("size"),
+            "updated_at": info.get("last_modified") or info.get("updated_at"),
+        }
+
     def upload(self, bucket: str, path: str, content: bytes, content_type: str) -> None:
         def _do():
             return self.sb.storage.from_(bucket).upload(
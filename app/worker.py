@@ -0,0 +1,152 @@
+"""
+Worker de processamento de jobs.
+
+Consome a fila durável `aida_job_queue` (sql/003_aida_job_queue.sql) e executa o
+pipeline fora dos workers web, permitindo escalar extração separado da API:
+
+    JOB_QUEUE_ENABLED=true python -m app.worker
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from app.core.config import settings
+from app.core.cpu_pool import get_cpu_pool
+from app.core.logging import get_logger
+from app.services.job_service import JobService
+from app.services.webhook import get_webhook_dispatcher
+from app.supabase.db import DB
+
+log = get_logger("app.worker")
+
+
+class JobWorker:
+    def __init__(
+        self,
+        db: DB | None = None,
+        service: JobService | None = None,
+        *,
+        concurrency: int | None = None,
+        poll_interval: float | None = None,
+        lease_seconds: int | None = None,
+        worker_id: str | None = None,
+    ):
+        self.db = db or DB()
+        self._service = service
+        self.concurrency = max(1, concurrency or settings.WORKER_CONCURRENCY)
+        self.poll_interval = poll_interval if poll_interval is not None else settings.WORKER_POLL_INTERVAL_SECONDS
+        self.lease_seconds = lease_seconds or settings.WORKER_LEASE_SECONDS
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:6]}"
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="aida-worker")
+        self._running: dict[str, asyncio.Task] = {}
+
+    @property
+    def service(self) -> JobService:
+        # Criado dentro do loop para que os webhooks sejam agendados nele
+        if self._service is None:
+            self._service = JobService(db=self.db)
+        return self._service
+
+    async def run_once(self) -> int:
+        """Reivindica jobs até completar os slots livres. Retorna quantos foram iniciados."""
+        free = self.concurrency - len(self._running)
+        if free <= 0:
+            return 0
+
+        loop = asyncio.get_running_loop()
+        claimed = await loop.run_in_executor(
+            None, self.db.claim_queued_jobs, self.worker_id, free, self.lease_seconds
+        )
+        for entry in claimed:
+            job_id = entry["aida_job_id"]
+            task = asyncio.create_task(self._run_job(job_id))
+            self._running[job_id] = task
+            task.add_done_callback(lambda _t, jid=job_id: self._running.pop(jid, None))
+        return len(claimed)
+
+    async def _run_job(self, job_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        log.info("worker_job_started", extra={"job_id": job_id, "worker_id": self.worker_id})
+        try:
+            await loop.run_in_executor(self._executor, self.service._process_job_sync, job_id)
+        except Exception as e:  # noqa: BLE001
+            log.exception("worker_job_crashed", extra={"job_id": job_id})
+            await loop.run_in_executor(None, self.db.finish_queued_job, job_id, "failed", str(e))
+            return
+        # O pipeline registra falhas no próprio job sem propagar: a fila segue o status final dele
+        status, error = "done", None
+        try:
+            job = await loop.run_in_executor(None, self.db.get_job, job_id)
+        except Exception:  # noqa: BLE001
+            log.warning("worker_job_status_unavailable", extra={"job_id": job_id})
+            job = {}
+        if job is None:
+            status, error = "failed", "Job não encontrado."
+        elif job.get("aida_status") == "failed":
+            status, error = "failed", "Job terminou com status failed (ver aida_job_events)."
+        await loop.run_in_executor(None, self.db.finish_queued_job, job_id, status, error)
+        log.info("worker_job_finished", extra={"job_id": job_id, "worker_id": self.worker_id, "status": status})
+
+    async def _heartbeat(self) -> None:
+        # Renova o lease dos jobs longos (OCR/LLM) para não serem reivindicados por outro worker
+        interval = max(1.0, self.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            if not self._running:
+                continue
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.db.heartbeat_queued_jobs, self.worker_id, list(self._running)
+                )
+            except Exception:  # noqa: BLE001
+                log.warning("worker_heartbeat_failed", extra={"worker_id": self.worker_id})
+
+    async def run(self, stop: asyncio.Event | None = None) -> None:
+        stop = stop or asyncio.Event()
+        log.info("worker_started", extra={"worker_id": self.worker_id, "concurrency": self.concurrency})
+        dispatcher = get_webhook_dispatcher()
+        await dispatcher.start()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while not stop.is_set():
+                try:
+                    started = await self.run_once()
+                except Exception:  # noqa: BLE001
+                    log.exception("worker_claim_failed")
+                    started = 0
+                if started:
+                    continue
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Shutdown gracioso: termina os jobs em andamento antes de sair
+            if self._running:
+                await asyncio.gather(*self._running.values(), return_exceptions=True)
+            heartbeat.cancel()
+            self._executor.shutdown(wait=True)
+            get_cpu_pool().shutdown()
+            await dispatcher.stop()
+            log.info("worker_stopped", extra={"worker_id": self.worker_id})
+
+
+async def _main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await JobWorker().run(stop)
+
+
+def main() -> None:
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
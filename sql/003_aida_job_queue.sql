@@ -0,0 +1,71 @@
+-- ==============================================================================
+-- TABELA: aida_job_queue
+-- Fila durável de jobs consumida pelos workers (python -m app.worker).
+-- Cada job entra uma vez; workers reivindicam com FOR UPDATE SKIP LOCKED.
+-- ==============================================================================
+create table if not exists public.aida_job_queue (
+  aida_id bigserial primary key,
+  aida_job_id uuid not null unique references public.aida_jobs(aida_id) on delete cascade,
+  aida_status text not null default 'queued' check (aida_status in ('queued','running','done','failed')),
+  aida_attempts int not null default 0,
+  aida_max_attempts int not null default 3,
+  aida_available_at timestamptz not null default now(),
+  aida_locked_by text,
+  aida_locked_at timestamptz,
+  aida_last_error text,
+  aida_created_at timestamptz not null default now(),
+  aida_updated_at timestamptz not null default now()
+);
+
+create index if not exists idx_aida_job_queue_pending
+  on public.aida_job_queue(aida_status, aida_available_at);
+
+alter table public.aida_job_queue enable row level security;
+
+create policy "Acesso total via Service Role"
+  on public.aida_job_queue
+  for all
+  using ( auth.role() = 'service_role' );
+
+drop trigger if exists trg_aida_job_queue_updated_at on public.aida_job_queue;
+create trigger trg_aida_job_queue_updated_at
+before update on public.aida_job_queue
+for each row execute function public.aida_set_updated_at();
+
+
+-- ==============================================================================
+-- RPC: aida_claim_jobs
+-- Reivindica até p_limit jobs para o worker p_worker_id.
+-- Jobs "running" cujo lease expirou (worker morreu) voltam a ser elegíveis
+-- enquanto não estourarem aida_max_attempts; depois disso são marcados failed.
+-- ==============================================================================
+create or replace function public.aida_claim_jobs(p_worker_id text, p_limit int, p_lease_seconds int)
+returns setof public.aida_job_queue
+language plpgsql as $$
+begin
+  update public.aida_job_queue
+     set aida_status = 'failed',
+         aida_last_error = 'Lease expirado após atingir o máximo de tentativas.'
+   where aida_status = 'running'
+     and aida_locked_at < now() - make_interval(secs => p_lease_seconds)
+     and aida_attempts >= aida_max_attempts;
+
+  return query
+  update public.aida_job_queue q
+     set aida_status = 'running',
+         aida_locked_by = p_worker_id,
+         aida_locked_at = now(),
+         aida_attempts = q.aida_attempts + 1
+   where q.aida_id in (
+     select c.aida_id
+       from public.aida_job_queue c
+      where (c.aida_status = 'queued' and c.aida_available_at <= now())
+         or (c.aida_status = 'running'
+             and c.aida_locked_at < now() - make_interval(secs => p_lease_seconds)
+             and c.aida_attempts < c.aida_max_attempts)
+      order by c.aida_available_at, c.aida_id
+      limit p_limit
+      for update skip locked
+   )
+  returning q.*;
+end $$;
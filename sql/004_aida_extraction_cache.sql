@@ -0,0 +1,24 @@
+-- ==============================================================================
+-- TABELA: aida_extraction_cache
+-- Resultado de extração endereçado por conteúdo:
+-- sha256(bytes) + doc_type + extensão + versão de prompt/schema + modelo.
+-- Reprocessamentos de arquivos idênticos não pagam OCR/Gemini de novo.
+-- ==============================================================================
+create table if not exists public.aida_extraction_cache (
+  aida_key text primary key,
+  aida_doc_type text not null,
+  aida_payload jsonb not null,
+  aida_warnings jsonb not null default '[]'::jsonb,
+  aida_created_at timestamptz not null default now()
+);
+
+alter table public.aida_extraction_cache enable row level security;
+
+create policy "Acesso total via Service Role"
+  on public.aida_extraction_cache
+  for all
+  using ( auth.role() = 'service_role' );
+
+-- Hash do conteúdo processado na última execução de cada documento
+alter table public.aida_documents
+    add column if not exists aida_content_sha256 text;
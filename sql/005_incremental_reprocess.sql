@@ -0,0 +1,7 @@
+-- Reprocessamento incremental: o job lembra o modo e cada documento guarda
+-- os metadados do storage (etag/size/updated_at) da última extração.
+alter table public.aida_jobs
+    add column if not exists aida_incremental boolean not null default false;
+
+alter table public.aida_documents
+    add column if not exists aida_source_fingerprint jsonb;
@@ -0,0 +1,25 @@
+-- ==============================================================================
+-- TABELA: aida_job_events
+-- Log append-only dos jobs. Substitui a reescrita de aida_jobs.aida_logs a cada
+-- evento (O(n²) e sujeita a perda em escritas concorrentes). aida_logs fica só
+-- para jobs antigos.
+-- ==============================================================================
+create table if not exists public.aida_job_events (
+  aida_id bigserial primary key,
+  aida_job_id uuid not null references public.aida_jobs(aida_id) on delete cascade,
+  aida_project_id uuid,
+  aida_ts timestamptz not null default now(),
+  aida_level text not null default 'info',
+  aida_event text not null,
+  aida_data jsonb not null default '{}'::jsonb
+);
+
+create index if not exists idx_aida_job_events_job_id on public.aida_job_events(aida_job_id, aida_id);
+create index if not exists idx_aida_job_events_ts on public.aida_job_events(aida_ts desc);
+
+alter table public.aida_job_events enable row level security;
+
+create policy "Acesso total via Service Role"
+  on public.aida_job_events
+  for all
+  using ( auth.role() = 'service_role' );
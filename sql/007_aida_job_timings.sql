@@ -0,0 +1,3 @@
+-- Tempos por etapa/documento de cada job (download, OCR, Gemini, consolidação, XLSX, upload)
+alter table public.aida_jobs
+    add column if not exists aida_timings jsonb;
@@ -0,0 +1,8 @@
+-- Documentos podem terminar em 'timed_out' (prazo por documento, DOC_DEADLINE_SECONDS).
+-- 'queued' já era usado pelo reprocessamento e também entra na constraint.
+alter table public.aida_documents
+    drop constraint if exists aida_documents_aida_status_check;
+
+alter table public.aida_documents
+    add constraint aida_documents_aida_status_check
+    check (aida_status in ('created','queued','processing','ready','failed','timed_out'));
@@ -0,0 +1,69 @@
+-- ==============================================================================
+-- RPC: aida_claim_jobs (substitui a versão de 003_aida_job_queue.sql)
+-- Um job cujo lease expirou depois de aida_max_attempts era marcado failed só
+-- na fila: aida_jobs/aida_projects ficavam em 'processing' e o projeto recusava
+-- novos jobs (Conflict) para sempre. Agora o job, o projeto e os documentos
+-- pendentes também vão para failed e o evento job_failed é registrado.
+-- ==============================================================================
+create or replace function public.aida_claim_jobs(p_worker_id text, p_limit int, p_lease_seconds int)
+returns setof public.aida_job_queue
+language plpgsql as $$
+declare
+  v_error constant text := 'Lease expirado após atingir o máximo de tentativas.';
+begin
+  with expired as (
+    update public.aida_job_queue
+       set aida_status = 'failed',
+           aida_last_error = v_error
+     where aida_status = 'running'
+       and aida_locked_at < now() - make_interval(secs => p_lease_seconds)
+       and aida_attempts >= aida_max_attempts
+    returning aida_job_id
+  ),
+  failed_jobs as (
+    update public.aida_jobs j
+       set aida_status = 'failed'
+      from expired e
+     where j.aida_id = e.aida_job_id
+    returning j.aida_id, j.aida_project_id
+  ),
+  failed_projects as (
+    update public.aida_projects p
+       set aida_status = 'failed'
+      from failed_jobs f
+     where p.aida_id = f.aida_project_id
+       and p.aida_status = 'processing'
+    returning p.aida_id
+  ),
+  failed_documents as (
+    update public.aida_documents d
+       set aida_status = 'failed',
+           aida_error = v_error
+      from failed_jobs f
+     where d.aida_project_id = f.aida_project_id
+       and d.aida_status in ('created', 'queued', 'processing')
+    returning d.aida_id
+  )
+  insert into public.aida_job_events (aida_job_id, aida_project_id, aida_level, aida_event, aida_data)
+  select f.aida_id, f.aida_project_id, 'error', 'job_failed', jsonb_build_object('error', v_error)
+    from failed_jobs f;
+
+  return query
+  update public.aida_job_queue q
+     set aida_status = 'running',
+         aida_locked_by = p_worker_id,
+         aida_locked_at = now(),
+         aida_attempts = q.aida_attempts + 1
+   where q.aida_id in (
+     select c.aida_id
+       from public.aida_job_queue c
+      where (c.aida_status = 'queued' and c.aida_available_at <= now())
+         or (c.aida_status = 'running'
+             and c.aida_locked_at < now() - make_interval(secs => p_lease_seconds)
+             and c.aida_attempts < c.aida_max_attempts)
+      order by c.aida_available_at, c.aida_id
+      limit p_limit
+      for update skip locked
+   )
+  returning q.*;
+end $$;
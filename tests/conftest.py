@@ -34,3 +34,11 @@ def load_json_fixture():
             return json.load(fp)
 
     return _loader
+
+
+@pytest.fixture(autouse=True)
+def fresh_admission_controller(monkeypatch):
+    # Reservas feitas por create_job/reprocess_project sem kickoff não vazam entre testes
+    from app.services import admission
+
+    monkeypatch.setattr(admission, "_controller", None)
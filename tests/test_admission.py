@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from app.core.errors import TooManyRequests
+from app.services.admission import AdmissionController
+
+pytestmark = pytest.mark.unit
+
+
+def test_reserve_rejects_when_running_and_queue_are_full():
+    ctrl = AdmissionController(max_inflight=1, max_queued=1, retry_after_seconds=12)
+
+    ctrl.reserve()
+    ctrl.reserve()
+    with pytest.raises(TooManyRequests) as exc:
+        ctrl.reserve()
+
+    assert exc.value.status_code == 429
+    assert exc.value.headers == {"Retry-After": "12"}
+    assert ctrl.snapshot()["saturated"] is True
+
+
+def test_cancelled_reservation_frees_capacity():
+    ctrl = AdmissionController(max_inflight=1, max_queued=0)
+
+    ctrl.reserve().cancel()
+    ctrl.reserve()
+
+    assert ctrl.snapshot()["queued"] == 1
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_jobs_wait_for_a_slot_in_order(anyio_backend):
+    ctrl = AdmissionController(max_inflight=1, max_queued=3)
+    order = []
+    gate = asyncio.Event()
+
+    async def job(n):
+        async with ctrl.reserve():
+            order.append(n)
+            if n == 0:
+                await gate.wait()
+
+    tasks = [asyncio.ensure_future(job(n)) for n in range(3)]
+    await asyncio.sleep(0.01)
+    assert order == [0]
+    assert ctrl.snapshot() == {
+        "running": 1, "queued": 2, "max_inflight": 1, "max_queued": 3, "saturated": False
+    }
+
+    gate.set()
+    await asyncio.gather(*tasks)
+
+    assert order == [0, 1, 2]
+    assert ctrl.snapshot()["running"] == 0
+    assert ctrl.snapshot()["queued"] == 0
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_cancelled_waiter_does_not_leak_slot(anyio_backend):
+    ctrl = AdmissionController(max_inflight=1, max_queued=2)
+    gate = asyncio.Event()
+
+    async def hold():
+        async with ctrl.reserve():
+            await gate.wait()
+
+    async def waiter():
+        async with ctrl.reserve():
+            pass
+
+    holder = asyncio.ensure_future(hold())
+    await asyncio.sleep(0.01)
+    stuck = asyncio.ensure_future(waiter())
+    await asyncio.sleep(0.01)
+    stuck.cancel()
+    gate.set()
+    await holder
+    with pytest.raises(asyncio.CancelledError):
+        await stuck
+
+    assert ctrl.snapshot()["running"] == 0
+    assert ctrl.snapshot()["queued"] == 0
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_create_job_is_rejected_before_touching_the_database(anyio_backend, monkeypatch):
+    from app.models.schemas import CreateJobRequest
+    from app.services import job_service
+
+    ctrl = AdmissionController(max_inflight=1, max_queued=0)
+    ctrl.reserve()
+    monkeypatch.setattr(job_service, "get_admission_controller", lambda: ctrl)
+
+    class NoDB:
+        def __getattr__(self, name):
+            raise AssertionError(f"DB.{name} chamado com o serviço saturado")
+
+    svc = job_service.JobService(db=NoDB(), storage=object())
+    req = CreateJobRequest(project_name="P", documents=[])
+
+    with pytest.raises(TooManyRequests):
+        await svc.create_job(req)
+
+
+class _AbortDB:
+    def __init__(self):
+        self.job = {"aida_id": "job-1", "aida_project_id": "proj-1", "aida_status": "processing"}
+
+    def get_project(self, project_id):
+        return {"aida_id": project_id, "aida_status": "failed"} if project_id == "proj-1" else None
+
+    def get_job(self, job_id):
+        return self.job
+
+    def update_job(self, job_id, patch):
+        self.job.update(patch)
+
+    def append_job_log(self, job_id, event, project_id=None):
+        pass
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_reservation_is_returned_when_creation_fails_or_kickoff_aborts(anyio_backend, monkeypatch):
+    from app.core.errors import NotFound
+    from app.services import job_service
+    from app.models.schemas import CreateJobResponse
+
+    ctrl = AdmissionController(max_inflight=1, max_queued=0)
+    monkeypatch.setattr(job_service, "get_admission_controller", lambda: ctrl)
+    svc = job_service.JobService(db=_AbortDB(), storage=object())
+
+    with pytest.raises(NotFound):
+        await svc.reprocess_project("missing")
+    assert ctrl.snapshot()["queued"] == 0
+
+    async def created(project_id, incremental):
+        return CreateJobResponse(job_id="job-1", project_id=project_id, status="processing", run_number=1)
+
+    monkeypatch.setattr(svc, "_reprocess_project", created)
+    await svc.reprocess_project("proj-1")
+    assert ctrl.snapshot()["queued"] == 1
+    with pytest.raises(TooManyRequests):
+        await svc.reprocess_project("proj-1")
+
+    await svc.kickoff_job("job-1")
+
+    assert svc.db.job["aida_status"] == "failed"
+    assert ctrl.snapshot()["queued"] == 0
@@ -101,3 +101,42 @@ def test_health_route(client):
     body = response.json()
     assert body.get("ok") is True
     assert body.get("service") == "koa-doc-pipeline"
+    assert {"running", "queued", "max_inflight", "max_queued"} <= set(body["load"])
+
+
+def test_stream_job_events(client, auth_header, monkeypatch):
+    seen = {}
+
+    class StubJobService:
+        async def open_event_stream(self, job_id, last_event_id=None):
+            seen["args"] = (job_id, last_event_id)
+
+            async def stream():
+                yield 'id: 8\nevent: job_ready\ndata: {"event": "job_ready"}\n\n'
+
+            return stream()
+
+    monkeypatch.setattr(jobs_routes, "JobService", lambda: StubJobService())
+
+    response = client.get("/v1/jobs/job-123/events", headers={**auth_header, "Last-Event-ID": "7"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: job_ready" in response.text
+    assert seen["args"] == ("job-123", "7")
+
+
+def test_create_job_rejected_when_saturated(client, auth_header, monkeypatch, load_json_fixture):
+    from app.core.errors import TooManyRequests
+
+    class StubJobService:
+        async def create_job(self, req):
+            raise TooManyRequests("Capacidade esgotada.", retry_after=7)
+
+    monkeypatch.setattr(jobs_routes, "JobService", lambda: StubJobService())
+
+    response = client.post("/v1/jobs", json=load_json_fixture("job_request.json"), headers=auth_header)
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "7"
+    assert response.json()["error"] == "TOO_MANY_REQUESTS"
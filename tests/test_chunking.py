@@ -0,0 +1,55 @@
+import pytest
+
+from app.extractors.chunking import chunk_text, estimate_tokens, merge_structured_responses, split_pages
+
+pytestmark = pytest.mark.unit
+
+
+def test_short_text_is_a_single_chunk():
+    assert chunk_text("abc", max_tokens=10) == ["abc"]
+
+
+def test_chunks_keep_pages_whole():
+    pages = ["a" * 30, "b" * 30, "c" * 30]
+    text = "\n".join(pages)
+    chunks = chunk_text(text, max_tokens=16, page_starts=[0, 31, 62])
+
+    assert chunks == ["a" * 30 + "\n" + "b" * 30, "c" * 30]
+    assert all(estimate_tokens(c) <= 16 for c in chunks)
+
+
+def test_oversized_page_is_split_on_lines():
+    text = "\n".join(["x" * 10] * 6)
+    chunks = chunk_text(text, max_tokens=6)
+
+    assert len(chunks) == 3
+    assert "".join(chunks).replace("\n", "") == "x" * 60
+
+
+def test_split_pages_ignores_out_of_range_offsets():
+    assert split_pages("abc\ndef", [0, 4, 99]) == ["abc\n", "def"]
+
+
+def test_merge_keeps_first_kv_value_and_dedups_rows_at_chunk_boundary():
+    merged = merge_structured_responses(
+        [
+            {"kv": {"Geral": {"CNPJ SPE": "", "Razão Social SPE": "ARIE"}}, "tables": [{"table": "T", "rows": [{"A": 1}]}]},
+            {"kv": {"Geral": {"CNPJ SPE": "1", "Razão Social SPE": "OUTRA"}}, "tables": [{"table": "T", "rows": [{"A": 1}, {"A": 2}]}], "notes": "n"},
+        ]
+    )
+
+    assert merged["kv"] == {"Geral": {"CNPJ SPE": "1", "Razão Social SPE": "ARIE"}}
+    assert merged["tables"] == [{"table": "T", "rows": [{"A": 1}, {"A": 2}]}]
+    assert merged["notes"] == "n"
+
+
+def test_merge_keeps_identical_rows_inside_a_chunk():
+    merged = merge_structured_responses(
+        [
+            {"tables": [{"table": "T", "rows": [{"A": 1}, {"A": 1}, {"A": 2}]}]},
+            {"tables": [{"table": "T", "rows": [{"A": 2}, {"A": 3}, {"A": 3}]}]},
+        ]
+    )
+
+    # Só a linha repetida na emenda entre os trechos sai; as demais repetições ficam
+    assert merged["tables"] == [{"table": "T", "rows": [{"A": 1}, {"A": 1}, {"A": 2}, {"A": 3}, {"A": 3}]}]
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+
+import pytest
+
+from app.core.cpu_pool import CpuPool
+from app.core.errors import ExtractionError
+
+pytestmark = pytest.mark.unit
+
+
+def test_inline_mode_runs_in_caller_process():
+    pool = CpuPool(workers=0)
+
+    assert pool.run(os.getpid) == os.getpid()
+
+
+def test_pool_runs_in_child_processes_and_recycles_workers():
+    pool = CpuPool(workers=1, max_tasks_per_child=1, task_timeout=30)
+    try:
+        pids = {pool.run(os.getpid) for _ in range(3)}
+    finally:
+        pool.shutdown()
+
+    assert os.getpid() not in pids
+    assert len(pids) == 3
+
+
+def test_pool_task_timeout_raises_and_pool_recovers():
+    pool = CpuPool(workers=1, task_timeout=0.5)
+    try:
+        with pytest.raises(ExtractionError) as exc:
+            pool.run(time.sleep, 5)
+        assert exc.value.details["timeout_seconds"] == 0.5
+
+        assert pool.run(pow, 2, 10, timeout=30) == 1024
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_of_one_task_does_not_fail_queued_tasks_of_other_callers():
+    pool = CpuPool(workers=1, task_timeout=30)
+    results = {}
+
+    def other_caller(n):
+        try:
+            results[n] = pool.run(pow, 2, n, timeout=30)
+        except Exception as e:  # noqa: BLE001
+            results[n] = e
+
+    try:
+        pool.run(os.getpid)  # sobe o processo antes de enfileirar
+        stuck = threading.Thread(target=lambda: results.setdefault("stuck", _run_expecting_timeout(pool)))
+        stuck.start()
+        time.sleep(0.2)
+        others = [threading.Thread(target=other_caller, args=(n,)) for n in (3, 4, 5)]
+        for t in others:
+            t.start()
+        stuck.join()
+        for t in others:
+            t.join()
+    finally:
+        pool.shutdown()
+
+    assert isinstance(results["stuck"], ExtractionError)
+    assert [results[n] for n in (3, 4, 5)] == [8, 16, 32]
+
+
+def _run_expecting_timeout(pool):
+    try:
+        pool.run(time.sleep, 5, timeout=0.5)
+    except ExtractionError as e:
+        return e
+
+
+def test_worker_crash_fails_only_its_task_and_pool_recovers():
+    pool = CpuPool(workers=2, task_timeout=30)
+    try:
+        with pytest.raises(ExtractionError):
+            pool.run(os._exit, 1)
+
+        assert [pool.run(pow, 2, n) for n in (3, 4, 5)] == [8, 16, 32]
+    finally:
+        pool.shutdown()
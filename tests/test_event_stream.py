@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.errors import NotFound
+from app.services.job_events import JobEventLog
+from app.supabase.events import event_to_row
+from app.services.job_service import JobService
+
+pytestmark = pytest.mark.unit
+
+
+class EventsDB:
+    """aida_jobs + aida_job_events em memória, com aida_id sequencial como o bigserial."""
+
+    def __init__(self, status="processing"):
+        self.job = {"aida_id": "job-1", "aida_project_id": "proj-1", "aida_status": status}
+        self.rows: list[dict] = []
+        self._lock = threading.Lock()
+
+    def get_job(self, job_id):
+        return self.job if job_id == self.job["aida_id"] else None
+
+    def append_job_events(self, job_id, events, project_id=None):
+        with self._lock:
+            inserted = []
+            for e in events:
+                row = {**event_to_row(job_id, e, project_id), "aida_id": len(self.rows) + 1}
+                self.rows.append(row)
+                inserted.append(row)
+            return inserted
+
+    def list_job_event_rows(self, job_id, after_id=0):
+        with self._lock:
+            return [r for r in self.rows if r["aida_job_id"] == job_id and r["aida_id"] > after_id]
+
+
+def _parse(messages):
+    out = []
+    for msg in messages:
+        if msg.startswith(":"):
+            continue
+        fields = dict(line.split(": ", 1) for line in msg.strip().split("\n"))
+        out.append((int(fields["id"]), fields["event"]))
+    return out
+
+
+async def _collect(stream, limit=50):
+    messages = []
+    async for msg in stream:
+        messages.append(msg)
+        if len(messages) >= limit:
+            break
+    return messages
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_stream_resumes_after_last_event_id(anyio_backend):
+    db = EventsDB(status="ready")
+    db.append_job_events("job-1", [
+        {"level": "info", "event": "job_created"},
+        {"level": "info", "event": "doc_processing", "doc_id": "d1"},
+        {"level": "warn", "event": "doc_warnings", "doc_id": "d1"},
+        {"level": "info", "event": "job_ready"},
+    ])
+    svc = JobService(db=db, storage=object())
+
+    stream = await svc.open_event_stream("job-1", last_event_id="2")
+    messages = await _collect(stream)
+
+    assert _parse(messages) == [(3, "doc_warnings"), (4, "job_ready")]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_stream_receives_live_events_until_job_finishes(anyio_backend, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "JOB_EVENTS_STREAM_POLL_SECONDS", 30.0)
+    db = EventsDB()
+    svc = JobService(db=db, storage=object())
+    # Lote grande e sem expirar: só o assinante do stream força o flush imediato
+    log = JobEventLog(db, "job-1", "proj-1", flush_size=100, flush_seconds=600)
+
+    stream = await svc.open_event_stream("job-1")
+
+    def pipeline():
+        log.emit({"level": "info", "event": "doc_processing", "doc_id": "d1"})
+        log.emit({"level": "info", "event": "job_ready"})
+
+    task = asyncio.ensure_future(_collect(stream))
+    await asyncio.sleep(0.05)
+    await asyncio.to_thread(pipeline)
+    messages = await asyncio.wait_for(task, timeout=5)
+
+    assert _parse(messages) == [(1, "doc_processing"), (2, "job_ready")]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_stream_polls_events_written_by_other_processes(anyio_backend, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "JOB_EVENTS_STREAM_POLL_SECONDS", 0.1)
+    db = EventsDB()
+    svc = JobService(db=db, storage=object())
+
+    stream = await svc.open_event_stream("job-1")
+    task = asyncio.ensure_future(_collect(stream))
+    await asyncio.sleep(0.05)
+    # Gravado direto no banco (ex.: app.worker), sem passar pelo broker deste processo
+    db.append_job_events("job-1", [{"level": "error", "event": "job_failed"}])
+    messages = await asyncio.wait_for(task, timeout=5)
+
+    assert _parse(messages) == [(1, "job_failed")]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_stream_unknown_job_raises_not_found(anyio_backend):
+    svc = JobService(db=EventsDB(), storage=object())
+
+    with pytest.raises(NotFound):
+        await svc.open_event_stream("missing")
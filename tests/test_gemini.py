@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from pydantic import BaseModel
+
+from app.core.errors import UpstreamError
+from app.core.rate_limit import AsyncRateLimiter
+from app.extractors import gemini
+from google.genai import errors as genai_errors
+
+pytestmark = pytest.mark.unit
+
+
+class Answer(BaseModel):
+    value: int
+
+
+class FakeModels:
+    def __init__(self, delay=0.0, text='{"value": 1}', error=None):
+        self.delay = delay
+        self.text = text
+        self.error = error
+        self.active = 0
+        self.max_active = 0
+        self.calls = []
+
+    async def generate_content(self, model, contents, config):
+        self.calls.append((model, contents, config))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.active -= 1
+        return SimpleNamespace(text=self.text)
+
+
+def make_client(monkeypatch, models, **kwargs):
+    monkeypatch.setattr(gemini.genai, "Client", lambda api_key: SimpleNamespace(aio=SimpleNamespace(models=models)))
+    return gemini.GeminiClient(**kwargs)
+
+
+def test_generate_structured_uses_async_sdk_and_validates(monkeypatch):
+    models = FakeModels()
+    client = make_client(monkeypatch, models, max_concurrency=2, requests_per_minute=0)
+
+    assert client.generate_structured("prompt", Answer, timeout=5) == {"value": 1}
+    assert models.calls[0][1] == "prompt"
+    assert models.calls[0][2].http_options.timeout == 5000
+
+
+def test_concurrent_callers_share_the_limiter(monkeypatch):
+    models = FakeModels(delay=0.05)
+    client = make_client(monkeypatch, models, max_concurrency=2, requests_per_minute=0, adaptive=False)
+
+    threads = [threading.Thread(target=client.generate_structured, args=("p", Answer)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(models.calls) == 6
+    assert models.max_active == 2
+
+
+def test_timeout_becomes_upstream_error(monkeypatch):
+    client = make_client(monkeypatch, FakeModels(delay=1.0), max_concurrency=1, requests_per_minute=0)
+
+    with pytest.raises(UpstreamError, match="Timeout"):
+        client.generate_structured("p", Answer, timeout=0.05)
+
+
+@pytest.mark.parametrize("timeout, halved", [(None, True), (0.02, False)])
+def test_only_full_timeout_counts_as_overload(monkeypatch, settings, timeout, halved):
+    monkeypatch.setattr(settings, "GEMINI_TIMEOUT_SECONDS", 0.05)
+    client = make_client(monkeypatch, FakeModels(delay=1.0), max_concurrency=8, requests_per_minute=0, adaptive=True)
+
+    with pytest.raises(UpstreamError, match="Timeout"):
+        # Timeout menor que o configurado = prazo do documento acabando, não cota saturada
+        client.generate_structured("p", Answer, timeout=timeout)
+
+    assert client.limiter.snapshot()["window"] == (2 if halved else 4)
+
+
+def test_invalid_payload_is_upstream_error(monkeypatch):
+    client = make_client(monkeypatch, FakeModels(text='{"value": "x"}'), max_concurrency=1, requests_per_minute=0)
+
+    with pytest.raises(UpstreamError, match="schema"):
+        client.generate_structured("p", Answer)
+
+
+def test_async_interface_from_another_loop(monkeypatch):
+    client = make_client(monkeypatch, FakeModels(), max_concurrency=1, requests_per_minute=0)
+
+    assert asyncio.run(client.agenerate_structured("p", Answer)) == {"value": 1}
+
+
+def test_token_bucket_spaces_calls_after_burst():
+    limiter = AsyncRateLimiter(max_concurrency=2, requests_per_minute=1200)  # 20/s, rajada de 2
+
+    async def run():
+        started = time.monotonic()
+        for _ in range(4):
+            async with limiter.slot():
+                pass
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_aimd_window_grows_when_healthy_and_halves_on_overload():
+    limiter = AsyncRateLimiter(max_concurrency=8, adaptive=True, latency_target=5.0)
+    assert limiter.snapshot()["window"] == 4
+
+    async def call(overloaded=False):
+        async with limiter.slot() as slot:
+            await asyncio.sleep(0)
+            slot.overloaded = overloaded
+
+    async def run():
+        for _ in range(12):
+            await call()
+        grown = limiter.window
+        # Erros de uma mesma rodada contam como um corte só
+        await asyncio.gather(call(True), call(True))
+        return grown
+
+    grown = asyncio.run(run())
+    assert 6 <= grown <= 8
+    assert limiter.window == grown / 2
+    assert limiter.snapshot()["overloads"] == 2
+
+
+def test_slow_calls_do_not_grow_the_window():
+    limiter = AsyncRateLimiter(max_concurrency=8, adaptive=True, latency_target=0.01)
+
+    async def run():
+        for _ in range(5):
+            async with limiter.slot():
+                await asyncio.sleep(0.02)
+
+    asyncio.run(run())
+    assert limiter.window == 4
+
+
+def test_rate_limited_response_halves_gemini_window(monkeypatch):
+    error = genai_errors.ClientError(429, {"error": {"message": "quota", "status": "RESOURCE_EXHAUSTED"}})
+    client = make_client(monkeypatch, FakeModels(error=error), max_concurrency=8, requests_per_minute=0, adaptive=True)
+
+    with pytest.raises(UpstreamError):
+        client.generate_structured("p", Answer)
+
+    assert client.limiter.snapshot()["window"] == 2
+
+
+def test_identical_prompt_is_served_from_llm_cache(monkeypatch, tmp_path):
+    from app.extractors.llm_cache import LlmResponseCache
+
+    models = FakeModels()
+    cache = LlmResponseCache(tmp_path / "llm.sqlite3", max_bytes=1024 * 1024, ttl_seconds=60)
+    client = make_client(monkeypatch, models, max_concurrency=1, requests_per_minute=0, cache=cache)
+
+    assert client.generate_structured("p", Answer) == {"value": 1}
+    assert client.generate_structured("p", Answer) == {"value": 1}
+    client.generate_structured("outro prompt", Answer)
+
+    assert len(models.calls) == 2
+    assert cache.stats()["entries"] == 2
+
+
+def test_model_routing_by_prompt_size(monkeypatch, settings):
+    monkeypatch.setattr(settings, "GEMINI_MODEL", "grande")
+    monkeypatch.setattr(settings, "GEMINI_SMALL_MODEL", "pequeno")
+    monkeypatch.setattr(settings, "GEMINI_SMALL_MODEL_MAX_TOKENS", 1000)
+
+    assert gemini.select_gemini_model(1000) == "pequeno"
+    assert gemini.select_gemini_model(1001) == "grande"
+    monkeypatch.setattr(settings, "GEMINI_SMALL_MODEL", "")
+    assert gemini.select_gemini_model(10) == "grande"
+
+
+def test_usage_is_recorded_from_response_metadata(monkeypatch):
+    class MeteredModels(FakeModels):
+        async def generate_content(self, model, contents, config):
+            resp = await super().generate_content(model, contents, config)
+            resp.usage_metadata = SimpleNamespace(prompt_token_count=120, candidates_token_count=7)
+            return resp
+
+    models = MeteredModels()
+    client = make_client(monkeypatch, models, max_concurrency=1, requests_per_minute=0)
+    usage = gemini.LlmUsage()
+
+    client.generate_structured("x" * 400, Answer, model="pequeno", usage=usage)
+
+    assert models.calls[0][0] == "pequeno"
+    assert usage.as_dict() == {
+        "estimated_prompt_tokens": 100,
+        "prompt_tokens": 120,
+        "output_tokens": 7,
+        "calls": 1,
+        "cached_calls": 0,
+    }
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from app.services.job_events import JobEventLog
+from app.supabase.events import event_to_row, row_to_event
+
+pytestmark = pytest.mark.unit
+
+
+class RecordingDB:
+    def __init__(self):
+        self.batches: list[list[dict]] = []
+
+    def append_job_events(self, job_id, events, project_id=None):
+        self.batches.append(list(events))
+
+
+def test_events_are_flushed_in_batches():
+    db = RecordingDB()
+    log = JobEventLog(db, "job-1", "proj-1", flush_size=3, flush_seconds=60)
+
+    for i in range(7):
+        log.emit({"level": "info", "event": f"e{i}"})
+    assert [len(b) for b in db.batches] == [3, 3]
+
+    log.flush()
+    assert [len(b) for b in db.batches] == [3, 3, 1]
+    assert [e["event"] for b in db.batches for e in b] == [f"e{i}" for i in range(7)]
+
+
+def test_error_events_flush_immediately():
+    db = RecordingDB()
+    log = JobEventLog(db, "job-1", flush_size=50, flush_seconds=60)
+
+    log.emit({"level": "info", "event": "doc_processing"})
+    log.emit({"level": "error", "event": "job_failed"})
+
+    assert [[e["event"] for e in b] for b in db.batches] == [["doc_processing", "job_failed"]]
+
+
+def test_concurrent_emitters_do_not_lose_events():
+    db = RecordingDB()
+    log = JobEventLog(db, "job-1", flush_size=5, flush_seconds=60)
+
+    def worker(n):
+        for i in range(50):
+            log.emit({"level": "info", "event": f"{n}-{i}"})
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    log.flush()
+
+    assert sum(len(b) for b in db.batches) == 200
+
+
+def test_event_row_roundtrip():
+    event = {"ts": "2024-01-01T00:00:00+00:00", "level": "warn", "event": "doc_warnings", "doc_id": "d1"}
+
+    row = event_to_row("job-1", event, "proj-1")
+
+    assert row["aida_event"] == "doc_warnings"
+    assert row["aida_data"] == {"doc_id": "d1"}
+    assert row["aida_project_id"] == "proj-1"
+    assert row_to_event(row) == event
+
+
+def test_pending_events_are_flushed_by_timer_without_new_events():
+    db = RecordingDB()
+    log = JobEventLog(db, "job-1", flush_size=50, flush_seconds=0.05)
+
+    log.emit({"level": "info", "event": "job_processing_started"})
+    log.emit({"level": "info", "event": "doc_processing"})
+    assert db.batches == []
+
+    deadline = time.monotonic() + 2
+    while not db.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert [[e["event"] for e in b] for b in db.batches] == [["job_processing_started", "doc_processing"]]
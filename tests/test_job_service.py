@@ -1,3 +1,6 @@
+import hashlib
+import threading
+import time
 from types import SimpleNamespace
 from pathlib import Path
 
@@ -5,7 +8,9 @@ import pytest
 
 from app.services.job_service import JobService
 from app.models.enums import DocType
+from app.extractors.base import ExtractResult
 from app.services import job_service
+from app.services.extraction_cache import extraction_cache_key
 
 pytestmark = pytest.mark.unit
 
@@ -15,6 +20,7 @@ class FakeDB:
         self.project = project
         self.job = job
         self.documents = {d["aida_id"]: d for d in documents}
+        self.cache = {}
 
     def get_job(self, job_id):
         return self.job if self.job.get("aida_id") == job_id else None
@@ -28,9 +34,11 @@ class FakeDB:
     def update_job(self, job_id, patch):
         self.job.update(patch)
 
-    def append_job_log(self, job_id, event):
-        logs = self.job.setdefault("aida_logs", [])
-        logs.append(event)
+    def append_job_log(self, job_id, event, project_id=None):
+        self.append_job_events(job_id, [event], project_id)
+
+    def append_job_events(self, job_id, events, project_id=None):
+        self.job.setdefault("aida_logs", []).extend(events)
 
     def list_documents_by_project(self, project_id):
         return [d for d in self.documents.values() if d["aida_project_id"] == project_id]
@@ -38,6 +46,12 @@ class FakeDB:
     def update_document(self, doc_id, patch):
         self.documents[doc_id].update(patch)
 
+    def get_extraction_cache(self, key):
+        return self.cache.get(key)
+
+    def put_extraction_cache(self, key, doc_type, payload, warnings):
+        self.cache[key] = {"aida_key": key, "aida_payload": payload, "aida_warnings": warnings}
+
 
 class FakeStorage:
     def __init__(self, download_data=b"data", fail_download=False, fail_upload=False):
@@ -70,10 +84,7 @@ def base_entities():
 
 
 def make_service(project, job, documents, storage):
-    svc = JobService()
-    svc.db = FakeDB(project, job, documents)
-    svc.storage = storage
-    return svc
+    return JobService(db=FakeDB(project, job, documents), storage=storage)
 
 
 def patch_tabular(monkeypatch, payload=None, warnings=None):
@@ -81,6 +92,9 @@ def patch_tabular(monkeypatch, payload=None, warnings=None):
         def __init__(self, payload, warnings):
             self.payload = payload
             self.warnings = warnings or []
+            self.stages = []
+            self.degraded = False
+            self.llm_mapping = None
 
     monkeypatch.setattr(job_service, "extract_tabular", lambda doc_type, content, ext: Result(payload or {"table": "rows"}, warnings))
 
@@ -108,9 +122,10 @@ def patch_pdf(monkeypatch):
         def __init__(self):
             self.payload = {"kv": {}}
             self.warnings = []
+            self.stages = []
 
-    monkeypatch.setattr(job_service, "extract_pdf_text", lambda content: Result())
-    monkeypatch.setattr(job_service, "GeminiClient", lambda: SimpleNamespace(generate_structured=lambda prompt, model: {}))
+    monkeypatch.setattr(job_service, "extract_pdf_text", lambda content, ocr_profile=None, deadline=None: Result())
+    monkeypatch.setattr(job_service, "get_gemini_client", lambda: SimpleNamespace(generate_structured=lambda prompt, schema, **kwargs: {}))
     monkeypatch.setattr(job_service, "get_prompt_for_doc_type", lambda doc_type, text: "prompt")
 
 
@@ -235,3 +250,541 @@ def test_process_job_happy_path(monkeypatch, base_entities):
     assert svc.db.project["aida_status"] == "ready"
     assert svc.db.project["aida_output_xlsx_path"].startswith(project["aida_id"])
     assert storage.uploaded
+
+
+
+def _csv_doc(project, doc_id, created_at):
+    return {
+        "aida_id": doc_id,
+        "aida_project_id": project["aida_id"],
+        "aida_doc_type": DocType.OUTRO.value,
+        "aida_storage_path": f"uploads/{doc_id}.csv",
+        "aida_original_filename": f"{doc_id}.csv",
+        "aida_status": "queued",
+        "aida_created_at": created_at,
+    }
+
+
+class PathStorage(FakeStorage):
+    def download(self, bucket, path):
+        return path.encode()
+
+
+def test_process_job_extracts_documents_concurrently_in_stable_order(monkeypatch, base_entities, settings):
+    project, job, documents = base_entities
+    # Ordem de listagem diferente da ordem de criação
+    documents.append(_csv_doc(project, "doc-b", "2024-01-01T00:00:02Z"))
+    documents.append(_csv_doc(project, "doc-a", "2024-01-01T00:00:01Z"))
+    svc = make_service(project, job, documents, PathStorage())
+
+    monkeypatch.setattr(settings, "MAX_DOCS_IN_FLIGHT", 2)
+    # Só passa da barreira se os dois documentos estiverem em voo ao mesmo tempo
+    barrier = threading.Barrier(2, timeout=5)
+
+    def slow_tabular(doc_type, content, ext):
+        barrier.wait()
+        if b"doc-a" in content:
+            time.sleep(0.05)  # o primeiro documento termina por último
+        return ExtractResult(payload={"table": "rows", "rows": [content.decode()]}, warnings=[])
+
+    consolidated_with = {}
+
+    def fake_consolidate(docs):
+        consolidated_with["docs"] = docs
+        return SimpleNamespace(to_public_dict=lambda: {})
+
+    monkeypatch.setattr(job_service, "extract_tabular", slow_tabular)
+    monkeypatch.setattr(job_service, "consolidate", fake_consolidate)
+    patch_write_xlsx(monkeypatch)
+
+    svc._process_job_sync(job["aida_id"])
+
+    assert svc.db.job["aida_status"] == "ready"
+    assert [d["rows"] for d in consolidated_with["docs"]] == [["uploads/doc-a.csv"], ["uploads/doc-b.csv"]]
+
+
+def test_process_job_concurrent_failure_fails_job(monkeypatch, base_entities):
+    project, job, documents = base_entities
+    documents.append(_csv_doc(project, "doc-a", "2024-01-01T00:00:01Z"))
+    documents.append(_csv_doc(project, "doc-b", "2024-01-01T00:00:02Z"))
+    storage = PathStorage()
+    svc = make_service(project, job, documents, storage)
+
+    def flaky_tabular(doc_type, content, ext):
+        if b"doc-b" in content:
+            raise RuntimeError("boom")
+        return ExtractResult(payload={"table": "rows"}, warnings=[])
+
+    monkeypatch.setattr(job_service, "extract_tabular", flaky_tabular)
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+
+    svc._process_job_sync(job["aida_id"])
+
+    assert svc.db.job["aida_status"] == "failed"
+    assert svc.db.job["aida_logs"][-1]["event"] == "job_failed"
+    assert svc.db.job["aida_logs"][-1]["error"] == "boom"
+    assert not storage.uploaded
+
+
+def test_process_job_reuses_cached_extraction_for_identical_bytes(monkeypatch, base_entities):
+    project, job, documents = base_entities
+    documents.append(_csv_doc(project, "doc-a", "2024-01-01T00:00:01Z"))
+    svc = make_service(project, job, documents, FakeStorage(download_data=b"same-bytes"))
+
+    calls = []
+
+    def counting_tabular(doc_type, content, ext):
+        calls.append(content)
+        return ExtractResult(payload={"table": "Recebíveis", "rows": [{"C": "101"}]}, warnings=["w"])
+
+    monkeypatch.setattr(job_service, "extract_tabular", counting_tabular)
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+
+    svc._process_job_sync(job["aida_id"])
+    svc.db.documents["doc-a"]["aida_extracted_payload"] = None
+    svc._process_job_sync(job["aida_id"])
+
+    assert len(calls) == 1
+    doc = svc.db.documents["doc-a"]
+    assert doc["aida_extracted_payload"] == {"table": "Recebíveis", "rows": [{"C": "101"}]}
+    assert doc["aida_content_sha256"] == hashlib.sha256(b"same-bytes").hexdigest()
+    events = [e["event"] for e in svc.db.job["aida_logs"]]
+    assert events.count("doc_cache_hit") == 1
+    assert events.count("doc_warnings") == 2
+
+
+def test_extraction_cache_key_changes_with_doc_type_and_model(monkeypatch, settings):
+    key = extraction_cache_key(b"abc", DocType.RECEBIVEIS, ".pdf")
+
+    assert key == extraction_cache_key(b"abc", DocType.RECEBIVEIS, ".pdf")
+    assert key != extraction_cache_key(b"abd", DocType.RECEBIVEIS, ".pdf")
+    assert key != extraction_cache_key(b"abc", DocType.ENDIVIDAMENTO, ".pdf")
+    monkeypatch.setattr(settings, "GEMINI_MODEL", "outro-modelo")
+    assert key != extraction_cache_key(b"abc", DocType.RECEBIVEIS, ".pdf")
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [
+        ("PDF_TABLES_ENABLED", False),
+        ("PDF_MAX_PAGES", 3),
+        ("PDF_MAX_TEXT_CHARS", 1000),
+        ("OCR_MIN_PAGE_CHARS", 5),
+        ("OCR_ENGINE", "pytesseract"),
+    ],
+)
+def test_extraction_cache_key_changes_with_pdf_settings(monkeypatch, settings, name, value):
+    # tesserocr pode não estar instalado; "auto" cai no pytesseract e não diferenciaria
+    monkeypatch.setattr("app.extractors.ocr_engine.tesserocr", object())
+    monkeypatch.setattr(settings, "OCR_ENGINE", "tesserocr")
+    key = extraction_cache_key(b"abc", DocType.RECEBIVEIS, ".pdf")
+    monkeypatch.setattr(settings, name, value)
+
+    assert key != extraction_cache_key(b"abc", DocType.RECEBIVEIS, ".pdf")
+
+
+def test_degraded_extraction_is_not_cached(monkeypatch, base_entities):
+    project, job, documents = base_entities
+    documents.append(
+        {
+            "aida_id": "doc-1",
+            "aida_project_id": project["aida_id"],
+            "aida_doc_type": DocType.OUTRO.value,
+            "aida_storage_path": "uploads/a.pdf",
+            "aida_original_filename": "a.pdf",
+            "aida_status": "queued",
+        }
+    )
+    svc = make_service(project, job, documents, FakeStorage())
+    svc.cache.enabled = True
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+    monkeypatch.setattr(
+        job_service,
+        "extract_pdf_text",
+        lambda content, ocr_profile=None, deadline=None: ExtractResult(
+            payload={"text": "abc"}, warnings=["Falha ao tentar OCR de fallback: sem memória"], degraded=True
+        ),
+    )
+    monkeypatch.setattr(
+        job_service, "get_gemini_client", lambda: SimpleNamespace(generate_structured=lambda *a, **k: {"kv": {}})
+    )
+    monkeypatch.setattr(job_service, "get_prompt_for_doc_type", lambda doc_type, text: text)
+    puts = []
+    monkeypatch.setattr(svc.cache, "put", lambda *args: puts.append(args))
+
+    svc._process_job_sync(job["aida_id"])
+
+    assert svc.db.documents["doc-1"]["aida_status"] == "ready"
+    assert puts == []
+
+
+def test_unmatched_spreadsheet_columns_are_mapped_by_llm_in_the_parent(monkeypatch, base_entities):
+    from app.extractors import mapping
+
+    project, job, documents = base_entities
+    doc = _csv_doc(project, "doc-a", "2024-01-01T00:00:01Z")
+    doc["aida_doc_type"] = DocType.RECEBIVEIS.value
+    documents.append(doc)
+    svc = make_service(project, job, documents, FakeStorage(download_data=b"Apto,Comprador\n101,Maria\n102,Joao"))
+    svc.cache.enabled = False
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+    calls = []
+
+    def fake_cpu(fn, *args, timeout=None):
+        # Etapa de CPU não pode chamar o Gemini (no pool seria um cliente por processo filho)
+        monkeypatch.setattr(mapping, "get_gemini_client", lambda: pytest.fail("Gemini chamado no pool de CPU"))
+        try:
+            return fn(*args)
+        finally:
+            monkeypatch.setattr(mapping, "get_gemini_client", lambda: SimpleNamespace(generate_structured=generate))
+
+    def generate(prompt, schema, timeout=None):
+        calls.append(timeout)
+        return {"mapping": [{"source": "Apto", "target_col": "C"}, {"source": "Comprador", "target_col": "F"}]}
+
+    monkeypatch.setattr(job_service, "run_cpu_bound", fake_cpu)
+
+    svc._process_job_sync(job["aida_id"])
+
+    payload = svc.db.documents["doc-a"]["aida_extracted_payload"]
+    assert len(calls) == 1
+    assert payload["rows"] == [{"C": "101", "F": "Maria"}, {"C": "102", "F": "Joao"}]
+
+
+def test_webhooks_use_in_memory_document_state(monkeypatch, base_entities):
+    project, job, documents = base_entities
+    project["aida_webhook_url"] = "https://example.com/hook"
+    documents.append(_csv_doc(project, "doc-a", "2024-01-01T00:00:01Z"))
+    svc = make_service(project, job, documents, FakeStorage())
+
+    sent = []
+    monkeypatch.setattr(job_service, "dispatch_webhook", lambda url, payload, loop=None: sent.append(payload))
+    list_calls = []
+    original_list = svc.db.list_documents_by_project
+    svc.db.list_documents_by_project = lambda pid: list_calls.append(pid) or original_list(pid)
+    patch_tabular(monkeypatch)
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+
+    svc._process_job_sync(job["aida_id"])
+
+    assert [p["event"] for p in sent] == ["job_processing_started", "doc_processing", "job_ready"]
+    assert sent[1]["documents"][0]["status"] == "processing"
+    assert sent[-1]["documents"][0]["status"] == "ready"
+    assert len(list_calls) == 1
+
+
+def test_process_job_records_stage_timings(monkeypatch, base_entities):
+    project, job, documents = base_entities
+    documents.append(_csv_doc(project, "doc-a", "2024-01-01T00:00:01Z"))
+    svc = make_service(project, job, documents, FakeStorage(download_data=b"12345"))
+
+    def timed_tabular(doc_type, content, ext):
+        return ExtractResult(
+            payload={"table": "Recebíveis", "rows": [{"C": "1"}, {"C": "2"}]},
+            warnings=[],
+            stages=[{"stage": "mapping", "seconds": 0.01, "rows": 2}],
+        )
+
+    monkeypatch.setattr(job_service, "extract_tabular", timed_tabular)
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+
+    svc._process_job_sync(job["aida_id"])
+
+    timings = svc.db.job["aida_timings"]
+    by_stage = {r["stage"]: r for r in timings["stages"]}
+    assert by_stage["download"] == {"stage": "download", "doc_id": "doc-a", "seconds": by_stage["download"]["seconds"], "bytes": 5}
+    assert by_stage["tabular_extract"]["rows"] == 2
+    assert by_stage["mapping"]["doc_id"] == "doc-a"
+    assert by_stage["upload"]["bytes"] == len(b"xlsx")
+    assert {"consolidate", "write_xlsx", "job_total"} <= set(timings["summary"])
+
+
+def test_pdf_with_native_table_skips_gemini(monkeypatch, base_entities):
+    project, job, documents = base_entities
+    documents.append(
+        {
+            "aida_id": "doc-1",
+            "aida_project_id": project["aida_id"],
+            "aida_doc_type": DocType.RECEBIVEIS.value,
+            "aida_storage_path": "uploads/recebiveis.pdf",
+            "aida_original_filename": "recebiveis.pdf",
+            "aida_status": "queued",
+        }
+    )
+    svc = make_service(project, job, documents, FakeStorage())
+
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+    table = ExtractResult(payload={"table": "Recebíveis", "rows": [{"C": "101"}]}, warnings=["Tabela extraída direto do PDF (sem LLM)."])
+    monkeypatch.setattr(job_service, "extract_pdf_tables", lambda doc_type, content: table)
+    monkeypatch.setattr(job_service, "extract_pdf_text", lambda content, ocr_profile=None, deadline=None: pytest.fail("texto não deveria ser extraído"))
+    monkeypatch.setattr(job_service, "get_gemini_client", lambda: pytest.fail("Gemini não deveria ser chamado"))
+
+    svc._process_job_sync(job["aida_id"])
+
+    assert svc.db.job["aida_status"] == "ready"
+    assert svc.db.documents["doc-1"]["aida_extracted_payload"]["rows"] == [{"C": "101"}]
+
+
+def test_document_over_deadline_times_out_with_partial_text(monkeypatch, base_entities, settings):
+    project, job, documents = base_entities
+    for n, name in enumerate(["lento.pdf", "ok.xlsx"], start=1):
+        documents.append(
+            {
+                "aida_id": f"doc-{n}",
+                "aida_project_id": project["aida_id"],
+                "aida_doc_type": DocType.OUTRO.value,
+                "aida_storage_path": f"uploads/{name}",
+                "aida_original_filename": name,
+                "aida_status": "queued",
+                "aida_created_at": f"2024-01-0{n}T00:00:00+00:00",
+            }
+        )
+    svc = make_service(project, job, documents, FakeStorage())
+    monkeypatch.setattr(settings, "DOC_DEADLINE_SECONDS", 0.2)
+    patch_tabular(monkeypatch, payload={"table": "Tipologia", "rows": [{"B": "1"}]})
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+
+    def slow_pdf(content, ocr_profile=None, deadline=None):
+        time.sleep(0.3)
+        return ExtractResult(payload={"text": "página 1 de 40"}, warnings=[])
+
+    monkeypatch.setattr(job_service, "extract_pdf_text", slow_pdf)
+    monkeypatch.setattr(job_service, "get_gemini_client", lambda: pytest.fail("Gemini não deveria ser chamado"))
+
+    svc._process_job_sync(job["aida_id"])
+
+    doc = svc.db.documents["doc-1"]
+    assert svc.db.job["aida_status"] == "ready"
+    assert doc["aida_status"] == "timed_out"
+    assert doc["aida_extracted_payload"] == {"partial": True, "stage": "pdf_extract", "text": "página 1 de 40"}
+    assert svc.db.documents["doc-2"]["aida_status"] == "ready"
+    events = {e["event"]: e for e in svc.db.job["aida_logs"]}
+    assert events["doc_timed_out"]["stage"] == "pdf_extract"
+    assert events["job_ready"]["timed_out_documents"] == ["doc-1"]
+
+
+def test_deadline_during_chunked_gemini_keeps_finished_chunks(monkeypatch, base_entities, settings):
+    from app.core.errors import UpstreamError
+
+    project, job, documents = base_entities
+    documents.append(
+        {
+            "aida_id": "doc-1",
+            "aida_project_id": project["aida_id"],
+            "aida_doc_type": DocType.RECEBIVEIS.value,
+            "aida_storage_path": "uploads/a.pdf",
+            "aida_original_filename": "a.pdf",
+            "aida_status": "queued",
+        }
+    )
+    svc = make_service(project, job, documents, FakeStorage())
+    monkeypatch.setattr(settings, "DOC_DEADLINE_SECONDS", 0.3)
+    monkeypatch.setattr(settings, "LLM_CHUNK_TOKENS", 10)
+    monkeypatch.setattr(settings, "LLM_CHUNK_CONCURRENCY", 3)
+    monkeypatch.setattr(settings, "PDF_TABLES_ENABLED", False)
+    monkeypatch.setattr(settings, "TEXT_COMPACTION_ENABLED", False)
+    consolidated = []
+    monkeypatch.setattr(job_service, "consolidate", lambda docs: consolidated.append(docs) or SimpleNamespace(to_public_dict=lambda: {}))
+    patch_write_xlsx(monkeypatch)
+
+    pages = [f"unidade {n} ".ljust(36, ".") for n in range(1, 4)]
+
+    def generate(prompt, schema, timeout=None, **kwargs):
+        unit = prompt.split("unidade ")[1].split(" ")[0]
+        if unit != "1":
+            # Os outros trechos só terminam depois do prazo
+            time.sleep(0.5)
+            raise UpstreamError("Timeout ao chamar Gemini.")
+        return {"tables": [{"table": "Recebíveis", "rows": [{"C": unit}]}]}
+
+    monkeypatch.setattr(
+        job_service,
+        "extract_pdf_text",
+        lambda content, ocr_profile=None, deadline=None: ExtractResult(
+            payload={"text": "\n".join(pages), "page_starts": [0, 37, 74]}, warnings=[]
+        ),
+    )
+    monkeypatch.setattr(job_service, "get_gemini_client", lambda: SimpleNamespace(generate_structured=generate))
+    monkeypatch.setattr(job_service, "get_prompt_for_doc_type", lambda doc_type, text: text)
+
+    svc._process_job_sync(job["aida_id"])
+
+    doc = svc.db.documents["doc-1"]
+    assert doc["aida_status"] == "timed_out"
+    assert doc["aida_extracted_payload"]["stage"] == "gemini"
+    assert doc["aida_extracted_payload"]["tables"] == [{"table": "Recebíveis", "rows": [{"C": "1"}]}]
+    assert doc["aida_extracted_payload"]["text"].startswith("unidade 1")
+    # As linhas do trecho concluído entram na consolidação
+    assert consolidated == [[{"table": "Recebíveis", "rows": [{"C": "1"}]}]]
+
+
+def test_gemini_call_uses_remaining_deadline_as_timeout(monkeypatch, base_entities, settings):
+    project, job, documents = base_entities
+    documents.append(
+        {
+            "aida_id": "doc-1",
+            "aida_project_id": project["aida_id"],
+            "aida_doc_type": DocType.OUTRO.value,
+            "aida_storage_path": "uploads/a.pdf",
+            "aida_original_filename": "a.pdf",
+            "aida_status": "queued",
+        }
+    )
+    svc = make_service(project, job, documents, FakeStorage())
+    monkeypatch.setattr(settings, "DOC_DEADLINE_SECONDS", 10)
+    monkeypatch.setattr(settings, "GEMINI_TIMEOUT_SECONDS", 45)
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+    seen = {}
+
+    def generate(prompt, schema, timeout=None, **kwargs):
+        seen["timeout"] = timeout
+        return {"kv": {}}
+
+    monkeypatch.setattr(job_service, "extract_pdf_text", lambda content, ocr_profile=None, deadline=None: ExtractResult(payload={"text": "abc"}, warnings=[]))
+    monkeypatch.setattr(job_service, "get_gemini_client", lambda: SimpleNamespace(generate_structured=generate))
+    monkeypatch.setattr(job_service, "get_prompt_for_doc_type", lambda doc_type, text: "prompt")
+
+    svc._process_job_sync(job["aida_id"])
+
+    assert svc.db.documents["doc-1"]["aida_status"] == "ready"
+    assert 9 < seen["timeout"] <= 10
+
+
+def test_long_pdf_text_goes_to_gemini_in_parallel_chunks(monkeypatch, base_entities, settings):
+    project, job, documents = base_entities
+    documents.append(
+        {
+            "aida_id": "doc-1",
+            "aida_project_id": project["aida_id"],
+            "aida_doc_type": DocType.RECEBIVEIS.value,
+            "aida_storage_path": "uploads/a.pdf",
+            "aida_original_filename": "a.pdf",
+            "aida_status": "queued",
+        }
+    )
+    svc = make_service(project, job, documents, FakeStorage())
+    monkeypatch.setattr(settings, "LLM_CHUNK_TOKENS", 10)
+    monkeypatch.setattr(settings, "PDF_TABLES_ENABLED", False)
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+
+    pages = [f"unidade {n} ".ljust(36, ".") for n in range(1, 4)]
+    text = "\n".join(pages)
+    starts = [0, 37, 74]
+    prompts = []
+
+    def generate(prompt, schema, timeout=None, **kwargs):
+        prompts.append(prompt)
+        unit = prompt.split("unidade ")[1].split(" ")[0]
+        # Duas parcelas idênticas no mesmo trecho são lançamentos distintos
+        return {"tables": [{"table": "Recebíveis", "rows": [{"C": unit}, {"C": unit}]}]}
+
+    monkeypatch.setattr(
+        job_service,
+        "extract_pdf_text",
+        lambda content, ocr_profile=None, deadline=None: ExtractResult(payload={"text": text, "page_starts": starts}, warnings=[]),
+    )
+    monkeypatch.setattr(job_service, "get_gemini_client", lambda: SimpleNamespace(generate_structured=generate))
+    monkeypatch.setattr(job_service, "get_prompt_for_doc_type", lambda doc_type, text: text)
+
+    svc._process_job_sync(job["aida_id"])
+
+    payload = svc.db.documents["doc-1"]["aida_extracted_payload"]
+    assert len(prompts) == 3
+    assert all(p.startswith("[Trecho ") for p in prompts)
+    assert [r["C"] for r in payload["tables"][0]["rows"]] == ["1", "1", "2", "2", "3", "3"]
+    assert any(e["event"] == "doc_chunked" and e["chunks"] == 3 for e in job["aida_logs"])
+
+
+def test_chunks_after_compaction_keep_the_report_header(monkeypatch, base_entities, settings):
+    project, job, documents = base_entities
+    documents.append(
+        {
+            "aida_id": "doc-1",
+            "aida_project_id": project["aida_id"],
+            "aida_doc_type": DocType.RECEBIVEIS.value,
+            "aida_storage_path": "uploads/a.pdf",
+            "aida_original_filename": "a.pdf",
+            "aida_status": "queued",
+        }
+    )
+    svc = make_service(project, job, documents, FakeStorage())
+    monkeypatch.setattr(settings, "LLM_CHUNK_TOKENS", 20)
+    monkeypatch.setattr(settings, "PDF_TABLES_ENABLED", False)
+    monkeypatch.setattr(settings, "TEXT_COMPACTION_ENABLED", True)
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+
+    pages = [f"RELATORIO XPTO\nUnidade    Cliente    Valor\n{100 + n}    CLIENTE {n}    {n},00" for n in range(1, 5)]
+    starts, offset = [], 0
+    for page in pages:
+        starts.append(offset)
+        offset += len(page) + 1
+    prompts = []
+
+    def generate(prompt, schema, timeout=None, **kwargs):
+        prompts.append(prompt)
+        return {"tables": []}
+
+    monkeypatch.setattr(
+        job_service,
+        "extract_pdf_text",
+        lambda content, ocr_profile=None, deadline=None: ExtractResult(
+            payload={"text": "\n".join(pages), "page_starts": starts}, warnings=[]
+        ),
+    )
+    monkeypatch.setattr(job_service, "get_gemini_client", lambda: SimpleNamespace(generate_structured=generate))
+    monkeypatch.setattr(job_service, "get_prompt_for_doc_type", lambda doc_type, text: text)
+
+    svc._process_job_sync(job["aida_id"])
+
+    rows_prompts = [p for p in prompts if "CLIENTE" in p]
+    assert len(rows_prompts) > 1
+    # Cada trecho com linhas da tabela leva o título e os títulos de coluna, uma vez
+    assert all(p.count("Unidade | Cliente | Valor") == 1 for p in rows_prompts)
+
+
+def test_small_pdf_routes_to_small_model_and_records_tokens(monkeypatch, base_entities, settings):
+    project, job, documents = base_entities
+    documents.append(
+        {
+            "aida_id": "doc-1",
+            "aida_project_id": project["aida_id"],
+            "aida_doc_type": DocType.CONTRATO_SOCIAL.value,
+            "aida_storage_path": "uploads/a.pdf",
+            "aida_original_filename": "a.pdf",
+            "aida_status": "queued",
+        }
+    )
+    svc = make_service(project, job, documents, FakeStorage())
+    monkeypatch.setattr(settings, "GEMINI_SMALL_MODEL", "modelo-pequeno")
+    monkeypatch.setattr(settings, "GEMINI_SMALL_MODEL_MAX_TOKENS", 100)
+    patch_consolidate(monkeypatch)
+    patch_write_xlsx(monkeypatch)
+    seen = {}
+
+    def generate(prompt, schema, timeout=None, *, model=None, usage=None):
+        seen["model"] = model
+        usage.add(10, prompt=12, output=5)
+        return {"kv": {"Geral": {"CNPJ SPE": "1"}}}
+
+    monkeypatch.setattr(job_service, "extract_pdf_text", lambda content, ocr_profile=None, deadline=None: ExtractResult(payload={"text": "contrato"}, warnings=[]))
+    monkeypatch.setattr(job_service, "get_gemini_client", lambda: SimpleNamespace(generate_structured=generate))
+    monkeypatch.setattr(job_service, "get_prompt_for_doc_type", lambda doc_type, text: text)
+
+    svc._process_job_sync(job["aida_id"])
+
+    assert seen["model"] == "modelo-pequeno"
+    gemini = next(r for r in svc.db.job["aida_timings"]["stages"] if r["stage"] == "gemini")
+    assert (gemini["model"], gemini["prompt_tokens"], gemini["output_tokens"]) == ("modelo-pequeno", 12, 5)
+    usage = next(e for e in job["aida_logs"] if e["event"] == "doc_llm_usage")
+    assert usage["calls"] == 1 and usage["estimated_prompt_tokens"] == 10
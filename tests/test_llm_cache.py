@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from app.extractors.llm_cache import LlmResponseCache, llm_cache_key
+
+pytestmark = pytest.mark.unit
+
+
+def test_key_depends_on_prompt_schema_and_model():
+    base = llm_cache_key("p", {"type": "object"}, "m1")
+
+    assert base == llm_cache_key("p", {"type": "object"}, "m1")
+    assert base != llm_cache_key("p2", {"type": "object"}, "m1")
+    assert base != llm_cache_key("p", {"type": "array"}, "m1")
+    assert base != llm_cache_key("p", {"type": "object"}, "m2")
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = LlmResponseCache(tmp_path / "c.sqlite3", max_bytes=10_000, ttl_seconds=0.05)
+    cache.put("k", {"a": 1})
+
+    assert cache.get("k") == {"a": 1}
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+
+def test_least_recently_used_entries_are_evicted_over_size(tmp_path):
+    cache = LlmResponseCache(tmp_path / "c.sqlite3", max_bytes=45, ttl_seconds=0)
+    cache.put("a", {"v": "x" * 10})
+    cache.put("b", {"v": "y" * 10})
+    time.sleep(0.01)
+    cache.get("a")
+    cache.put("c", {"v": "z" * 10})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": "x" * 10}
+    assert cache.get("c") == {"v": "z" * 10}
+    assert cache.stats()["bytes"] <= 45
+
+
+def test_cache_survives_reopen(tmp_path):
+    LlmResponseCache(tmp_path / "c.sqlite3", max_bytes=10_000, ttl_seconds=0).put("k", {"a": 1})
+
+    assert LlmResponseCache(tmp_path / "c.sqlite3", max_bytes=10_000, ttl_seconds=0).get("k") == {"a": 1}
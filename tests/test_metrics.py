@@ -6,7 +6,9 @@ os.environ.setdefault("SUPABASE_URL", "https://example.supabase.co")
 os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "service-role-key")
 os.environ.setdefault("GEMINI_API_KEY", "gemini-key")
 
+from app.extractors import gemini
 from app.models.schemas import MetricsResponse
+from app.services import metrics as metrics_service
 from app.services.metrics import MetricsService
 
 
@@ -52,25 +54,23 @@ def test_metrics_service_counts_and_logs_sorted():
             {"aida_status": "failed"},
         ],
         aida_jobs=[
-            {
-                "aida_id": "job-1",
-                "aida_project_id": "proj-1",
-                "aida_status": "processing",
-                "aida_updated_at": "2024-01-02T00:00:00Z",
-                "aida_logs": [
-                    {"ts": "2024-01-01T12:00:00Z", "event": "start"},
-                    {"ts": "2024-01-01T12:05:00Z", "event": "download"},
-                ],
-            },
-            {
-                "aida_id": "job-2",
-                "aida_project_id": "proj-2",
-                "aida_status": "ready",
-                "aida_updated_at": "2024-01-03T00:00:00Z",
-                "aida_logs": [
-                    {"ts": "2024-01-03T01:00:00Z", "event": "finished"},
-                ],
-            },
+            {"aida_id": "job-1", "aida_project_id": "proj-1", "aida_status": "processing",
+             "aida_updated_at": "2024-01-02T00:00:00Z", "aida_timings": None},
+            {"aida_id": "job-2", "aida_project_id": "proj-2", "aida_status": "ready",
+             "aida_updated_at": "2024-01-03T00:00:00Z",
+             "aida_timings": {"stages": [
+                 {"stage": "download", "doc_id": "d1", "seconds": 0.5, "bytes": 100},
+                 {"stage": "download", "doc_id": "d2", "seconds": 1.5, "bytes": 300},
+                 {"stage": "gemini", "doc_id": "d1", "seconds": 20.0, "rows": 12},
+             ]}},
+        ],
+        aida_job_events=[
+            {"aida_job_id": "job-1", "aida_project_id": "proj-1", "aida_ts": "2024-01-01T12:00:00Z",
+             "aida_level": "info", "aida_event": "start", "aida_data": {}},
+            {"aida_job_id": "job-1", "aida_project_id": "proj-1", "aida_ts": "2024-01-01T12:05:00Z",
+             "aida_level": "info", "aida_event": "download", "aida_data": {"doc_id": "doc-1"}},
+            {"aida_job_id": "job-2", "aida_project_id": "proj-2", "aida_ts": "2024-01-03T01:00:00Z",
+             "aida_level": "info", "aida_event": "finished", "aida_data": {}},
         ],
         aida_documents=[
             {"id": 1},
@@ -90,6 +90,15 @@ def test_metrics_service_counts_and_logs_sorted():
 
     assert [log["event"] for log in metrics.recent_logs][:2] == ["finished", "download"]
     assert all("job_id" in log and "project_id" in log for log in metrics.recent_logs)
+    assert metrics.recent_logs[1]["doc_id"] == "doc-1"
+    assert metrics.recent_logs[1]["ts"] == "2024-01-01T12:05:00Z"
+
+    download = metrics.stage_timings["download"]
+    assert download.count == 2
+    assert download.avg_seconds == 1.0
+    assert download.max_seconds == 1.5
+    assert download.total_bytes == 400
+    assert metrics.stage_timings["gemini"].total_rows == 12
 
 
 def test_metrics_service_handles_empty_tables():
@@ -101,3 +110,20 @@ def test_metrics_service_handles_empty_tables():
     assert metrics.jobs.total == 0
     assert metrics.documents == 0
     assert metrics.recent_logs == []
+    assert metrics.stage_timings == {}
+
+
+def test_llm_concurrency_is_reported_only_for_a_client_in_use(monkeypatch):
+    client = FakeSupabaseClient(aida_projects=[], aida_jobs=[], aida_documents=[])
+    monkeypatch.setattr(gemini, "_client", None)
+
+    assert MetricsService(client=client).fetch_metrics().llm_concurrency is None
+    # Consultar as métricas não cria o cliente do Gemini
+    assert gemini._client is None
+
+    limiter = gemini.AsyncRateLimiter(4, adaptive=True)
+    monkeypatch.setattr(gemini, "_client", type("Client", (), {"limiter": limiter})())
+    assert MetricsService(client=client).fetch_metrics().llm_concurrency.window == 2
+
+    monkeypatch.setattr(metrics_service.settings, "JOB_QUEUE_ENABLED", True)
+    assert MetricsService(client=client).fetch_metrics().llm_concurrency is None
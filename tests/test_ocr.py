@@ -0,0 +1,171 @@
+import random
+import threading
+import time
+
+import pytest
+
+from app.extractors import ocr_engine, pdf_ocr_stub
+
+pytestmark = pytest.mark.unit
+
+
+class FakePage:
+    width, height = 1240, 1754
+    alive = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self, number):
+        self.number = number
+        with FakePage.lock:
+            FakePage.alive += 1
+            FakePage.peak = max(FakePage.peak, FakePage.alive)
+
+    def close(self):
+        with FakePage.lock:
+            FakePage.alive -= 1
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    FakePage.alive = FakePage.peak = 0
+    calls = []
+
+    def fake_convert(content, fmt=None, first_page=None, last_page=None, **kwargs):
+        calls.append((first_page, last_page))
+        return [FakePage(n) for n in range(first_page, last_page + 1)]
+
+    def fake_ocr(img, lang=None, config=""):
+        # Tempos aleatórios embaralham a ordem de conclusão entre as threads
+        time.sleep(random.uniform(0, 0.01))
+        return f"texto {img.number}"
+
+    monkeypatch.setattr(ocr_engine.settings, "OCR_ENGINE", "pytesseract")
+    monkeypatch.setattr(pdf_ocr_stub, "pdfinfo_from_bytes", lambda content: {"Pages": 23})
+    monkeypatch.setattr(pdf_ocr_stub, "convert_from_bytes", fake_convert)
+    monkeypatch.setattr(ocr_engine.pytesseract, "image_to_string", fake_ocr)
+    return calls
+
+
+def test_ocr_rasterizes_in_batches_and_keeps_page_order(fake_pdf):
+    texts = pdf_ocr_stub.ocr_pages(b"%PDF", workers=4, batch_pages=5)
+
+    assert fake_pdf == [(1, 5), (6, 10), (11, 15), (16, 20), (21, 23)]
+    assert sorted(texts) == list(range(1, 24))
+    assert all(texts[n] == f"texto {n}" for n in texts)
+
+
+def test_ocr_keeps_a_bounded_window_of_page_images(fake_pdf):
+    pdf_ocr_stub.ocr_pages(b"%PDF", workers=2, batch_pages=2)
+
+    assert FakePage.alive == 0
+    assert FakePage.peak <= 4
+
+
+def test_ocr_failure_propagates_and_releases_pages(fake_pdf, monkeypatch):
+    def broken(img, lang=None, config=""):
+        img.close()
+        raise RuntimeError("tesseract morreu")
+
+    monkeypatch.setattr(ocr_engine.pytesseract, "image_to_string", broken)
+
+    with pytest.raises(RuntimeError, match="tesseract morreu"):
+        pdf_ocr_stub.ocr_pages(b"%PDF", workers=2, batch_pages=3)
+
+
+def test_profile_selected_per_doc_type_drives_raster_and_tesseract(fake_pdf, monkeypatch):
+    from app.extractors.ocr_profiles import get_ocr_profile
+    from app.models.enums import DocType
+
+    monkeypatch.setattr(pdf_ocr_stub.settings, "OCR_PROFILE", "default")
+    monkeypatch.setattr(pdf_ocr_stub.settings, "OCR_PROFILE_BY_DOC_TYPE", {"CONTRATO_SOCIAL": "fast"})
+    seen = {}
+
+    def fake_convert(content, first_page=None, last_page=None, **kwargs):
+        seen["convert"] = kwargs
+        return [FakePage(n) for n in range(first_page, last_page + 1)]
+
+    def fake_ocr(img, lang=None, config=""):
+        seen["config"] = config
+        return "x"
+
+    monkeypatch.setattr(pdf_ocr_stub, "convert_from_bytes", fake_convert)
+    monkeypatch.setattr(ocr_engine.pytesseract, "image_to_string", fake_ocr)
+
+    assert get_ocr_profile(DocType.RECEBIVEIS).name == "default"
+    profile = get_ocr_profile(DocType.CONTRATO_SOCIAL)
+    pdf_ocr_stub.ocr_pages(b"%PDF", [1], profile=profile)
+
+    assert seen["convert"]["dpi"] == 150
+    assert seen["convert"]["grayscale"] is True
+    # A largura máxima não vai para o pdftoppm (escalaria toda página para 1700 px)
+    assert "size" not in seen["convert"]
+    assert seen["config"] == "--psm 6 --oem 1"
+
+
+@pytest.mark.parametrize("width, expected", [(1240, (1240, 1754)), (3400, (1700, 877))])
+def test_max_width_only_shrinks_wider_pages(monkeypatch, width, expected):
+    from PIL import Image
+
+    from app.extractors.ocr_profiles import OCR_PROFILES
+
+    sizes = []
+    monkeypatch.setattr(pdf_ocr_stub, "ocr_image", lambda img, profile: sizes.append(img.size) or "x")
+
+    pdf_ocr_stub._ocr_page(Image.new("L", (width, 1754)), OCR_PROFILES["fast"])
+
+    assert sizes == [expected]
+
+
+class FakeTessApi:
+    created = []
+
+    def __init__(self, lang="eng", psm=None, oem=None):
+        FakeTessApi.created.append((threading.get_ident(), lang, psm))
+        self.img = None
+
+    def SetImage(self, img):
+        self.img = img
+
+    def GetUTF8Text(self):
+        return f"texto {self.img.number}"
+
+
+def test_tesserocr_engine_is_loaded_once_per_ocr_thread(fake_pdf, monkeypatch):
+    FakeTessApi.created = []
+    monkeypatch.setattr(ocr_engine, "tesserocr", type("FakeTesserocr", (), {"PyTessBaseAPI": FakeTessApi}))
+    monkeypatch.setattr(ocr_engine.settings, "OCR_ENGINE", "auto")
+    monkeypatch.setattr(
+        ocr_engine.pytesseract, "image_to_string", lambda *a, **k: pytest.fail("não deveria abrir subprocesso")
+    )
+
+    text = pdf_ocr_stub.ocr_pages(b"%PDF", list(range(1, 13)), workers=3, batch_pages=4)
+
+    assert text[12] == "texto 12"
+    # Um engine por thread de OCR, não um por página
+    assert 1 <= len(FakeTessApi.created) <= 3
+    assert len({tid for tid, _, _ in FakeTessApi.created}) == len(FakeTessApi.created)
+
+
+def test_engine_falls_back_to_pytesseract_when_tesserocr_missing(monkeypatch):
+    monkeypatch.setattr(ocr_engine, "tesserocr", None)
+    monkeypatch.setattr(ocr_engine.settings, "OCR_ENGINE", "tesserocr")
+
+    assert ocr_engine.ocr_engine_name() == "pytesseract"
+
+
+def test_ocr_stops_at_deadline_and_returns_finished_pages(fake_pdf, monkeypatch):
+    from app.core.deadline import Deadline
+
+    deadline = Deadline.after(0.15)
+
+    def slow_ocr(img, lang=None, config=""):
+        time.sleep(0.05)
+        return f"texto {img.number}"
+
+    monkeypatch.setattr(ocr_engine.pytesseract, "image_to_string", slow_ocr)
+
+    texts = pdf_ocr_stub.ocr_pages(b"%PDF", list(range(1, 24)), workers=1, batch_pages=2, deadline=deadline)
+
+    assert 0 < len(texts) < 23
+    assert sorted(texts) == list(range(1, len(texts) + 1))
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.extractors.ocr_preprocess import estimate_skew, otsu_threshold, preprocess_page
+from app.extractors.ocr_profiles import OcrProfile
+
+pytestmark = pytest.mark.unit
+
+
+def _page(width=1200, height=1600, border=0):
+    """Página sintética: linhas de "texto" escuras sobre fundo claro, com ruído e borda preta opcional."""
+    rng = np.random.default_rng(0)
+    arr = np.full((height, width), 230, dtype=np.uint8)
+    for y in range(200, height - 200, 60):
+        arr[y : y + 18, 150 : width - 150] = 30
+    arr = np.clip(arr.astype(int) + rng.integers(-20, 20, arr.shape), 0, 255).astype(np.uint8)
+    if border:
+        arr[:border, :] = 0
+        arr[:, :border] = 0
+    return Image.fromarray(arr).convert("RGB")
+
+
+def test_otsu_separates_text_from_background():
+    gray = np.asarray(_page().convert("L"))
+
+    assert 50 < otsu_threshold(gray) < 210
+
+
+def test_skew_is_estimated_and_corrected():
+    binary = _page().convert("L").point(lambda v: 0 if v < 128 else 255)
+    tilted = binary.rotate(3, resample=Image.NEAREST, expand=True, fillcolor=255)
+
+    assert estimate_skew(binary) == 0.0
+    assert estimate_skew(tilted) == pytest.approx(-3.0, abs=0.5)
+
+
+def test_preprocess_binarizes_crops_and_downscales():
+    profile = OcrProfile(name="t", dpi=300, preprocess=True, deskew=True, target_dpi=150)
+    img = _page(border=40)
+
+    out = preprocess_page(img, profile)
+
+    assert out.mode == "L"
+    assert set(np.unique(np.asarray(out))) <= {0, 255}
+    # Metade do tamanho pelo DPI alvo, e menor ainda sem a borda preta e as margens vazias
+    assert out.width < img.width / 2 and out.height < img.height / 2
+    assert np.asarray(out)[:, :5].mean() > 200
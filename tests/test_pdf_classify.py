@@ -0,0 +1,64 @@
+import pytest
+
+from app.extractors.pdf_classify import _sample_indexes, classify_pdf
+
+pytestmark = pytest.mark.unit
+
+TEXT = "Balanço patrimonial consolidado do exercício encerrado em 31/12/2023"
+FULL_PAGE_IMAGE = {"x0": 0, "top": 0, "x1": 600, "bottom": 800}
+
+
+class FakePage:
+    width, height = 600, 800
+
+    def __init__(self, n, text="", images=()):
+        self.page_number = n
+        self.chars = [{"text": c, "fontname": "Arial"} for c in text]
+        self.images = list(images)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakePdf:
+    def __init__(self, pages):
+        self.pages = pages
+
+
+def _pdf(kinds):
+    pages = []
+    for n, kind in enumerate(kinds, start=1):
+        if kind == "text":
+            pages.append(FakePage(n, TEXT))
+        elif kind == "scan":
+            pages.append(FakePage(n, images=[FULL_PAGE_IMAGE]))
+        else:
+            # Logo pequeno sem texto: não é página escaneada
+            pages.append(FakePage(n, images=[{"x0": 10, "top": 10, "x1": 60, "bottom": 40}]))
+    return FakePdf(pages)
+
+
+def test_sample_indexes_spread_over_document():
+    assert _sample_indexes(3, 5) == [0, 1, 2]
+    assert _sample_indexes(100, 5) == [0, 25, 50, 74, 99]
+    assert _sample_indexes(100, 1) == [0]
+
+
+@pytest.mark.parametrize(
+    "kinds, expected",
+    [
+        (["text"] * 30, "native"),
+        (["scan"] * 30, "scanned"),
+        (["text"] * 20 + ["scan"] * 10, "hybrid"),
+        (["logo"] * 5, "hybrid"),
+    ],
+)
+def test_classify_pdf(kinds, expected):
+    pdf = _pdf(kinds)
+
+    result = classify_pdf(pdf, sample_pages=5)
+
+    assert result.kind == expected
+    assert result.total_pages == len(kinds)
+    assert sum(p.closed for p in pdf.pages) == min(5, len(kinds))
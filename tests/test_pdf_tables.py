@@ -0,0 +1,106 @@
+import pytest
+
+from app.extractors import pdf_tables
+from app.models.enums import DocType
+
+pytestmark = pytest.mark.unit
+
+HEADER = ["Nº Unidade", "Torre", "Nome cliente", "Valor de venda"]
+
+
+class FakePage:
+    def __init__(self, tables):
+        self.tables = tables
+        self.closed = False
+
+    def extract_tables(self):
+        return self.tables
+
+    def close(self):
+        self.closed = True
+
+
+class FakePdf:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    def install(pages):
+        monkeypatch.setattr(pdf_tables.pdfplumber, "open", lambda fp: FakePdf(pages))
+        return pages
+
+    return install
+
+
+def test_erp_table_is_mapped_without_llm(fake_pdf, monkeypatch):
+    monkeypatch.setattr(
+        "app.extractors.mapping.get_gemini_client", lambda: pytest.fail("LLM não deveria ser chamado")
+    )
+    pages = fake_pdf([
+        FakePage([
+            [["Empresa", "Incorporadora X"], ["CNPJ", "00.000.000/0001-00"]],
+            [HEADER, ["101", "A", "Maria", "R$ 350.000,00"], ["102", "A", "João", "R$ 360.000,00"]],
+        ]),
+        # Continuação na página seguinte, com o cabeçalho repetido
+        FakePage([[HEADER, ["201", "B", "Ana", "R$ 410.000,00"], [None, None, None, None]]]),
+    ])
+
+    result = pdf_tables.extract_pdf_tables(DocType.RECEBIVEIS, b"%PDF")
+
+    assert result is not None
+    assert result.payload["table"] == "Recebíveis"
+    assert [r["C"] for r in result.payload["rows"]] == ["101", "102", "201"]
+    assert result.payload["rows"][0]["K"] == 350000.0
+    assert "sem LLM" in result.warnings[0]
+    assert all(p.closed for p in pages)
+
+
+def test_unmatched_tables_fall_back(fake_pdf):
+    fake_pdf([FakePage([[["Cláusula", "Texto"], ["1", "Do objeto"]]])])
+
+    assert pdf_tables.extract_pdf_tables(DocType.ENDIVIDAMENTO, b"%PDF") is None
+
+
+def test_other_doc_types_skip_table_path(fake_pdf):
+    fake_pdf([FakePage([[HEADER, ["101", "A", "Maria", "R$ 1,00"]]])])
+
+    assert pdf_tables.extract_pdf_tables(DocType.CONTRATO_SOCIAL, b"%PDF") is None
+
+
+def test_same_width_tables_merge_only_on_repeated_header_or_data_row(fake_pdf):
+    summary = ["Torre", "Unidades", "Vendidas", "Estoque"]
+    fake_pdf([
+        FakePage([[HEADER, ["101", "A", "Maria", "R$ 350.000,00"]]]),
+        # Continuação sem cabeçalho: a primeira linha já é dado
+        FakePage([[["102", "A", "João", "R$ 360.000,00"], ["103", "A", "Rita", "R$ 370.000,00"]]]),
+        # Outra tabela de mesma largura, com cabeçalho próprio: não entra na anterior
+        FakePage([[summary, ["A", "10", "3", "7"], ["B", "12", "5", "7"]]]),
+    ])
+
+    frames = pdf_tables._candidates(pdf_tables._read_tables(b"%PDF"))
+
+    assert [list(df.columns) for df in frames] == [HEADER, summary]
+    assert list(frames[0][HEADER[0]]) == ["101", "102", "103"]
+
+
+def test_single_row_last_page_and_every_matching_table_are_kept(fake_pdf):
+    fake_pdf([
+        FakePage([[HEADER, ["101", "A", "Maria", "R$ 350.000,00"], ["102", "A", "João", "R$ 360.000,00"]]]),
+        # Última página com uma linha só
+        FakePage([[["103", "A", "Rita", "R$ 370.000,00"]]]),
+        # Segunda tabela do relatório, com cabeçalho próprio que também bate com o template
+        FakePage([[[*HEADER, "Situação"], ["201", "B", "Ana", "R$ 410.000,00", "Vendida"]]]),
+    ])
+
+    result = pdf_tables.extract_pdf_tables(DocType.RECEBIVEIS, b"%PDF")
+
+    assert result is not None
+    assert [r["C"] for r in result.payload["rows"]] == ["101", "102", "103", "201"]
@@ -0,0 +1,192 @@
+import pytest
+
+from app.extractors import pdf_text
+
+pytestmark = pytest.mark.unit
+
+LONG = "Contrato de cessão de recebíveis entre as partes abaixo qualificadas, cláusula 1."
+
+
+SCAN = {"x0": 0, "top": 0, "x1": 600, "bottom": 800}
+
+
+class FakePage:
+    width, height = 600, 800
+
+    def __init__(self, text, images=()):
+        self._text = text
+        self.images = list(images)
+        self.chars = [{"text": c, "fontname": "Helvetica"} for c in text]
+        self.page_number = None
+        self.closed = False
+        self.extracted = False
+
+    def extract_text(self):
+        self.extracted = True
+        return self._text
+
+    def close(self):
+        self.closed = True
+
+
+class FakePdf:
+    def __init__(self, pages):
+        self.pages = pages
+        for n, page in enumerate(pages, start=1):
+            page.page_number = n
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    def install(pages, ocr=None):
+        calls = []
+
+        def fake_ocr_pages(content, pages=None, max_pages=None, profile=None, deadline=None):
+            calls.append(pages)
+            return {n: (ocr or {}).get(n, f"ocr da página {n}") for n in pages or []}
+
+        monkeypatch.setattr(pdf_text.pdfplumber, "open", lambda fp: FakePdf(pages))
+        monkeypatch.setattr(pdf_text, "ocr_pages", fake_ocr_pages)
+        return calls
+
+    return install
+
+
+def test_digital_pdf_skips_ocr(fake_pdf):
+    calls = fake_pdf([FakePage(LONG), FakePage(LONG + " 2")])
+
+    result = pdf_text.extract_pdf_text(b"%PDF")
+
+    assert calls == []
+    assert result.payload["text"] == f"{LONG}\n{LONG} 2"
+    assert result.payload["page_starts"] == [0, len(LONG) + 1]
+    assert result.warnings == []
+    assert not result.degraded
+
+
+def test_only_scanned_and_garbled_pages_are_ocred(fake_pdf):
+    calls = fake_pdf([
+        FakePage(LONG),
+        FakePage("", images=[SCAN]),
+        FakePage("(cid:12)(cid:44)(cid:87)" * 10 + " abc"),
+        FakePage(""),  # página em branco, sem imagem
+        FakePage(LONG + " anexo"),
+    ])
+
+    result = pdf_text.extract_pdf_text(b"%PDF")
+
+    assert calls == [[2, 3]]
+    assert result.payload["text"] == "\n".join([
+        LONG,
+        "--- PÁGINA 2 (OCR) ---\nocr da página 2",
+        "--- PÁGINA 3 (OCR) ---\nocr da página 3",
+        LONG + " anexo",
+    ])
+    assert "2 página(s)" in result.warnings[0]
+
+
+def test_unreadable_pdf_falls_back_to_full_ocr(fake_pdf, monkeypatch):
+    calls = fake_pdf([])
+
+    def broken(fp):
+        raise ValueError("xref quebrado")
+
+    monkeypatch.setattr(pdf_text.pdfplumber, "open", broken)
+    monkeypatch.setattr(pdf_text, "ocr_pages", lambda content, pages=None, max_pages=None, profile=None, deadline=None: calls.append(pages) or {1: "scan"})
+
+    result = pdf_text.extract_pdf_text(b"%PDF")
+
+    assert calls == [None]
+    assert result.payload["text"] == "--- PÁGINA 1 (OCR) ---\nscan"
+
+
+def test_pages_are_released_and_capped(fake_pdf, monkeypatch):
+    monkeypatch.setattr(pdf_text.settings, "PDF_MAX_PAGES", 3)
+    pages = [FakePage(f"{LONG} {n}") for n in range(10)]
+    fake_pdf(pages)
+
+    result = pdf_text.extract_pdf_text(b"%PDF")
+
+    assert all(p.extracted and p.closed for p in pages[:3])
+    assert not any(p.extracted for p in pages[4:])
+    assert result.payload["text"].count(LONG) == 3
+    assert "3 de 10 páginas" in result.warnings[0]
+    assert result.degraded
+
+
+def test_text_is_capped_by_characters(fake_pdf, monkeypatch):
+    monkeypatch.setattr(pdf_text.settings, "PDF_MAX_TEXT_CHARS", 100)
+    fake_pdf([FakePage(LONG) for _ in range(5)])
+
+    result = pdf_text.extract_pdf_text(b"%PDF")
+
+    assert len(result.payload["text"]) <= 100
+    assert result.warnings and "truncado" in result.warnings[0]
+
+
+def test_scanned_pdf_goes_straight_to_ocr(fake_pdf):
+    pages = [FakePage("", images=[SCAN]) for _ in range(40)]
+    calls = fake_pdf(pages)
+
+    result = pdf_text.extract_pdf_text(b"%PDF")
+
+    # Só as páginas amostradas pelo classificador foram abertas; nenhuma extração de texto
+    assert sum(p.closed for p in pages) == 5
+    assert not any(p.extracted for p in pages)
+    assert calls == [list(range(1, 41))]
+    assert result.payload["text"].startswith("--- PÁGINA 1 (OCR) ---")
+
+
+def test_expired_deadline_returns_partial_text(fake_pdf):
+    from app.core.deadline import Deadline
+
+    calls = fake_pdf([FakePage(LONG), FakePage("", images=[SCAN])])
+
+    result = pdf_text.extract_pdf_text(b"%PDF", deadline=Deadline(expires_at=0.0, budget_seconds=1))
+
+    assert result.payload["timed_out_stage"] == "pdf_native_text"
+    assert calls == []
+
+
+class ImageProbedPage(FakePage):
+    @property
+    def images(self):
+        raise AssertionError("PDF nativo não deveria ler as imagens da página")
+
+    @images.setter
+    def images(self, value):
+        pass
+
+
+def test_native_pdf_trusts_text_layer_without_probing_pages(fake_pdf, monkeypatch):
+    monkeypatch.setattr(pdf_text.settings, "PDF_CLASSIFY_SAMPLE_PAGES", 1)
+    # A amostra (página 1) tem texto; as demais não são inspecionadas além do texto
+    calls = fake_pdf([FakePage(LONG), ImageProbedPage("(cid:12)" * 20 + " abc"), ImageProbedPage("")])
+
+    result = pdf_text.extract_pdf_text(b"%PDF")
+
+    # Só a página sem texto nenhum vai para o OCR
+    assert calls == [[3]]
+    assert result.payload["text"].startswith(LONG + "\n(cid:12)")
+
+
+def test_classifier_failure_falls_back_to_per_page_decision(fake_pdf, monkeypatch):
+    calls = fake_pdf([FakePage(LONG), FakePage("", images=[SCAN])])
+
+    def broken(pdf):
+        raise ZeroDivisionError
+
+    monkeypatch.setattr(pdf_text, "classify_pdf", broken)
+
+    result = pdf_text.extract_pdf_text(b"%PDF")
+
+    assert calls == [[2]]
+    assert result.payload["text"].startswith(LONG)
+    assert "classificar" in result.warnings[0]
+    assert result.degraded
@@ -1,9 +1,13 @@
+from pathlib import Path
+from types import SimpleNamespace
 from uuid import uuid4
 
 import pytest
 
 from app.models.enums import DocType
 from app.models.schemas import CreateJobRequest, DocumentIn
+from app.extractors.base import ExtractResult
+from app.services import job_service
 from app.services.job_service import JobService
 
 
@@ -24,7 +28,7 @@ class FakeDB:
         self.documents: dict[str, dict] = {}
         self.jobs: dict[str, dict] = {}
 
-    def create_project(self, name: str, project_id: str | None = None) -> dict:
+    def create_project(self, name: str, project_id: str | None = None, webhook_url: str | None = None) -> dict:
         pid = project_id or str(uuid4())
         project = {
             "aida_id": pid,
@@ -42,7 +46,7 @@ class FakeDB:
     def update_project(self, project_id: str, patch: dict) -> None:
         self.projects[project_id].update(patch)
 
-    def create_job(self, project_id: str, run_number: int | None = None) -> dict:
+    def create_job(self, project_id: str, run_number: int | None = None, incremental: bool = False) -> dict:
         jid = str(uuid4())
         job = {
             "aida_id": jid,
@@ -50,6 +54,7 @@ class FakeDB:
             "aida_status": "created",
             "aida_logs": [],
             "aida_run_number": run_number or 1,
+            "aida_incremental": incremental,
         }
         self.jobs[jid] = job
         return job
@@ -60,8 +65,11 @@ class FakeDB:
     def update_job(self, job_id: str, patch: dict) -> None:
         self.jobs[job_id].update(patch)
 
-    def append_job_log(self, job_id: str, event: dict) -> None:
-        self.jobs[job_id].setdefault("aida_logs", []).append(event)
+    def append_job_log(self, job_id: str, event: dict, project_id: str | None = None) -> None:
+        self.append_job_events(job_id, [event], project_id)
+
+    def append_job_events(self, job_id: str, events: list[dict], project_id: str | None = None) -> None:
+        self.jobs[job_id].setdefault("aida_logs", []).extend(events)
 
     def create_document(self, project_id: str, doc_type: str, storage_path: str, original_filename: str) -> dict:
         did = str(uuid4())
@@ -181,6 +189,132 @@ async def test_multiple_reprocesses_keep_run_history_and_logs():
     assert db.get_job(third.job_id)["aida_logs"][0]["event"] == "job_reprocess_requested"
 
 
+@pytest.mark.anyio
+async def test_incremental_reprocess_keeps_extracted_payloads():
+    svc, db = _fake_service()
+    req = CreateJobRequest(
+        project_name="Projeto Incremental",
+        documents=[DocumentIn(doc_type=DocType.RECEBIVEIS, storage_path="uploads/a.csv", original_filename="a.csv")],
+    )
+    first = await svc.create_job(req)
+    for doc in db.list_documents_by_project(first.project_id):
+        db.update_document(doc["aida_id"], {"aida_status": "ready", "aida_extracted_payload": {"table": "Recebíveis"}})
+
+    job = await svc.reprocess_project(first.project_id, incremental=True)
+
+    assert db.get_job(job.job_id)["aida_incremental"] is True
+    for doc in db.list_documents_by_project(first.project_id):
+        assert doc["aida_status"] == "queued"
+        assert doc["aida_extracted_payload"] == {"table": "Recebíveis"}
+
+
+class VersionedStorage(FakeStorage):
+    def __init__(self, files: dict[str, bytes]):
+        self.files = files
+        self.downloads: list[str] = []
+
+    def stat(self, bucket: str, path: str) -> dict:
+        content = self.files[path]
+        return {"etag": str(hash(content)), "size": len(content), "updated_at": None}
+
+    def download(self, bucket: str, path: str) -> bytes:
+        self.downloads.append(path)
+        return self.files[path]
+
+    def upload(self, bucket: str, path: str, content: bytes, content_type: str) -> None:
+        return None
+
+
+@pytest.mark.anyio
+async def test_incremental_run_only_extracts_changed_documents(monkeypatch):
+    db = FakeDB()
+    storage = VersionedStorage({"uploads/a.csv": b"a,1", "uploads/b.csv": b"b,1"})
+    svc = JobService(db=db, storage=storage)
+    svc.cache.enabled = False
+
+    extracted: list[bytes] = []
+
+    def fake_tabular(doc_type, content, ext):
+        extracted.append(content)
+        return ExtractResult(payload={"table": "Recebíveis", "rows": [{"C": content.decode()}]}, warnings=[])
+
+    consolidated: list[list[dict]] = []
+
+    def fake_consolidate(docs):
+        consolidated.append(docs)
+        return SimpleNamespace(to_public_dict=lambda: {})
+
+    monkeypatch.setattr(job_service, "extract_tabular", fake_tabular)
+    monkeypatch.setattr(job_service, "consolidate", fake_consolidate)
+    monkeypatch.setattr(job_service, "write_filled_xlsx", lambda c, project_name, out_path: Path(out_path).write_bytes(b"x"))
+
+    req = CreateJobRequest(
+        project_name="Projeto Incremental",
+        documents=[
+            DocumentIn(doc_type=DocType.RECEBIVEIS, storage_path="uploads/a.csv", original_filename="a.csv"),
+            DocumentIn(doc_type=DocType.RECEBIVEIS, storage_path="uploads/b.csv", original_filename="b.csv"),
+        ],
+    )
+    first = await svc.create_job(req)
+    svc._process_job_sync(first.job_id)
+    assert len(extracted) == 2
+
+    storage.files["uploads/b.csv"] = b"b,2"
+    storage.downloads.clear()
+    second = await svc.reprocess_project(first.project_id, incremental=True)
+    svc._process_job_sync(second.job_id)
+
+    assert extracted[2:] == [b"b,2"]
+    assert storage.downloads == ["uploads/b.csv"]
+    assert db.get_job(second.job_id)["aida_status"] == "ready"
+    assert sorted(r["rows"][0]["C"] for r in consolidated[-1]) == ["a,1", "b,2"]
+    reused = [e for e in db.get_job(second.job_id)["aida_logs"] if e["event"] == "doc_reused"]
+    assert len(reused) == 1
+
+
+class MetadataLessStorage(VersionedStorage):
+    def stat(self, bucket: str, path: str) -> dict:
+        # info() sem as chaves esperadas
+        return {"etag": None, "size": None, "updated_at": None}
+
+
+@pytest.mark.anyio
+async def test_empty_fingerprint_does_not_reuse_changed_documents(monkeypatch):
+    db = FakeDB()
+    storage = MetadataLessStorage({"uploads/a.csv": b"a,1", "uploads/b.csv": b"b,1"})
+    svc = JobService(db=db, storage=storage)
+    svc.cache.enabled = False
+
+    extracted: list[bytes] = []
+
+    def fake_tabular(doc_type, content, ext):
+        extracted.append(content)
+        return ExtractResult(payload={"table": "Recebíveis", "rows": [{"C": content.decode()}]}, warnings=[])
+
+    monkeypatch.setattr(job_service, "extract_tabular", fake_tabular)
+    monkeypatch.setattr(job_service, "consolidate", lambda docs: SimpleNamespace(to_public_dict=lambda: {}))
+    monkeypatch.setattr(job_service, "write_filled_xlsx", lambda c, project_name, out_path: Path(out_path).write_bytes(b"x"))
+
+    req = CreateJobRequest(
+        project_name="Projeto Sem Metadados",
+        documents=[
+            DocumentIn(doc_type=DocType.RECEBIVEIS, storage_path="uploads/a.csv", original_filename="a.csv"),
+            DocumentIn(doc_type=DocType.RECEBIVEIS, storage_path="uploads/b.csv", original_filename="b.csv"),
+        ],
+    )
+    first = await svc.create_job(req)
+    svc._process_job_sync(first.job_id)
+
+    storage.files["uploads/b.csv"] = b"b,2"
+    storage.downloads.clear()
+    second = await svc.reprocess_project(first.project_id, incremental=True)
+    svc._process_job_sync(second.job_id)
+
+    # Sem metadados úteis os dois são baixados; só o alterado é extraído de novo
+    assert sorted(storage.downloads) == ["uploads/a.csv", "uploads/b.csv"]
+    assert extracted[2:] == [b"b,2"]
+
+
 def test_output_path_is_run_scoped():
     assert JobService._build_output_storage_path("proj", 4, "file.xlsx") == "proj/run-4/file.xlsx"
     assert JobService._build_output_storage_path("proj", None, "file.xlsx") == "proj/run-1/file.xlsx"
@@ -0,0 +1,84 @@
+import pytest
+
+from app.extractors.chunking import split_pages
+from app.extractors.text_compaction import compact_text
+
+pytestmark = pytest.mark.unit
+
+
+def _pages(*pages):
+    text = "\n".join(pages)
+    starts, offset = [], 0
+    for p in pages:
+        starts.append(offset)
+        offset += len(p) + 1
+    return text, starts
+
+
+def _erp_page(n, rows):
+    return "\n".join(
+        [
+            "CONSTRUTORA XPTO LTDA - Relatório de Contas a Receber",
+            "Emitido em 01/03/2024 10:31",
+            "Unidade    Cliente          Valor",
+            *rows,
+            "",
+            "",
+            f"Página {n} de 3",
+        ]
+    )
+
+
+def test_repeated_headers_and_page_numbers_are_removed():
+    text, starts = _pages(
+        _erp_page(1, ["101        MARIA SILVA      1.200,00"]),
+        _erp_page(2, ["102        JOAO SOUZA       3.400,00"]),
+        _erp_page(3, ["103        ANA LIMA         5.600,00"]),
+    )
+
+    result = compact_text(text, starts)
+
+    assert result.text.count("CONSTRUTORA XPTO LTDA") == 1
+    assert result.text.count("Unidade | Cliente | Valor") == 1
+    assert "Página" not in result.text
+    assert "101 | MARIA SILVA | 1.200,00" in result.text
+    assert "103 | ANA LIMA | 5.600,00" in result.text
+    assert len(result.text) < result.original_chars
+    assert result.removed_lines == 9
+
+
+def test_page_offsets_match_the_compacted_pages():
+    text, starts = _pages(*[_erp_page(n, [f"{100 + n}        CLIENTE {n}      1,00"]) for n in (1, 2, 3)])
+
+    result = compact_text(text, starts)
+    pages = split_pages(result.text, result.page_starts)
+
+    assert len(pages) == 3
+    assert pages[2].startswith("103 | CLIENTE 3 | 1,00")
+
+
+def test_few_pages_keep_repeated_lines_and_collapse_spaces():
+    result = compact_text("Nome:     João da Silva\n\n\n\nCNPJ:  123\nCNPJ:  123")
+
+    assert result.text == "Nome: João da Silva\n\nCNPJ: 123\nCNPJ: 123"
+    assert result.page_starts is None
+
+
+def test_lone_numbers_are_only_page_numbers_when_they_match_the_page():
+    text, starts = _pages("Parcelas\n1\n2\n1", "7\nfim\n2")
+
+    result = compact_text(text, starts)
+
+    assert result.text == "Parcelas\n1\n2\n7\nfim"
+
+
+def test_repeated_lines_removed_from_later_pages_are_reported_in_order():
+    text, starts = _pages(*[_erp_page(n, [f"{100 + n}        CLIENTE {n}      1,00"]) for n in (1, 2, 3)])
+
+    result = compact_text(text, starts)
+
+    assert result.repeated_lines == [
+        "CONSTRUTORA XPTO LTDA - Relatório de Contas a Receber",
+        "Emitido em 01/03/2024 10:31",
+        "Unidade | Cliente | Valor",
+    ]
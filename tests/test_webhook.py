@@ -1,10 +1,11 @@
 import asyncio
 import json
+import threading
 
 import httpx
 import pytest
 
-from app.services.webhook import deliver_webhook, send_webhook_background
+from app.services.webhook import WebhookDispatcher, deliver_webhook, send_webhook_background
 
 
 @pytest.mark.anyio
@@ -84,3 +85,60 @@ def test_send_webhook_background_uses_loop():
     finally:
         loop.run_until_complete(client.aclose())
         loop.close()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_dispatcher_reuses_client_and_keeps_order_per_url(anyio_backend):
+    received: list[tuple[str, int]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append((request.url.host, json.loads(request.content)["n"]))
+        return httpx.Response(200)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    dispatcher = WebhookDispatcher(workers=3, queue_size=30, max_attempts=1, client=client)
+    await dispatcher.start()
+
+    for n in range(5):
+        dispatcher.submit("https://a.example.com/hook", {"n": n})
+        dispatcher.submit("https://b.example.com/hook", {"n": n})
+    await dispatcher.stop()
+
+    assert [n for host, n in received if host == "a.example.com"] == list(range(5))
+    assert [n for host, n in received if host == "b.example.com"] == list(range(5))
+    assert dispatcher.delivered == 10
+    assert not client.is_closed  # cliente externo não é fechado pelo dispatcher
+    await client.aclose()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_dispatcher_accepts_events_from_threads_and_drops_when_full(anyio_backend):
+    release = asyncio.Event()
+    received: list[int] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await release.wait()
+        received.append(json.loads(request.content)["n"])
+        return httpx.Response(200)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    dispatcher = WebhookDispatcher(workers=1, queue_size=2, max_attempts=1, client=client)
+    await dispatcher.start()
+
+    def producer():
+        for n in range(5):
+            dispatcher.submit("https://example.com/hook", {"n": n})
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    thread.join()
+    await asyncio.sleep(0.05)
+    release.set()
+    await dispatcher.stop()
+    await client.aclose()
+
+    # Os callbacks da thread rodam antes do worker consumir: cabem 2, o restante é descartado
+    assert received == [0, 1]
+    assert dispatcher.dropped == 3
@@ -0,0 +1,376 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.services.job_service import JobService
+from app.worker import JobWorker
+
+pytestmark = pytest.mark.unit
+
+
+class FakeQueueDB:
+    """Simula aida_job_queue + RPC aida_claim_jobs (lock exclusivo por claim)."""
+
+    def __init__(self, job_ids):
+        self.queue = {jid: {"aida_job_id": jid, "aida_status": "queued", "aida_attempts": 0} for jid in job_ids}
+        self._lock = threading.Lock()
+        self.claims: list[tuple[str, str]] = []
+        # Status final em aida_jobs (o pipeline grava failed sem propagar a exceção)
+        self.job_status = {jid: "ready" for jid in job_ids}
+
+    def get_job(self, job_id):
+        return {"aida_id": job_id, "aida_status": self.job_status[job_id]}
+
+    def claim_queued_jobs(self, worker_id, limit, lease_seconds):
+        with self._lock:
+            out = []
+            for entry in self.queue.values():
+                if len(out) >= limit:
+                    break
+                if entry["aida_status"] == "queued":
+                    entry.update(aida_status="running", aida_locked_by=worker_id)
+                    entry["aida_attempts"] += 1
+                    self.claims.append((worker_id, entry["aida_job_id"]))
+                    out.append(dict(entry))
+            return out
+
+    def heartbeat_queued_jobs(self, worker_id, job_ids):
+        pass
+
+    def finish_queued_job(self, job_id, status, error=None):
+        self.queue[job_id].update(aida_status=status, aida_last_error=error, aida_locked_by=None)
+
+
+class FakeService:
+    def __init__(self, fail=(), db=None, job_failed=()):
+        self.fail = set(fail)
+        self.db = db
+        self.job_failed = set(job_failed)
+        self.processed: list[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _process_job_sync(self, job_id):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            threading.Event().wait(0.02)
+            if job_id in self.fail:
+                raise RuntimeError("crash")
+            if job_id in self.job_failed:
+                self.db.job_status[job_id] = "failed"
+            self.processed.append(job_id)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+async def _drain(worker, db):
+    stop = asyncio.Event()
+
+    async def stopper():
+        while any(e["aida_status"] in ("queued", "running") for e in db.queue.values()):
+            await asyncio.sleep(0.01)
+        stop.set()
+
+    await asyncio.wait_for(asyncio.gather(worker.run(stop), stopper()), timeout=5)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_worker_processes_queue_with_bounded_concurrency(anyio_backend):
+    db = FakeQueueDB([f"job-{i}" for i in range(6)])
+    svc = FakeService(fail={"job-3"})
+    worker = JobWorker(db=db, service=svc, concurrency=2, poll_interval=0.01, worker_id="w1")
+
+    await _drain(worker, db)
+
+    assert sorted(svc.processed) == sorted(f"job-{i}" for i in range(6) if i != 3)
+    assert svc.max_in_flight <= 2
+    assert db.queue["job-3"]["aida_status"] == "failed"
+    assert db.queue["job-3"]["aida_last_error"] == "crash"
+    assert all(db.queue[f"job-{i}"]["aida_status"] == "done" for i in range(6) if i != 3)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_queue_entry_follows_the_final_job_status(anyio_backend):
+    db = FakeQueueDB(["job-ok", "job-bad"])
+    svc = FakeService(db=db, job_failed={"job-bad"})
+    worker = JobWorker(db=db, service=svc, concurrency=2, poll_interval=0.01, worker_id="w1")
+
+    await _drain(worker, db)
+
+    assert db.queue["job-ok"]["aida_status"] == "done"
+    assert db.queue["job-bad"]["aida_status"] == "failed"
+    assert "failed" in db.queue["job-bad"]["aida_last_error"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_two_workers_never_claim_the_same_job(anyio_backend):
+    db = FakeQueueDB([f"job-{i}" for i in range(8)])
+    svc = FakeService()
+    w1 = JobWorker(db=db, service=svc, concurrency=2, poll_interval=0.01, worker_id="w1")
+    w2 = JobWorker(db=db, service=svc, concurrency=2, poll_interval=0.01, worker_id="w2")
+
+    stop = asyncio.Event()
+
+    async def stopper():
+        while any(e["aida_status"] != "done" for e in db.queue.values()):
+            await asyncio.sleep(0.01)
+        stop.set()
+
+    await asyncio.wait_for(asyncio.gather(w1.run(stop), w2.run(stop), stopper()), timeout=5)
+
+    claimed = [jid for _, jid in db.claims]
+    assert sorted(claimed) == sorted(set(claimed))
+    assert len(svc.processed) == 8
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_kickoff_enqueues_when_queue_enabled(anyio_backend, monkeypatch, settings):
+    class DB:
+        def __init__(self):
+            self.enqueued = []
+            self.logs = []
+
+        def get_job(self, job_id):
+            return {"aida_id": job_id, "aida_project_id": "proj-1"}
+
+        def get_project(self, project_id):
+            return {"aida_id": project_id, "aida_status": "processing"}
+
+        def enqueue_job(self, job_id):
+            self.enqueued.append(job_id)
+
+        def append_job_log(self, job_id, event, project_id=None):
+            self.logs.append(event)
+
+    monkeypatch.setattr(settings, "JOB_QUEUE_ENABLED", True)
+    db = DB()
+    svc = JobService(db=db, storage=object())
+    ran_inline = []
+    svc._process_job_sync = ran_inline.append
+
+    await svc.kickoff_job("job-1")
+    await asyncio.sleep(0.01)
+
+    assert db.enqueued == ["job-1"]
+    assert ran_inline == []
+    assert db.logs[-1]["event"] == "job_enqueued"
+
+
+class SqliteQueueDB:
+    """
+    aida_job_queue e a RPC aida_claim_jobs (sql/003 + sql/009) traduzidas para SQLite. O SQLite
+    não tem FOR UPDATE SKIP LOCKED; BEGIN IMMEDIATE serializa os claims, que é a garantia
+    que os workers precisam (um job nunca é reivindicado por dois ao mesmo tempo).
+    """
+
+    # Epoch em segundos com fração (unixepoch('subsec') só existe a partir do SQLite 3.42)
+    NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+    SCHEMA = f"""
+    create table aida_projects (aida_id text primary key, aida_status text not null);
+    create table aida_jobs (aida_id text primary key, aida_project_id text not null, aida_status text not null);
+    create table aida_documents (
+      aida_id text primary key, aida_project_id text not null, aida_status text not null, aida_error text
+    );
+    create table aida_job_events (
+      aida_id integer primary key autoincrement, aida_job_id text, aida_project_id text,
+      aida_level text, aida_event text, aida_data text
+    );
+    create table aida_job_queue (
+      aida_id integer primary key autoincrement,
+      aida_job_id text not null unique references aida_jobs(aida_id),
+      aida_status text not null default 'queued' check (aida_status in ('queued','running','done','failed')),
+      aida_attempts int not null default 0,
+      aida_max_attempts int not null default 3,
+      aida_available_at real not null default {NOW},
+      aida_locked_by text,
+      aida_locked_at real,
+      aida_last_error text
+    );
+    """
+
+    EXPIRED_ERROR = "Lease expirado após atingir o máximo de tentativas."
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+
+    def add_job(self, job_id, project_id="proj-1", *, status="queued", attempts=0, locked_at=None):
+        with self._connect() as conn:
+            conn.execute("insert or ignore into aida_projects values (?, 'processing')", (project_id,))
+            conn.execute("insert into aida_jobs values (?, ?, 'processing')", (job_id, project_id))
+            conn.execute(
+                "insert into aida_documents values (?, ?, 'queued', null)", (f"doc-{job_id}", project_id)
+            )
+            conn.execute(
+                "insert into aida_job_queue (aida_job_id, aida_status, aida_attempts, aida_locked_at) values (?, ?, ?, ?)",
+                (job_id, status, attempts, locked_at),
+            )
+
+    def claim_queued_jobs(self, worker_id, limit, lease_seconds):
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("begin immediate")
+            now = self.NOW
+            stale = f"({now} - ?)"
+            expired = [
+                r[0]
+                for r in conn.execute(
+                    f"""update aida_job_queue set aida_status = 'failed', aida_last_error = ?
+                         where aida_status = 'running' and aida_locked_at < {stale}
+                           and aida_attempts >= aida_max_attempts
+                     returning aida_job_id""",
+                    (self.EXPIRED_ERROR, lease_seconds),
+                ).fetchall()
+            ]
+            for job_id in expired:
+                (project_id,) = conn.execute(
+                    "update aida_jobs set aida_status = 'failed' where aida_id = ? returning aida_project_id", (job_id,)
+                ).fetchone()
+                conn.execute(
+                    "update aida_projects set aida_status = 'failed' where aida_id = ? and aida_status = 'processing'",
+                    (project_id,),
+                )
+                conn.execute(
+                    """update aida_documents set aida_status = 'failed', aida_error = ?
+                        where aida_project_id = ? and aida_status in ('created', 'queued', 'processing')""",
+                    (self.EXPIRED_ERROR, project_id),
+                )
+                conn.execute(
+                    """insert into aida_job_events (aida_job_id, aida_project_id, aida_level, aida_event, aida_data)
+                       values (?, ?, 'error', 'job_failed', json_object('error', ?))""",
+                    (job_id, project_id, self.EXPIRED_ERROR),
+                )
+            claimed = conn.execute(
+                f"""update aida_job_queue
+                       set aida_status = 'running', aida_locked_by = ?,
+                           aida_locked_at = {now}, aida_attempts = aida_attempts + 1
+                     where aida_id in (
+                       select aida_id from aida_job_queue
+                        where (aida_status = 'queued' and aida_available_at <= {now})
+                           or (aida_status = 'running' and aida_locked_at < {stale}
+                               and aida_attempts < aida_max_attempts)
+                        order by aida_available_at, aida_id
+                        limit ?)
+                 returning *""",
+                (worker_id, lease_seconds, limit),
+            ).fetchall()
+            conn.execute("commit")
+            return [dict(r) for r in claimed]
+        except BaseException:
+            conn.execute("rollback")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat_queued_jobs(self, worker_id, job_ids):
+        pass
+
+    def finish_queued_job(self, job_id, status, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                """update aida_job_queue set aida_status = ?, aida_last_error = coalesce(?, aida_last_error),
+                          aida_locked_by = null, aida_locked_at = null
+                    where aida_job_id = ?""",
+                (status, error, job_id),
+            )
+
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("select aida_status from aida_jobs where aida_id = ?", (job_id,)).fetchone()
+        return {"aida_id": job_id, "aida_status": row[0]} if row else None
+
+    def row(self, table, key):
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            column = "aida_job_id" if table in ("aida_job_queue", "aida_job_events") else "aida_id"
+            return [dict(r) for r in conn.execute(f"select * from {table} where {column} = ?", (key,))]
+        finally:
+            conn.close()
+
+
+def test_sql_claim_never_hands_the_same_job_to_two_workers(tmp_path):
+    db = SqliteQueueDB(tmp_path / "queue.db")
+    for i in range(40):
+        db.add_job(f"job-{i}")
+    claims: list[str] = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        while True:
+            got = db.claim_queued_jobs(worker_id, 3, 60)
+            if not got:
+                return
+            with lock:
+                claims.extend(r["aida_job_id"] for r in got)
+
+    threads = [threading.Thread(target=worker, args=(f"w{n}",)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(claims) == sorted(f"job-{i}" for i in range(40))
+
+
+def test_sql_claim_fails_job_project_and_documents_when_lease_expires_for_good(tmp_path):
+    db = SqliteQueueDB(tmp_path / "queue.db")
+    long_ago = time.time() - 3600
+    db.add_job("job-dead", "proj-dead", status="running", attempts=3, locked_at=long_ago)
+    db.add_job("job-retry", "proj-retry", status="running", attempts=1, locked_at=long_ago)
+
+    claimed = db.claim_queued_jobs("w1", 10, 60)
+
+    # Ainda com tentativas: volta para outro worker
+    assert [(r["aida_job_id"], r["aida_attempts"]) for r in claimed] == [("job-retry", 2)]
+    assert db.row("aida_job_queue", "job-dead")[0]["aida_status"] == "failed"
+    assert db.row("aida_jobs", "job-dead")[0]["aida_status"] == "failed"
+    assert db.row("aida_projects", "proj-dead")[0]["aida_status"] == "failed"
+    assert db.row("aida_documents", "doc-job-dead")[0]["aida_status"] == "failed"
+    assert [e["aida_event"] for e in db.row("aida_job_events", "job-dead")] == ["job_failed"]
+    assert db.row("aida_jobs", "job-retry")[0]["aida_status"] == "processing"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_workers_on_sql_queue_record_failed_jobs(anyio_backend, tmp_path):
+    db = SqliteQueueDB(tmp_path / "queue.db")
+    for i in range(4):
+        db.add_job(f"job-{i}")
+
+    class Service:
+        def _process_job_sync(self, job_id):
+            # Pipeline que falha grava failed no job e não propaga a exceção
+            status = "failed" if job_id == "job-2" else "ready"
+            with db._connect() as conn:
+                conn.execute("update aida_jobs set aida_status = ? where aida_id = ?", (status, job_id))
+
+    workers = [JobWorker(db=db, service=Service(), concurrency=2, poll_interval=0.01, worker_id=f"w{n}") for n in (1, 2)]
+    stop = asyncio.Event()
+
+    async def stopper():
+        while any(db.row("aida_job_queue", f"job-{i}")[0]["aida_status"] in ("queued", "running") for i in range(4)):
+            await asyncio.sleep(0.01)
+        stop.set()
+
+    await asyncio.wait_for(asyncio.gather(*(w.run(stop) for w in workers), stopper()), timeout=5)
+
+    statuses = {f"job-{i}": db.row("aida_job_queue", f"job-{i}")[0]["aida_status"] for i in range(4)}
+    assert statuses == {"job-0": "done", "job-1": "done", "job-2": "failed", "job-3": "done"}